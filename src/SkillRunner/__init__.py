@@ -1,6 +1,5 @@
 import logging
 import json
-import jsonpickle
 import os 
 
 import azure.functions as func
@@ -11,20 +10,11 @@ from .bot.bot import Button
 from .bot.arguments import Argument, MentionArgument, RoomArgument
 from .bot.pattern import PatternType
 from .bot.utils import Environment
+from .bot.metrics import REGISTRY, record_errors, time_phase
+from .bot.policy import configured_policy_name
+from .hosting.encoding import RESPONSE_MANAGER_FIELDS, encode_response
 
-import nltk
-
-MIN_CORPORA = [
-    'brown',  # Required for FastNPExtractor
-    'punkt',  # Required for WordTokenizer
-    'wordnet',  # Required for lemmatization
-    'averaged_perceptron_tagger',  # Required for NLTKTagger
-]
-
-if not Environment.is_test():
-    # Download the minimum corpora required for NLTK / TextBlob
-    for corpora in MIN_CORPORA:
-        nltk.download(corpora)
+REGISTRY.set_constant_labels(entrypoint="functions", policy=configured_policy_name())
 
 class ResponseManager:
     def __init__(self):
@@ -43,16 +33,6 @@ class ResponseManager:
         self.Success = False
 
 
-def run_code(req, api_token, trace_parent):
-    # Instantiate a bot object
-    try:
-        bot = _bot.Bot(req, api_token, trace_parent)
-        bot.run_user_script()
-        return bot
-    except Exception as e:
-        raise e
-    
-
 def main(req: func.HttpRequest) -> func.HttpResponse:
     # Allow Debug logs through, Azure Functions will filter further
     logging.Logger.root.level = 10
@@ -72,23 +52,35 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
         # Ignore failures
         pass
 
+    if req.method == "GET" and "metrics" in req.params:
+        return func.HttpResponse(
+            body=REGISTRY.render(),
+            mimetype="text/plain; version=0.0.4",
+            status_code=200
+        )
+
     if req.method == "GET":
         branch = branch_info["branch"]
         sha = branch_info["sha"]
         msg = f"Ok! Running Abbot Python Runner v0.10.2 from {branch} branch at {sha}"
         rm.add(msg)
         return func.HttpResponse(
-            body=jsonpickle.encode(rm, unpicklable=False),
+            body=encode_response(rm, RESPONSE_MANAGER_FIELDS),
             mimetype="application/vnd.abbot.v1+json",
             status_code=200
         )
 
+    bot = None
     try:
-        req_body = req.get_json()
+        with time_phase("parse"):
+            req_body = req.get_json()
         # The token is necessary for using the data API
         api_token = req.headers.get('x-abbot-skillapitoken')
         trace_parent = req.headers.get('traceparent')
-        bot = run_code(req_body, api_token, trace_parent)
+        with time_phase("run"):
+            with time_phase("bot_init"):
+                bot = _bot.Bot(req_body, api_token, trace_parent)
+            bot.run_user_script()
         for response in bot.responses:
             rm.add(response)
         if bot.is_request:
@@ -100,22 +92,26 @@ def main(req: func.HttpRequest) -> func.HttpResponse:
                 headers[key] = [value]
             rm.Headers = headers
 
-            logging.info("rm: ")
-            logging.info(jsonpickle.encode(rm))
-
     except exceptions.InterpreterError as e:
         rm.addError(e)
     except Exception as e: 
         logging.error(e)
         rm.addError({ "errorId": type(e).__name__, "description": str(e) })
     finally:
+        # Saving the skill's brain writes can fail after the skill itself failed, so report that too.
+        flush_error = bot._flush_error if bot is not None else None # pylint: disable=protected-access
+        if flush_error is not None:
+            rm.addError({ "errorId": type(flush_error).__name__, "description": str(flush_error) })
         if rm.Success:
             status_code=200
         else:
             status_code=500
 
+        record_errors(rm.Errors)
+        with time_phase("encode"):
+            body = encode_response(rm, RESPONSE_MANAGER_FIELDS)
         return func.HttpResponse(
-            body=jsonpickle.encode(rm, unpicklable=False),
+            body=body,
             mimetype="application/vnd.abbot.v1+json",
             status_code=status_code
         )
@@ -1,12 +1,19 @@
+import asyncio
+import functools
 import json
-import requests
 import logging
 import os
+import requests
 
 from cryptography.fernet import Fernet
-from urllib.error import HTTPError
 
+from .exceptions import ApiError
 from .utils import Environment
+from .metrics import API_REQUESTS, API_REQUEST_SECONDS, path_template
+from .concurrency import api_executor
+from .memo import GetMemo
+from .resilience import send_with_retries
+from .sessions import get_session, request_timeout
 
 try:
     safe_key = Fernet.generate_key()
@@ -20,16 +27,21 @@ class ApiClient(object):
     authentication mechanism when calling a skill runner API.
     """
     def __init__(self, skill_id, user_id, api_token, timestamp, trace_parent, logger=None):
+        self.skill_id = skill_id
         self.user_id = user_id
         self.logger = logger or logging.getLogger("ApiClient")
 
         base_url = os.environ.get('AbbotApiBaseUrl', 'https://localhost:4979/api')
+        self.api_base_url = base_url
         self.base_url = f'{base_url}/skills/{skill_id}'
 
         if self.base_url.startswith("https://localhost") or self.base_url.startswith("https://host.docker.internal"):
             self.verify_ssl = False
         else:
             self.verify_ssl = True
+        self.timeout = request_timeout()
+        # GETs are memoized for the life of the client, which is one skill invocation.
+        self.memo = GetMemo() if os.environ.get('ABBOT_API_MEMOIZE', 'true').lower() not in ('0', 'false') else None
 
         self._request_headers = {
                 'Content-Type': 'application/json',
@@ -38,22 +50,27 @@ class ApiClient(object):
             }
         self.logger.info('ApiClient created with traceparent: %s', trace_parent)
 
-    def get(self, path):
+    def get(self, path, memoize=True):
         """
         Makes a GET request to the Abbot API.
         Arguments:
             path: The path to the resource to GET. This is the part after https://ab.bot/api/skills/{skill_id}
+            memoize: Whether to memoize the response for the rest of the invocation. Pass False for responses
+                that are only read once, such as pages of a listing, so they don't stay in memory.
         """
+        if not memoize:
+            return self._request(path, 'GET')
         return self.send(path, 'GET')
 
-    def post(self, path, data=None):
+    def post(self, path, data=None, read_only=False):
         """
         Makes a POST request to the Abbot API.
         Arguments:
             path: The path to the resource to POST. This is the part after https://ab.bot/api/skills/{skill_id}
             data: The data to POST.
+            read_only: Whether the request only reads (e.g. a bulk read), so it's safe to retry and doesn't invalidate memoized GETs.
         """
-        return self.send(path, 'POST', data)
+        return self.send(path, 'POST', data, read_only)
 
     def put(self, path, data=None):
         """
@@ -64,28 +81,100 @@ class ApiClient(object):
         """
         return self.send(path, 'PUT', data)
 
-    def send(self, path, method, data=None):
+    def send(self, path, method, data=None, read_only=False):
         """
         Sends a request to the Abbot API.
         Arguments:
             path: The path to the resource to POST. This is the part after https://ab.bot/api/skills/{skill_id}
             method: The HTTP method to use.
             data: The data to POST.
+            read_only: Whether a request with a method other than GET only reads.
         """
+        if self.memo is None:
+            return self._request(path, method, data, read_only)
+        if method == 'GET':
+            return self.memo.get(path, lambda: self._request(path, method, data))
+        if read_only:
+            return self._request(path, method, data, read_only)
+        try:
+            return self._request(path, method, data)
+        finally:
+            self.memo.invalidate(path)
+
+    def get_conditional(self, path, etag=None):
+        """
+        Makes a GET request to the Abbot API that only returns the resource if it doesn't match `etag`.
+        It isn't memoized.
+        Arguments:
+            path: The path to the resource to GET. This is the part after https://ab.bot/api/skills/{skill_id}
+            etag: The ETag of the copy of the resource we have, if any.
+        Returns:
+            A tuple of whether the resource was modified (always True without an `etag`), its content if it was, and its ETag.
+        """
+        result = self._response(path, 'GET', headers={ 'If-None-Match': etag } if etag else None)
+        if result.status_code == 304:
+            return False, None, result.headers.get('ETag') or etag
+        return True, self._decode(result), result.headers.get('ETag')
+
+    def _request(self, path, method, data=None, read_only=False):
+        return self._decode(self._response(path, method, data, read_only))
+
+    def _response(self, path, method, data=None, read_only=False, headers=None):
         url = self.base_url + path
+        template = path_template(path)
+        request_headers = { **self._request_headers, **headers } if headers else self._request_headers
+
+        def send_once():
+            status = "error"
+            try:
+                with API_REQUEST_SECONDS.time(method=method, path=template):
+                    result = get_session(self.api_base_url).request(method, url, headers=request_headers, verify=self.verify_ssl, json=data, timeout=self.timeout)
+                status = result.status_code
+                return result
+            finally:
+                API_REQUESTS.inc(method=method, path=template, status=status)
 
         try:
-            result = requests.request(method, url, headers=self._request_headers, verify=self.verify_ssl, json=data)
+            result = send_with_retries(send_once, method, template, idempotent=True if read_only else None)
             result.raise_for_status()
+            return result
+        except ApiError as ex:
+            self.logger.warning("Not %s ing to %s: %s", method, path, ex)
+            raise
+        except Exception as ex:
+            status_code = ex.response.status_code if isinstance(ex, requests.HTTPError) else None
+            if not Environment.is_test():
+                self.logger.exception("There was an error %s ing to %s", method, path)
+            raise ApiError("Failed to communicate with Abbot.", status_code) from ex
+
+    def _decode(self, result):
+        try:
             if len(result.text) > 0:
                 return result.json()
             else:
                 return None
-        except Exception as ex:
-            if Environment.is_test():
-                raise ex
-            self.logger.exception("There was an error %s ing to %s", method, path)
-            raise Exception("Failed to communicate with Abbot.")
+        except ValueError as ex:
+            self.logger.exception("Abbot sent an invalid response to %s", result.request.path_url)
+            raise ApiError("Failed to communicate with Abbot.", result.status_code) from ex
+
+    async def get_async(self, path):
+        """
+        Makes a GET request to the Abbot API without blocking the event loop.
+        Arguments:
+            path: The path to the resource to GET. This is the part after https://ab.bot/api/skills/{skill_id}
+        """
+        return await self.send_async(path, 'GET')
+
+    async def send_async(self, path, method, data=None):
+        """
+        Sends a request to the Abbot API without blocking the event loop, on the process's API executor.
+        Arguments:
+            path: The path to the resource. This is the part after https://ab.bot/api/skills/{skill_id}
+            method: The HTTP method to use.
+            data: The data to send.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(api_executor(), functools.partial(self.send, path, method, data))
 
     def delete(self, path):
         """
@@ -6,16 +6,8 @@ import requests
 import logging
 from unittest.mock import patch
 
-# Imports solely for use in user skill
-import pandas
-import numpy
-import bs4
-import soupsieve
-import boto3
-
-# End of user skill imports
-
-from .storage import Brain
+from .storage import Brain, write_back_enabled
+from .brain_cache import get_brain_cache
 from .secrets import Secrets
 from .rooms import Rooms
 from .users import Users
@@ -38,7 +30,9 @@ from .button import Button
 from .arguments import Argument, MentionArgument, Arguments, RoomArgument
 from .message_options import MessageOptions
 from .conversations import Conversation
-from .policy import get_policy
+from .policy import configured_policy_name, get_policy
+from .metrics import time_phase
+from .concurrency import gather
 from .source_message import SourceMessage
 
 class Bot(object):
@@ -80,7 +74,7 @@ class Bot(object):
     :var conversation: The conversation this skill was invoked within, if any.
     :var outputs: A dictionary of outputs to send back to the skill runner for playbook calls.
     """
-    def __init__(self, req, api_token, trace_parent=None, logger=None):
+    def __init__(self, req, api_token, trace_parent=None, logger=None, on_reply=None):
         self.responses = []
         self.logger = logger or logging.getLogger("Bot")
 
@@ -106,13 +100,15 @@ class Bot(object):
 
         # Clients
         api_client = ApiClient(self.skill_id, self.user_id, api_token, self.timestamp, trace_parent, self.logger.getChild("ApiClient"))
-        self.brain = Brain(api_client) 
+        self.brain = Brain(api_client, write_back_enabled(), get_brain_cache())
+        # Set if saving the skill's brain writes fails after the skill itself failed, so both errors are reported.
+        self._flush_error = None
         self.secrets = Secrets(api_client)
         self.rooms = Rooms(api_client, self.platform_type)
         self.users = Users(api_client)
         self.utils = Utilities(api_client)
         self._signaler = Signaler(api_client, req)
-        self._reply_client = ReplyClient(api_client, self.room, thread_id, req.get('PassiveReplies'), runnerInfo.get('ConversationReference'), self.skill_id, self.responses)
+        self._reply_client = ReplyClient(api_client, self.room, thread_id, req.get('PassiveReplies'), runnerInfo.get('ConversationReference'), self.skill_id, self.responses, on_reply)
         self._tickets_client = TicketsClient(api_client, self)
         self.customers = CustomersClient(api_client)
 
@@ -168,16 +164,20 @@ class Bot(object):
 
             out = None
 
-            policy_name = os.environ.get("ABBOT_SANDBOX_POLICY")
-            if policy_name is None:
-                if os.environ.get("ABBOT_SANDBOXED") == "false":
-                    policy_name = "permissive"
-                else:
-                    policy_name = "restrictive"
-
-            policy = get_policy(policy_name, self.logger.getChild("Policy"))
+            with time_phase("policy"):
+                policy = get_policy(configured_policy_name(), self.logger.getChild("Policy"))
             self.logger.info("Running user script under %s policy.", policy.name())
-            policy.exec(self.code, script_locals)
+            try:
+                policy.exec(self.code, script_locals)
+            except BaseException:
+                # Save what the skill wrote before it failed, as if it had written through, but report its own error.
+                try:
+                    self.brain.flush()
+                except Exception as e: # pylint: disable=broad-except
+                    self.logger.exception("Failed to save brain changes after the skill failed")
+                    self._flush_error = e
+                raise
+            self.brain.flush()
 
             return self.responses
         except SyntaxError as e:
@@ -279,6 +279,20 @@ class Bot(object):
             self._signal_event = signal_event.SignalEvent(self._signal_info) if self._signal_info is not None else None
         return self._signal_event
 
+    def gather(self, *calls, max_concurrency=None, return_exceptions=False):
+        """
+        Makes several calls at once and returns their results, in order.
+        Use it to make many independent Abbot API calls without waiting for each in turn, for example:
+        ``bot.gather(lambda: bot.brain.read("a"), lambda: bot.brain.read("b"))``.
+
+        Args:
+            calls (Callable): The calls to make, each a function that takes no arguments.
+            max_concurrency (int): The most calls to make at once. Defaults to (and can't be more than) 8.
+            return_exceptions (bool): Whether to return the exception raised by a call in place of its result,
+                rather than raising it once every call has finished.
+        """
+        return gather(*calls, max_concurrency=max_concurrency, return_exceptions=return_exceptions)
+
     def signal(self, name, args):
         """
         Raises a signal from the skill with the specified name and arguments.
@@ -0,0 +1,96 @@
+"""
+Caches brain values across skill invocations, so a skill that reads the same configuration on every run
+doesn't fetch it from Abbot every time.
+
+The cache is opt-in (set ABBOT_BRAIN_CACHE_SIZE), process-wide, and holds at most that many values, keyed by
+skill id and key, evicting the least recently used. A value is served from the cache for ABBOT_BRAIN_CACHE_TTL
+seconds after it was fetched. After that it's revalidated with a conditional request (If-None-Match with the
+ETag the API sent it with), which costs a round trip but no payload when it hasn't changed. If revalidating fails
+(other than because the item is gone), the stale value is served rather than failing the read.
+Writes and deletes made through this process remove the values they change; changes made elsewhere
+(including other server processes) are seen once the TTL runs out.
+"""
+
+import collections
+import os
+import threading
+import time
+
+from typing import Optional
+
+from .metrics import REGISTRY
+
+DEFAULT_TTL = 5.0
+
+BRAIN_CACHE = REGISTRY.counter(
+    "abbot_runner_brain_cache_total",
+    "Brain reads by how the cache served them: hit, revalidated (not modified), stale (revalidating failed), or miss.",
+    ("result",))
+
+class CacheEntry(object):
+    """A cached brain value (JSON serialized), the ETag it was sent with, and when it was last fetched or revalidated."""
+    __slots__ = ("value", "etag", "fetched_at")
+
+    def __init__(self, value: Optional[str], etag: Optional[str], fetched_at: float):
+        self.value = value
+        self.etag = etag
+        self.fetched_at = fetched_at
+
+class BrainCache(object):
+    """A bounded, thread-safe LRU cache of brain values, keyed by skill id and key."""
+    def __init__(self, max_entries: int, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, skill_id, key: str) -> tuple[Optional[CacheEntry], bool]:
+        """Returns the cached entry for a key, or None, and whether it's still fresh enough to use without revalidating."""
+        with self._lock:
+            entry = self._entries.get((skill_id, key))
+            if entry is None:
+                return None, False
+            self._entries.move_to_end((skill_id, key))
+            return entry, time.monotonic() - entry.fetched_at < self.ttl
+
+    def put(self, skill_id, key: str, value: Optional[str], etag: Optional[str]) -> None:
+        """Caches a value that was just fetched."""
+        with self._lock:
+            self._entries[(skill_id, key)] = CacheEntry(value, etag, time.monotonic())
+            self._entries.move_to_end((skill_id, key))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def revalidated(self, skill_id, key: str, entry: CacheEntry) -> None:
+        """Marks an entry as fresh again, after the API said it hasn't changed."""
+        with self._lock:
+            if self._entries.get((skill_id, key)) is entry:
+                entry.fetched_at = time.monotonic()
+
+    def invalidate(self, skill_id, keys) -> None:
+        """Removes the provided keys' values, because they've been changed."""
+        with self._lock:
+            for key in keys:
+                self._entries.pop((skill_id, key), None)
+
+    def __len__(self):
+        return len(self._entries)
+
+_lock = threading.Lock()
+_cache = None
+_cache_pid = None
+
+def get_brain_cache() -> Optional[BrainCache]:
+    """
+    Returns this process's brain cache, creating it on first use, or None if it's disabled.
+    It's enabled by setting ABBOT_BRAIN_CACHE_SIZE, and configured by ABBOT_BRAIN_CACHE_TTL.
+    """
+    global _cache, _cache_pid # pylint: disable=global-statement
+    max_entries = int(os.environ.get("ABBOT_BRAIN_CACHE_SIZE", 0))
+    if max_entries <= 0:
+        return None
+    with _lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = BrainCache(max_entries, float(os.environ.get("ABBOT_BRAIN_CACHE_TTL", DEFAULT_TTL)))
+            _cache_pid = os.getpid()
+        return _cache
@@ -0,0 +1,42 @@
+"""
+Encodes the values skills store in the brain, compressing large ones.
+
+Values are stored as JSON. When ABBOT_BRAIN_COMPRESS_THRESHOLD is set, values whose JSON is at least that many
+bytes are stored zlib-compressed and base64-encoded instead, behind a version marker (e.g. "abbot:z1:eJz...").
+No JSON document starts with the marker, so compressed and plain values can be told apart when they're read,
+and values stored before compression was turned on (or by other runners) still load.
+Compression is off by default because only this runner understands compressed values.
+"""
+
+import base64
+import json
+import os
+import zlib
+
+from typing import Any, Optional
+
+COMPRESSED_MARKER = "abbot:z1:"
+# Brain values are mostly repetitive JSON, which the fastest level compresses about as well as the default.
+COMPRESSION_LEVEL = 1
+
+def compression_threshold() -> Optional[int]:
+    """Returns the smallest JSON size, in bytes, at which values are compressed, or None if compression is off."""
+    threshold = os.environ.get("ABBOT_BRAIN_COMPRESS_THRESHOLD")
+    return int(threshold) if threshold else None
+
+def encode_value(value: Any) -> str:
+    """Returns the string stored in the brain for a value: its JSON, compressed if it's large."""
+    serialized = json.dumps(value)
+    threshold = compression_threshold()
+    # The JSON is ASCII, so its length is its size in bytes.
+    if threshold is None or len(serialized) < threshold:
+        return serialized
+    compressed = COMPRESSED_MARKER + base64.b64encode(zlib.compress(serialized.encode("ascii"), COMPRESSION_LEVEL)).decode("ascii")
+    # Incompressible values (e.g. already-encoded data) would only grow.
+    return compressed if len(compressed) < len(serialized) else serialized
+
+def decode_value(stored: str) -> Any:
+    """Returns the value a string stored in the brain holds, whether it's compressed or not."""
+    if stored.startswith(COMPRESSED_MARKER):
+        return json.loads(zlib.decompress(base64.b64decode(stored[len(COMPRESSED_MARKER):])))
+    return json.loads(stored)
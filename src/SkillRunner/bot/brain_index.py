@@ -0,0 +1,77 @@
+"""
+An in-memory index of a skill's brain items, for searching them when the Abbot API can't.
+
+It's built from a single scan of the brain and kept for the rest of the invocation, and the Brain keeps
+it up to date as the skill writes, so repeated searches don't scan the brain again.
+Keys are kept sorted, so prefix searches only look at matching keys. Field indexes are built the first
+time a field is searched.
+"""
+
+import bisect
+import json
+
+from typing import Any, Iterable, Optional
+
+_MISSING = object()
+
+class BrainIndex(object):
+    """An index of brain items, by key and by the fields of their values."""
+    def __init__(self, items: Iterable[tuple[str, Any]]):
+        self._values = dict(items)
+        self._keys = sorted(self._values)
+        # Maps a field name to a map of each value of that field (as canonical JSON) to the keys of the items that have it.
+        self._fields = {}
+
+    def search(self, term: Optional[str] = None, prefix: Optional[str] = None, field: Optional[str] = None, equals: Any = None) -> list[str]:
+        """
+        Returns the sorted keys of the items that match every provided criterion:
+        keys that start with `prefix`, keys that contain `term` (ignoring case),
+        and values that are objects whose `field` is `equals` (or that have `field`, if `equals` is None).
+        """
+        keys = self._keys
+        if prefix:
+            start = bisect.bisect_left(keys, prefix)
+            end = start
+            while end < len(keys) and keys[end].startswith(prefix):
+                end += 1
+            keys = keys[start:end]
+        if term:
+            lowered = term.lower()
+            keys = [key for key in keys if lowered in key.lower()]
+        if field is not None:
+            by_value = self._field_index(field)
+            if equals is None:
+                matching = set().union(*by_value.values()) if by_value else set()
+            else:
+                matching = by_value.get(_canonical(equals), set())
+            keys = [key for key in keys if key in matching]
+        return keys
+
+    def get(self, key: str) -> Any:
+        """Returns the value of the item with the provided key."""
+        return self._values[key]
+
+    def set(self, key: str, value: Any) -> None:
+        """Adds or updates an item."""
+        if key not in self._values:
+            bisect.insort(self._keys, key)
+        self._values[key] = value
+        self._fields.clear()
+
+    def remove(self, key: str) -> None:
+        """Removes an item, if it's in the index."""
+        if self._values.pop(key, _MISSING) is not _MISSING:
+            del self._keys[bisect.bisect_left(self._keys, key)]
+            self._fields.clear()
+
+    def _field_index(self, field: str) -> dict:
+        by_value = self._fields.get(field)
+        if by_value is None:
+            by_value = self._fields[field] = {}
+            for key, value in self._values.items():
+                if isinstance(value, dict) and field in value:
+                    by_value.setdefault(_canonical(value[field]), set()).add(key)
+        return by_value
+
+def _canonical(value: Any) -> str:
+    return json.dumps(value, sort_keys=True)
@@ -0,0 +1,88 @@
+"""
+Runs a skill's Abbot API calls concurrently, so a skill that makes many independent calls
+(e.g. looking up 50 users) waits for roughly one round trip rather than one per call.
+
+Skill code can't use `async`, so it passes `bot.gather` callables (usually lambdas) that each make calls,
+and gets their results back in order. The callables run on a process-wide pool of threads,
+shared by every skill, up to a per-call limit at once. A call can ask for a lower limit, but not a higher one,
+so one skill can't take every thread from the others. Each thread's calls use the pooled sessions in `sessions`.
+"""
+
+import os
+import threading
+
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Optional
+
+from .sessions import pool_size
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+_local = threading.local()
+
+def default_max_concurrency() -> int:
+    """Returns the default number of a `gather` call's callables that run at once, from ABBOT_API_MAX_CONCURRENCY."""
+    return int(os.environ.get("ABBOT_API_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+
+def api_executor() -> ThreadPoolExecutor:
+    """
+    Returns this process's executor for concurrent API calls, creating it on first use.
+    It has a thread for each of the connections the API session pool keeps open.
+    """
+    global _executor, _executor_pid # pylint: disable=global-statement
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # An executor inherited across a fork has no threads, so it can't be reused.
+            _executor = ThreadPoolExecutor(max_workers=pool_size(), thread_name_prefix="api", initializer=_mark_api_thread)
+            _executor_pid = os.getpid()
+        return _executor
+
+def gather(*thunks: Callable[[], Any], max_concurrency: Optional[int] = None, return_exceptions: bool = False) -> list:
+    """
+    Calls each of the provided callables concurrently, at most `max_concurrency` at once, and returns their results in order.
+    `max_concurrency` is capped at (and defaults to) `default_max_concurrency()`.
+
+    If a callable raises, `gather` raises the first exception (in argument order) once every callable has finished,
+    unless `return_exceptions` is True, in which case the exception is returned in place of that callable's result.
+    Callables that themselves call `gather` run their callables one at a time, so nested calls can't exhaust the pool.
+    """
+    limit = min(max_concurrency or default_max_concurrency(), default_max_concurrency())
+    if len(thunks) <= 1 or limit <= 1 or getattr(_local, "in_api_thread", False):
+        futures = [_call(thunk) for thunk in thunks]
+    else:
+        futures = _run_concurrently(thunks, limit)
+
+    results = []
+    for future in futures:
+        error = future.exception()
+        if error is not None and not return_exceptions:
+            raise error
+        results.append(error if error is not None else future.result())
+    return results
+
+def _run_concurrently(thunks, limit: int) -> list[Future]:
+    executor = api_executor()
+    futures = []
+    running = set()
+    for thunk in thunks:
+        if len(running) >= limit:
+            _, running = wait(running, return_when=FIRST_COMPLETED)
+        future = executor.submit(thunk)
+        futures.append(future)
+        running.add(future)
+    wait(running)
+    return futures
+
+def _call(thunk) -> Future:
+    future = Future()
+    try:
+        future.set_result(thunk())
+    except Exception as e: # pylint: disable=broad-except
+        future.set_exception(e)
+    return future
+
+def _mark_api_thread():
+    _local.in_api_thread = True
@@ -18,4 +18,14 @@ class InterpreterError(Exception):
         self.description = description
 
     def __str__(self):
-        return "{} at line {}, character {}".format(self.description, self.lineStart, self.spanStart)
\ No newline at end of file
+        return "{} at line {}, character {}".format(self.description, self.lineStart, self.spanStart)
+
+class ApiError(Exception):
+    """
+    Raised when a call to the Abbot API fails.
+
+    :var status_code: The HTTP status code of the API's response, or None if there wasn't one.
+    """
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
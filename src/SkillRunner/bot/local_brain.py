@@ -0,0 +1,101 @@
+"""
+An in-memory stand-in for the Abbot API's brain endpoints, so `Brain` can be used without Abbot, e.g. in tests:
+
+    brain = Brain(LocalBrainApi({ "count": 1 }))
+
+It takes the place of the ApiClient, and answers the same requests the API does, including bulk requests.
+"""
+
+import json
+import threading
+import urllib.parse
+import zlib
+
+from typing import Optional
+
+from .exceptions import ApiError
+
+class LocalBrainApi(object):
+    """
+    Answers brain requests from an in-memory dict of items.
+
+    :var skill_id: The ID of the skill whose brain this is.
+    :var items: The stored items' JSON-serialized values, by key.
+    :var requests: The (method, path) of each request made, so tests can count round trips.
+    :var bulk: Whether it answers bulk requests. When it doesn't, it responds to them with a 404, as APIs without the endpoint do.
+    """
+    def __init__(self, items: Optional[dict] = None, skill_id=42, bulk=True):
+        self.skill_id = skill_id
+        self.bulk = bulk
+        self.items = { key: json.dumps(value) for key, value in (items or {}).items() }
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def get(self, path, memoize=True): # pylint: disable=unused-argument
+        return self.send(path, 'GET')
+
+    def get_conditional(self, path, etag=None):
+        output = self.send(path, 'GET')
+        current = '"%08x"' % zlib.crc32(json.dumps(output).encode("utf-8"))
+        if current == etag:
+            return False, None, etag
+        return True, output, current
+
+    def post(self, path, data=None, read_only=False):
+        return self.send(path, 'POST', data, read_only)
+
+    def put(self, path, data=None):
+        return self.send(path, 'PUT', data)
+
+    def delete(self, path):
+        return self.send(path, 'DELETE')
+
+    def send(self, path, method, data=None, read_only=False): # pylint: disable=unused-argument
+        """Answers a request as the Abbot API would, raising ApiError for the same failures."""
+        with self._lock:
+            self.requests.append((method, path))
+            base, _, query = path.partition("?")
+            if base == "/brain/bulk" and method == 'POST' and self.bulk:
+                return { "results": [self._apply(operation) for operation in data["operations"]] }
+            if base == "/brain/items" and method == 'GET':
+                return self._page(urllib.parse.parse_qs(query))
+            if base == "/brain":
+                key = urllib.parse.parse_qs(query, keep_blank_values=True).get("key", [""])[0]
+                if method == 'GET' and key == "":
+                    return [{ "key": k, "value": v } for k, v in self.items.items()]
+                op = { 'GET': "get", 'POST': "write", 'DELETE': "delete" }.get(method)
+                if op is not None:
+                    result = self._apply({ "op": op, "key": key, "value": (data or {}).get("value") })
+                    if result["status"] != 200:
+                        raise ApiError("Failed to communicate with Abbot.", result["status"])
+                    return { "key": key, "value": result["value"] } if op == "get" else None
+            raise ApiError("Failed to communicate with Abbot.", 404)
+
+    def _page(self, query: dict) -> dict:
+        # The continuation token is the key the next page starts at.
+        prefix = query.get("prefix", [""])[0]
+        start = query.get("continuationToken", [""])[0]
+        size = int(query.get("pageSize", ["100"])[0])
+        keys = sorted(key for key in self.items if key.startswith(prefix) and key >= start)
+        keys_only = query.get("keysOnly", ["false"])[0] == "true"
+        page = {
+            "items": [{ "key": key } if keys_only else { "key": key, "value": self.items[key] } for key in keys[:size]],
+        }
+        if len(keys) > size:
+            page["continuationToken"] = keys[size]
+        return page
+
+    def _apply(self, operation: dict) -> dict:
+        key = operation["key"]
+        if operation["op"] == "get":
+            if key not in self.items:
+                return { "key": key, "status": 404 }
+            return { "key": key, "status": 200, "value": self.items[key] }
+        if operation["op"] == "write":
+            self.items[key] = operation["value"]
+            return { "key": key, "status": 200 }
+        if operation["op"] == "delete":
+            if self.items.pop(key, None) is None:
+                return { "key": key, "status": 404 }
+            return { "key": key, "status": 200 }
+        return { "key": key, "status": 400 }
@@ -0,0 +1,90 @@
+"""
+Memoizes a skill invocation's GET requests to the Abbot API, so a skill that reads the same brain key, secret
+or user in a loop makes one request rather than one per iteration.
+
+Each ApiClient (and so each invocation) has its own memo, so nothing is shared between invocations.
+Identical GETs made at the same time (e.g. from `bot.gather`) share one request.
+Any other request invalidates the memoized GETs it could have changed: those in the same collection
+(the first path segment, e.g. `/brain` or `/customers`), except those that name a different item of
+the same resource in their query string (so writing `/brain?key=a` forgets `/brain?key=a` and the
+listing `/brain?key=`, but not `/brain?key=b`).
+"""
+
+import copy
+import threading
+import urllib.parse
+
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from .metrics import REGISTRY
+
+API_MEMO = REGISTRY.counter(
+    "abbot_runner_api_memo_total",
+    "Abbot API GETs by how they were served: hit (memoized), coalesced (shared a concurrent request) or miss.",
+    ("result",))
+
+class GetMemo(object):
+    """The memoized GET responses of one skill invocation."""
+    def __init__(self):
+        self.hits = 0
+        self.coalesced = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # Maps a path to the Future of its response, which is pending while the request is in flight.
+        self._responses = {}
+
+    def get(self, path: str, fetch: Callable[[], Any]) -> Any:
+        """Returns the memoized response for `path`, calling `fetch` to get it if there isn't one."""
+        with self._lock:
+            future = self._responses.get(path)
+            if future is None:
+                future = self._responses[path] = Future()
+                result = "miss"
+                self.misses += 1
+            elif future.done():
+                result = "hit"
+                self.hits += 1
+            else:
+                result = "coalesced"
+                self.coalesced += 1
+        API_MEMO.inc(result=result)
+
+        if result == "miss":
+            try:
+                future.set_result(fetch())
+            except BaseException as e:
+                future.set_exception(e)
+                with self._lock:
+                    # Failures aren't memoized, so the next call tries again.
+                    if self._responses.get(path) is future:
+                        del self._responses[path]
+                raise
+        # Callers may modify what they get back, so each gets its own copy.
+        return copy.deepcopy(future.result())
+
+    def invalidate(self, path: str) -> None:
+        """Forgets the memoized responses a non-GET request to `path` could have changed."""
+        written = _Resource(path)
+        with self._lock:
+            for memoized in [p for p in self._responses if written.affects(_Resource(p))]:
+                del self._responses[memoized]
+
+    def stats(self) -> dict:
+        """Returns how many GETs were served from the memo, shared a concurrent request, or were sent."""
+        return { "hits": self.hits, "coalesced": self.coalesced, "misses": self.misses }
+
+class _Resource(object):
+    def __init__(self, path: str):
+        base, _, query = path.partition("?")
+        self.path = path
+        self.base = base.rstrip("/")
+        self.collection = self.base.lstrip("/").split("/", 1)[0]
+        self.names_item = any(value for _, value in urllib.parse.parse_qsl(query, keep_blank_values=True))
+
+    def affects(self, other: '_Resource') -> bool:
+        if self.path == other.path:
+            return True
+        if self.collection != other.collection:
+            return False
+        return not (self.base == other.base and other.names_item)
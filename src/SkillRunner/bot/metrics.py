@@ -0,0 +1,239 @@
+"""
+Collects the runner's latency histograms and counters, and renders them in the Prometheus text format.
+
+Metrics are process-wide. Every series is labeled with the registry's constant labels
+(the entrypoint serving requests and the sandbox policy), which the entrypoint sets on startup.
+Worker processes send what they've recorded back with each response (see `drain` and `merge`),
+so the server process reports everything that happened on its behalf. Pre-forked server processes
+publish their metrics to each other instead (see `SkillRunner.hosting.shared_metrics`).
+"""
+
+import threading
+import time
+
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Path segments that name a sub-resource rather than identifying one (e.g. '/rooms/{id}/topic').
+_LITERAL_PATH_SEGMENTS = frozenset(["archive", "bulk", "buttons", "items", "name", "purpose", "search", "topic"])
+
+class Counter(object):
+    """A counter, with a value for each combination of label values."""
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, label_names: tuple[str, ...]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        """Increments the counter for the provided labels."""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _snapshot(self, reset: bool) -> dict:
+        values = dict(self._values)
+        if reset:
+            self._values.clear()
+        return values
+
+    def _empty(self, registry: 'MetricsRegistry') -> 'Counter':
+        return Counter(registry, self.name, self.documentation, self.label_names)
+
+    def _merge(self, values: dict) -> None:
+        for key, value in values.items():
+            self._values[key] = self._values.get(key, 0) + value
+
+    def _render(self, constant_labels: str) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        for key, value in sorted(self._values.items()):
+            yield f"{self.name}{{{_labels(constant_labels, self.label_names, key)}}} {_number(value)}"
+
+class Histogram(object):
+    """A histogram of observed values, with a distribution for each combination of label values."""
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str, label_names: tuple[str, ...], buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = buckets
+        # Maps label values to [the count in each bucket (not cumulative), the sum, the count].
+        self._values = {}
+
+    def observe(self, value: float, **labels) -> None:
+        """Records an observation for the provided labels."""
+        key = tuple(str(labels[name]) for name in self.label_names)
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+        with self.registry.lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observes the time spent in the body of the `with` statement, even if it raises."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _snapshot(self, reset: bool) -> dict:
+        values = { key: [list(counts), total, count] for key, (counts, total, count) in self._values.items() }
+        if reset:
+            self._values.clear()
+        return values
+
+    def _empty(self, registry: 'MetricsRegistry') -> 'Histogram':
+        return Histogram(registry, self.name, self.documentation, self.label_names, self.buckets)
+
+    def _merge(self, values: dict) -> None:
+        for key, (counts, total, count) in values.items():
+            series = self._values.get(key)
+            if series is None:
+                self._values[key] = [list(counts), total, count]
+            else:
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+
+    def _render(self, constant_labels: str) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        for key, (counts, total, count) in sorted(self._values.items()):
+            labels = _labels(constant_labels, self.label_names, key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f'{self.name}_bucket{{{labels},le="{_number(bound)}"}} {cumulative}'
+            yield f'{self.name}_bucket{{{labels},le="+Inf"}} {count}'
+            yield f"{self.name}_sum{{{labels}}} {_number(total)}"
+            yield f"{self.name}_count{{{labels}}} {count}"
+
+class MetricsRegistry(object):
+    """A set of metrics that are rendered together."""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.constant_labels = {}
+        self._metrics = []
+
+    def counter(self, name: str, documentation: str, label_names: tuple[str, ...] = ()) -> Counter:
+        """Creates a counter in this registry."""
+        metric = Counter(self, name, documentation, label_names)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, label_names: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        """Creates a histogram in this registry."""
+        metric = Histogram(self, name, documentation, label_names, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def set_constant_labels(self, **labels) -> None:
+        """Sets labels that are added to every series, e.g. the entrypoint and policy."""
+        self.constant_labels = { name: str(value) for name, value in labels.items() }
+
+    def drain(self) -> dict:
+        """Returns everything recorded since the last drain, and resets the metrics."""
+        with self.lock:
+            return { metric.name: metric._snapshot(reset=True) for metric in self._metrics } # pylint: disable=protected-access
+
+    def snapshot(self) -> dict:
+        """Returns everything recorded so far, in the same form as `drain`, without resetting the metrics."""
+        with self.lock:
+            return { metric.name: metric._snapshot(reset=False) for metric in self._metrics } # pylint: disable=protected-access
+
+    def aggregate(self, snapshots: list[dict]) -> 'MetricsRegistry':
+        """Returns a new registry with the same metrics and constant labels, holding the sum of the provided snapshots."""
+        aggregate = MetricsRegistry()
+        aggregate.constant_labels = dict(self.constant_labels)
+        aggregate._metrics = [metric._empty(aggregate) for metric in self._metrics] # pylint: disable=protected-access
+        for snapshot in snapshots:
+            aggregate.merge(snapshot)
+        return aggregate
+
+    def merge(self, snapshot: dict) -> None:
+        """Adds the values of a snapshot returned by `drain` (usually in another process) to the metrics."""
+        metrics = { metric.name: metric for metric in self._metrics }
+        with self.lock:
+            for name, values in snapshot.items():
+                if name in metrics:
+                    metrics[name]._merge(values) # pylint: disable=protected-access
+
+    def render(self) -> str:
+        """Returns the metrics in the Prometheus text exposition format."""
+        constant_labels = ",".join(f'{name}="{_escape(value)}"' for name, value in sorted(self.constant_labels.items()))
+        lines = []
+        with self.lock:
+            for metric in self._metrics:
+                lines.extend(metric._render(constant_labels)) # pylint: disable=protected-access
+        return "\n".join(lines) + "\n"
+
+def _labels(constant_labels: str, names: tuple[str, ...], values: tuple[str, ...]) -> str:
+    labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    if constant_labels and labels:
+        return f"{constant_labels},{labels}"
+    return constant_labels or labels
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def path_template(path: str) -> str:
+    """
+    Returns the template of an Abbot API path, replacing identifiers with '{id}' and dropping the query string,
+    so API calls can be counted by endpoint (e.g. '/rooms/C123/topic' becomes '/rooms/{id}/topic').
+    """
+    segments = path.split("?", 1)[0].split("/")
+    return "/".join(
+        segment if i <= 1 or segment in _LITERAL_PATH_SEGMENTS else "{id}"
+        for i, segment in enumerate(segments))
+
+REGISTRY = MetricsRegistry()
+
+PHASE_SECONDS = REGISTRY.histogram(
+    "abbot_runner_phase_seconds",
+    "Time spent in each phase of handling a skill invocation.",
+    ("phase",))
+API_REQUEST_SECONDS = REGISTRY.histogram(
+    "abbot_runner_api_request_seconds",
+    "Time spent on requests to the Abbot API, by method and path template.",
+    ("method", "path"))
+API_REQUESTS = REGISTRY.counter(
+    "abbot_runner_api_requests_total",
+    "Requests to the Abbot API, by method, path template and response status.",
+    ("method", "path", "status"))
+COMPILE_CACHE = REGISTRY.counter(
+    "abbot_runner_compile_cache_total",
+    "Lookups in the compiled skill cache, by result (hit, store_hit or miss).",
+    ("result",))
+ERRORS = REGISTRY.counter(
+    "abbot_runner_errors_total",
+    "Errors reported in skill responses, by errorId.",
+    ("error_id",))
+
+def time_phase(phase: str):
+    """Returns a context manager that records the time spent in the provided phase."""
+    return PHASE_SECONDS.time(phase=phase)
+
+def record_errors(errors: Optional[list]) -> None:
+    """Counts the errors reported in a skill response, which may be dicts or exceptions."""
+    for error in errors or []:
+        if isinstance(error, dict):
+            error_id = error.get("errorId")
+        else:
+            error_id = getattr(error, "errorId", None) or type(error).__name__
+        ERRORS.inc(error_id=error_id or "Unknown")
@@ -0,0 +1,57 @@
+"""
+Locates the NLTK corpora that skills rely on.
+
+The corpora are downloaded when the runner image is built (see the Dockerfiles),
+so at runtime we only check that they're present; we never download them.
+"""
+
+import logging
+import os
+import threading
+
+# The minimum corpora required for NLTK / TextBlob, mapped to the resource path NLTK finds them at.
+MIN_CORPORA = {
+    'brown': 'corpora/brown', # Required for FastNPExtractor
+    'punkt': 'tokenizers/punkt', # Required for WordTokenizer
+    'wordnet': 'corpora/wordnet', # Required for lemmatization
+    'averaged_perceptron_tagger': 'taggers/averaged_perceptron_tagger', # Required for NLTKTagger
+}
+
+# Where the images put the corpora if NLTK_DATA isn't set: next to the SkillRunner package.
+DEFAULT_NLTK_DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))), "nltk_data")
+
+_checked = False
+_lock = threading.Lock()
+
+def ensure_nltk_data(logger: logging.Logger = None) -> list[str]:
+    """
+    Makes the bundled NLTK data directory visible to NLTK and checks the minimum corpora are present.
+    This only does work the first time it's called in a process.
+    Returns the names of any missing corpora, which are logged rather than downloaded.
+    """
+    global _checked # pylint: disable=global-statement
+    if _checked:
+        return []
+
+    with _lock:
+        if _checked:
+            return []
+
+        import nltk # pylint: disable=import-outside-toplevel
+
+        data_dir = os.environ.get("NLTK_DATA", DEFAULT_NLTK_DATA_DIR)
+        if data_dir not in nltk.data.path:
+            nltk.data.path.append(data_dir)
+
+        missing = []
+        for name, resource in MIN_CORPORA.items():
+            try:
+                nltk.data.find(resource)
+            except LookupError:
+                missing.append(name)
+        if missing:
+            (logger or logging.getLogger("NLTK")).warning(
+                "NLTK corpora are missing from the runner image: %s", ", ".join(missing))
+
+        _checked = True
+        return missing
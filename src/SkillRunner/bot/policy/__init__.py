@@ -3,7 +3,10 @@ Implements skill sandboxing policies.
 """
 
 import logging
+import os
+import threading
 
+from types import CodeType
 from typing import Optional, Protocol
 from .restrictive import RestrictivePolicy
 from .unrestricted import UnrestrictedPolicy
@@ -23,8 +26,43 @@ class Policy(Protocol):
         using the provided locals as top-level variables available to the script.
         """
 
+    def compile(self, code: str) -> CodeType:
+        """
+        Compiles the provided Python code under the policy defined by this type, without executing it.
+        """
+
+def configured_policy_name() -> str:
+    """
+    Returns the name of the policy skills should run under, as configured by the
+    ABBOT_SANDBOX_POLICY (or the legacy ABBOT_SANDBOXED) environment variable.
+    """
+    policy_name = os.environ.get("ABBOT_SANDBOX_POLICY")
+    if policy_name is None:
+        if os.environ.get("ABBOT_SANDBOXED") == "false":
+            policy_name = "permissive"
+        else:
+            policy_name = "restrictive"
+    return policy_name
+
+_policies = {}
+_policies_lock = threading.Lock()
+
 def get_policy(name: str, logger: Optional[logging.Logger] = None) -> Policy:
-    """Retrieves the policy with the provided name."""
+    """
+    Retrieves the policy with the provided name.
+    Policies are immutable, so they are built once per process and shared by every caller.
+    """
+    key = (name, logger)
+    policy = _policies.get(key)
+    if policy is None:
+        with _policies_lock:
+            policy = _policies.get(key)
+            if policy is None:
+                policy = _create_policy(name, logger)
+                _policies[key] = policy
+    return policy
+
+def _create_policy(name: str, logger: Optional[logging.Logger]) -> Policy:
     if name == "none":
         return UnrestrictedPolicy(logger)
     elif name == "permissive":
@@ -35,7 +73,7 @@ def get_policy(name: str, logger: Optional[logging.Logger] = None) -> Policy:
         policy = RestrictivePolicy(logger)
         policy.allow_modules(DEFAULT_ALLOWED_MODULES)
         policy.deny_modules(DEFAULT_DENIED_MODULES)
-        return policy
+        return policy.freeze()
 
 DEFAULT_DENIED_MODULES = [
     # Modules that are explicitly disallowed
@@ -0,0 +1,26 @@
+"""
+Pre-populates the compiled skill store from a directory of skill sources.
+Usage: python -m SkillRunner.bot.policy <source-dir> [--policy restrictive]
+"""
+
+import argparse
+
+from . import get_policy
+from .compile_cache import get_compile_cache
+
+def main(argv=None):
+    """Compiles every skill in the provided directory into the store configured by ABBOT_COMPILE_STORE_DIR."""
+    parser = argparse.ArgumentParser(description="Pre-populate the compiled skill store.")
+    parser.add_argument("source_directory", help="A directory of '.py' skill sources to compile.")
+    parser.add_argument("--policy", default="restrictive", help="The sandbox policy to compile the skills under.")
+    args = parser.parse_args(argv)
+
+    store = get_compile_cache().store
+    if store is None:
+        parser.error("ABBOT_COMPILE_STORE_DIR must be set to the directory of the store.")
+
+    count = store.warm(args.source_directory, get_policy(args.policy))
+    print(f"Compiled {count} skills into {store.directory}")
+
+if __name__ == "__main__":
+    main()
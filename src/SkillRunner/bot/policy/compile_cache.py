@@ -0,0 +1,135 @@
+"""
+Implements a process-wide cache of compiled skill code.
+"""
+
+import hashlib
+import os
+import threading
+
+from collections import OrderedDict
+from types import CodeType
+from typing import Callable, Optional
+
+from .compile_store import CompiledSkillStore, create_store_from_env
+from ..metrics import COMPILE_CACHE
+
+DEFAULT_MAX_ENTRIES = 256
+DEFAULT_MAX_SOURCE_BYTES = 32 * 1024 * 1024
+
+def source_hash(code: str) -> str:
+    """Returns the hash used to identify the provided skill source."""
+    return hashlib.sha256(code.encode('utf-8')).hexdigest()
+
+class CompileCache(object):
+    """
+    A bounded, thread-safe LRU cache of compiled code objects.
+
+    Entries are keyed by a hash of the skill source plus a "policy key" describing
+    the compiler configuration, so the same source compiled under different policies
+    never shares an entry.
+    The least-recently used entries are evicted when either the number of entries
+    or the total size of the cached source exceeds the configured limits.
+    If a `store` is provided, misses are looked up in it before compiling,
+    and newly compiled code is written to it.
+    """
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_source_bytes: int = DEFAULT_MAX_SOURCE_BYTES, store: Optional[CompiledSkillStore] = None):
+        self.max_entries = max_entries
+        self.max_source_bytes = max_source_bytes
+        self.store = store
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._source_bytes = 0
+        self._lock = threading.Lock()
+
+    def get_or_compile(self, code: str, policy_key: str, compile_func: Callable[[str], CodeType]) -> CodeType:
+        """
+        Returns the compiled code for the provided source, calling `compile_func` to compile it on a miss.
+        Compilation errors propagate to the caller and are not cached.
+        """
+        if self.max_entries <= 0 and self.store is None:
+            COMPILE_CACHE.inc(result="miss")
+            return compile_func(code)
+
+        key = (source_hash(code), policy_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                COMPILE_CACHE.inc(result="hit")
+                return entry[0]
+            self.misses += 1
+
+        # Load or compile outside the lock, a duplicate compile on a race is harmless.
+        compiled = self.store.load(*key) if self.store is not None else None
+        if compiled is not None:
+            COMPILE_CACHE.inc(result="store_hit")
+        else:
+            COMPILE_CACHE.inc(result="miss")
+            compiled = compile_func(code)
+            if self.store is not None:
+                self.store.save(key[0], key[1], compiled)
+        self._add(key, compiled, len(code))
+        return compiled
+
+    def stats(self) -> dict:
+        """Returns a snapshot of the cache counters."""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "source_bytes": self._source_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        """Removes all entries from the cache and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self._source_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def _add(self, key: tuple, compiled: CodeType, size: int) -> None:
+        if self.max_entries <= 0 or size > self.max_source_bytes:
+            # Either the in-memory cache is disabled, or this is too large to ever fit and shouldn't flush the whole cache.
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return
+            self._entries[key] = (compiled, size)
+            self._source_bytes += size
+            while len(self._entries) > self.max_entries or self._source_bytes > self.max_source_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._source_bytes -= evicted_size
+                self.evictions += 1
+
+def _int_from_env(name: str, default: int) -> int:
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+_compile_cache: Optional[CompileCache] = None
+_compile_cache_lock = threading.Lock()
+
+def get_compile_cache() -> CompileCache:
+    """
+    Returns the process-wide compile cache.
+    The size is configured with the ABBOT_COMPILE_CACHE_SIZE (entries, 0 disables the cache)
+    and ABBOT_COMPILE_CACHE_MAX_BYTES environment variables.
+    The on-disk store is enabled by setting ABBOT_COMPILE_STORE_DIR (see `create_store_from_env`).
+    """
+    global _compile_cache # pylint: disable=global-statement
+    if _compile_cache is None:
+        with _compile_cache_lock:
+            if _compile_cache is None:
+                _compile_cache = CompileCache(
+                    _int_from_env("ABBOT_COMPILE_CACHE_SIZE", DEFAULT_MAX_ENTRIES),
+                    _int_from_env("ABBOT_COMPILE_CACHE_MAX_BYTES", DEFAULT_MAX_SOURCE_BYTES),
+                    create_store_from_env())
+    return _compile_cache
@@ -0,0 +1,158 @@
+"""
+Implements an on-disk store of compiled skill code that survives runner restarts.
+"""
+
+import importlib.util
+import logging
+import marshal
+import os
+import sys
+import tempfile
+import threading
+
+from types import CodeType
+from typing import Optional
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bytecode is only valid for the interpreter that produced it,
+# so each entry starts with the interpreter's magic number and is checked on load.
+_HEADER = importlib.util.MAGIC_NUMBER
+_SUFFIX = ".skillc"
+
+class CompiledSkillStore(object):
+    """
+    Stores compiled skill code in a directory, one file per entry.
+
+    Entries are keyed by the skill source hash, the name of the policy that compiled it,
+    and the Python version, and are only read when the in-memory cache misses.
+    Writes are atomic (write to a temporary file, then rename) so concurrent runners
+    sharing the directory never observe a partial entry.
+    When the directory grows past `max_bytes`, the least-recently used entries are removed.
+    """
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES, logger: Optional[logging.Logger] = None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.logger = logger or logging.getLogger("CompiledSkillStore")
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def load(self, source_hash: str, policy_key: str) -> Optional[CodeType]:
+        """Returns the stored code for the provided key, or None if there isn't a usable entry."""
+        path = self._path(source_hash, policy_key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+
+        if not data.startswith(_HEADER):
+            self._discard(path)
+            return None
+        try:
+            compiled = marshal.loads(data[len(_HEADER):])
+        except (EOFError, ValueError, TypeError):
+            compiled = None
+        if not isinstance(compiled, CodeType):
+            # A corrupt entry can still unmarshal, as something other than code.
+            self.logger.warning("Discarding corrupt compiled skill '%s'", path)
+            self._discard(path)
+            return None
+
+        # Bump the modification time so size-based eviction removes the least-recently used entries first.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return compiled
+
+    def save(self, source_hash: str, policy_key: str, compiled: CodeType) -> None:
+        """Stores compiled code for the provided key. Failures are logged and otherwise ignored."""
+        data = _HEADER + marshal.dumps(compiled)
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(source_hash, policy_key)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            try:
+                # Overwriting an entry (e.g. one saved concurrently by another runner) doesn't grow the store by its whole size.
+                replaced_bytes = os.stat(path).st_size
+            except FileNotFoundError:
+                replaced_bytes = 0
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(temp_path, path)
+            except BaseException:
+                self._discard(temp_path)
+                raise
+        except OSError:
+            self.logger.warning("Failed to store compiled skill '%s'", path, exc_info=True)
+            return
+
+        with self._lock:
+            if self._total_bytes is not None:
+                self._total_bytes += len(data) - replaced_bytes
+            self._enforce_size_cap()
+
+    def warm(self, source_directory: str, policy) -> int:
+        """
+        Compiles every '.py' file in the provided directory under the provided policy,
+        so the entries are in the store before the first request needs them.
+        Returns the number of skills compiled.
+        """
+        count = 0
+        for entry in sorted(os.scandir(source_directory), key=lambda e: e.name):
+            if not entry.is_file() or not entry.name.endswith(".py"):
+                continue
+            with open(entry.path, "r", encoding="utf-8") as f:
+                code = f.read()
+            try:
+                policy.compile(code)
+                count += 1
+            except SyntaxError:
+                self.logger.warning("Skipping skill '%s' because it doesn't compile", entry.path)
+        return count
+
+    def _path(self, source_hash: str, policy_key: str) -> str:
+        return os.path.join(self.directory, f"{policy_key.lower()}-{source_hash}.{sys.implementation.cache_tag}{_SUFFIX}")
+
+    def _discard(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _enforce_size_cap(self) -> None:
+        if self._total_bytes is not None and self._total_bytes <= self.max_bytes:
+            return
+
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._discard(path)
+            total -= size
+        self._total_bytes = total
+
+def create_store_from_env() -> Optional[CompiledSkillStore]:
+    """
+    Creates the store configured by the ABBOT_COMPILE_STORE_DIR and ABBOT_COMPILE_STORE_MAX_BYTES environment variables.
+    Returns None if no directory is configured, which disables the store.
+    """
+    directory = os.environ.get("ABBOT_COMPILE_STORE_DIR")
+    if not directory:
+        return None
+    max_bytes = os.environ.get("ABBOT_COMPILE_STORE_MAX_BYTES")
+    return CompiledSkillStore(directory, int(max_bytes) if max_bytes else DEFAULT_MAX_BYTES)
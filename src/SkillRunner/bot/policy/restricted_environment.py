@@ -1,8 +1,38 @@
 import logging
 import warnings
 import RestrictedPython
+from types import CodeType
 from RestrictedPython import Guards
 
+from .compile_cache import get_compile_cache
+from ..metrics import time_phase
+from ..nltk_data import ensure_nltk_data
+
+_IMPORT_ALLOWED = 1
+_IMPORT_DENIED = 2
+_IMPORT_UNLISTED = 3
+_MAX_IMPORT_DECISIONS = 4096
+
+# Called after skill code first imports one of these top-level modules.
+_FIRST_IMPORT_HOOKS = {
+    "nltk": ensure_nltk_data,
+    "textblob": ensure_nltk_data,
+}
+
+def _compile_restricted(code: str) -> CodeType:
+    return RestrictedPython.compile_restricted(code, filename="skill.py", mode="exec")
+
+def _matches_prefix(module: str, prefixes: frozenset) -> bool:
+    """
+    Checks if the provided module, or any of its dotted-prefixes, is in the provided set of prefixes.
+    """
+    index = module.find('.')
+    while index != -1:
+        if module[:index] in prefixes:
+            return True
+        index = module.find('.', index + 1)
+    return module in prefixes
+
 class PrintCollector:
     """Accepts prints and ignores them."""
 
@@ -37,6 +67,9 @@ class RestrictedEnvironment(object):
         self.logger = logger
         self.allowed_modules = allowed_modules
         self.denied_modules = denied_modules
+        self._allowed_prefixes = frozenset(allowed_modules)
+        self._denied_prefixes = frozenset(denied_modules)
+        self._import_decisions = {}
         self.deny_underscore_attributes = deny_underscore_attributes
 
         def _write_(obj):
@@ -64,27 +97,42 @@ class RestrictedEnvironment(object):
             '__metaclass__': type,
             '__name__': '__abbot_skill__',
         }
-        self.env_globals['__builtins__']['__import__'] = self._handle_import
 
-    def exec(self, code: str, script_globals: dict) -> None:
+        # Each environment gets its own builtins, rather than modifying the ones RestrictedPython shares
+        # with every environment, so skills running concurrently under different policies can't affect each other.
+        # (Skill code can't reach '__builtins__' itself, since RestrictedPython rejects names starting with '_'.)
+        self.env_builtins = {
+            **Guards.safe_builtins,
+            '__import__': self._handle_import,
+        }
+
+    def compile(self, code: str) -> CodeType:
         """
-        Executes the provided Python code in the restricted environment,
-        calling back to the delegate to implement Python built-in functionality.
+        Compiles the provided Python code with RestrictedPython,
+        reusing a previous compilation of the same source if there is one.
         """
-
-        # Compile the code with RestrictedPython
         with warnings.catch_warnings():
             # Ignore warnings when compiling the skill code
             warnings.filterwarnings("ignore", category=SyntaxWarning)
-            compiled = RestrictedPython.compile_restricted(code, filename="skill.py", mode="exec")
+            return get_compile_cache().get_or_compile(code, "Restrictive", _compile_restricted)
 
-            # Merge the environment globals with the script globals
-            # Don't allow the provided globals to override our environment globals though.
-            all_globals = {
-                **script_globals,
-                **self.env_globals,
-            }
+    def exec(self, code: str, script_globals: dict) -> None:
+        """
+        Executes the provided Python code in the restricted environment,
+        calling back to the delegate to implement Python built-in functionality.
+        """
+        with time_phase("compile"):
+            compiled = self.compile(code)
+
+        # Merge the environment globals with the script globals
+        # Don't allow the provided globals to override our environment globals though.
+        all_globals = {
+            **script_globals,
+            **self.env_globals,
+            '__builtins__': self.env_builtins,
+        }
 
+        with time_phase("exec"):
             exec(compiled, all_globals) # pylint: disable=exec-used
 
     def _denies(self, module: str) -> bool:
@@ -92,20 +140,32 @@ class RestrictedEnvironment(object):
         Checks if the provided module is denied by policy.
         A module is denied by policy if it, or any dotted-prefix is denied (i.e. for 'a.b.c', we consider 'a', 'a.b', and 'a.b.c').
         """
-        segments = module.split('.')
-        for i in range(len(segments)):
-            if ".".join(segments[0:i+1]) in self.denied_modules:
-                return True
+        return _matches_prefix(module, self._denied_prefixes)
 
     def _allows(self, module: str) -> bool:
         """
         Checks if the provided module is allowed by policy.
         A module is allowed by policy if it, or any dotted-prefix is allowed (i.e. for 'a.b.c', we consider 'a', 'a.b', and 'a.b.c').
         """
-        segments = module.split('.')
-        for i in range(len(segments)):
-            if ".".join(segments[0:i+1]) in self.allowed_modules:
-                return True
+        return _matches_prefix(module, self._allowed_prefixes)
+
+    def _decide_import(self, module: str) -> int:
+        """
+        Returns the policy decision for importing the provided module, memoizing it for future imports.
+        """
+        decision = self._import_decisions.get(module)
+        if decision is None:
+            if self._denies(module):
+                decision = _IMPORT_DENIED
+            elif self._allows(module):
+                decision = _IMPORT_ALLOWED
+            else:
+                decision = _IMPORT_UNLISTED
+            if len(self._import_decisions) >= _MAX_IMPORT_DECISIONS:
+                # Skills can import arbitrary names, so don't let the memo grow without bound.
+                self._import_decisions.clear()
+            self._import_decisions[module] = decision
+        return decision
 
     def _handle_import(self, name, globals=None, locals=None, fromlist=(), level=0): # pylint: disable=redefined-builtin
         """
@@ -114,13 +174,20 @@ class RestrictedEnvironment(object):
         If the policy allows the module, the import succeeds.
         If the policy doesn't specify the module, the import is logged.
         """
-        if self._denies(name):
+        first_import = name not in self._import_decisions
+        decision = self._decide_import(name)
+        if decision == _IMPORT_DENIED:
             raise PermissionError(f"Module '{name}' is not allowed in skill code. Use a self-hosted runner (https://docs.ab.bot/chatops/custom-runner/) if you need this module.")
-        
-        if not self._allows(name):
+
+        if decision == _IMPORT_UNLISTED:
             self.logger.warning(f"Skill code is importing module '{name}'", extra={"imported_module": name})
 
-        return __import__(name, globals, locals, fromlist, level)
+        module = __import__(name, globals, locals, fromlist, level)
+        if first_import:
+            hook = _FIRST_IMPORT_HOOKS.get(name.partition('.')[0])
+            if hook is not None:
+                hook(self.logger)
+        return module
     
     def _handle_getiter(self, obj: object) -> object:
         """
@@ -3,6 +3,7 @@ Defines the RestrictivePolicy, which uses RestrictedPython to strictly limit wha
 """
 
 import logging
+from types import CodeType
 from typing import Optional
 
 from .restricted_environment import RestrictedEnvironment
@@ -10,12 +11,17 @@ from .restricted_environment import RestrictedEnvironment
 class RestrictivePolicy(object):
     """
     A policy that uses RestrictedPython to strictly limit what the script can do.
+
+    Once configured, a policy can be frozen with `freeze`.
+    A frozen policy can't be modified, and builds its restricted environment once
+    and reuses it for every execution, so it can be shared across requests.
     """
     def __init__(self, logger: Optional[logging.Logger] = None, deny_underscore_attributes = True):
         self.logger = logger or logging.getLogger("RestrictivePolicy")
         self.allowed_modules = []
         self.denied_modules = []
         self.deny_underscore_attributes = deny_underscore_attributes
+        self._environment = None
 
     def name(self) -> str:
         """Returns the name of this policy."""
@@ -24,17 +30,38 @@ class RestrictivePolicy(object):
     def exec(self, code: str, script_locals: dict) -> None:
         """Executes the provided code under the configured policy."""
 
-        # TODO: We could use multiprocessing to run the code in a separate process
-        # But we'd need a way to send results back to the main process
-        # Might be better to just rearchitect to a more general-purpose skill runner instead.
+        # To isolate skills from the server process, run the standalone runner with
+        # ABBOT_RUNNER_EXECUTION=pool, which runs each invocation in a pre-forked worker process.
+        # Executions don't share mutable state, so ABBOT_RUNNER_EXECUTION=threads can run them concurrently in-process.
 
         self._exec_inline(code, script_locals)
-        
+
+    def compile(self, code: str) -> CodeType:
+        """Compiles the provided code under the configured policy, without executing it."""
+        return self._get_environment().compile(code)
+
+    @property
+    def frozen(self) -> bool:
+        """Whether or not this policy has been frozen."""
+        return self._environment is not None
+
+    def freeze(self) -> 'RestrictivePolicy':
+        """
+        Prevents further changes to this policy and builds the restricted environment that every execution will share.
+        Returns this policy.
+        """
+        if not self.frozen:
+            self.allowed_modules = tuple(self.allowed_modules)
+            self.denied_modules = tuple(self.denied_modules)
+            self._environment = self._create_environment()
+        return self
+
     def allow_module(self, module: str):
         """
         Allows access to the provided module when executing code under this policy.
         If the same module is both allowed and denied, the deny will take precedence.
         """
+        self._ensure_not_frozen()
         self.allowed_modules.append(module)
 
     def allow_modules(self, modules: list[str]):
@@ -50,6 +77,7 @@ class RestrictivePolicy(object):
         Denies access to the provided module when executing code under this policy.
         If the same module is both allowed and denied, the deny will take precedence.
         """
+        self._ensure_not_frozen()
         self.denied_modules.append(module)
 
     def deny_modules(self, modules: list[str]):
@@ -60,12 +88,22 @@ class RestrictivePolicy(object):
         for module in modules:
             self.deny_module(module)
 
-    def _exec_inline(self, code: str, script_locals: dict) -> None:
-        restricted_env = RestrictedEnvironment(
+    def _ensure_not_frozen(self):
+        if self.frozen:
+            raise RuntimeError("Cannot modify a frozen policy.")
+
+    def _get_environment(self) -> RestrictedEnvironment:
+        # Frozen policies share one environment, otherwise build one to reflect the current configuration.
+        return self._environment or self._create_environment()
+
+    def _create_environment(self) -> RestrictedEnvironment:
+        return RestrictedEnvironment(
             self.logger.getChild("RestrictedEnvironment"),
             self.allowed_modules,
             self.denied_modules,
             self.deny_underscore_attributes
         )
 
+    def _exec_inline(self, code: str, script_locals: dict) -> None:
+        restricted_env = self._get_environment()
         restricted_env.exec(code, script_locals)
@@ -3,8 +3,12 @@ Defines the Unrestricted policy, which doesn't restrict the skill code in any wa
 """
 
 import logging
+from types import CodeType
 from typing import Optional
 
+from .compile_cache import get_compile_cache
+from ..metrics import time_phase
+
 class UnrestrictedPolicy(object):
     """
     A policy that doesn't restrict the skill code in any way.
@@ -23,5 +27,18 @@ class UnrestrictedPolicy(object):
         using the provided locals as top-level variables available to the script.
         """
 
+        with time_phase("compile"):
+            compiled = self.compile(skill_code)
+
         # We're running outside a sandboxed environment, so go ahead and run the code directly
-        exec(skill_code, script_locals) # pylint: disable=exec-used
+        with time_phase("exec"):
+            exec(compiled, script_locals) # pylint: disable=exec-used
+
+    def compile(self, skill_code: str) -> CodeType:
+        """
+        Compiles the provided Python code, reusing a previous compilation of the same source if there is one.
+        """
+        return get_compile_cache().get_or_compile(skill_code, "Unrestricted", _compile)
+
+def _compile(skill_code: str) -> CodeType:
+    return compile(skill_code, "<string>", "exec")
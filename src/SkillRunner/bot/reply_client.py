@@ -9,7 +9,7 @@ class ReplyClient(object):
     called. Otherwise replies are returned synchrously in the response to the request that
     calls this skill.
     """
-    def __init__(self, api_client, room, thread_id, passive_replies, conversation_reference, skill_id, responses):
+    def __init__(self, api_client, room, thread_id, passive_replies, conversation_reference, skill_id, responses, on_reply=None):
         self._api_client = api_client
         self._room = room
         self._thread_id = thread_id
@@ -17,6 +17,8 @@ class ReplyClient(object):
         self._skill_id = skill_id
         self._reply_url = "/reply"
         self._responses = responses
+        # Called with each passive reply as it's added, so the runner can stream it before the skill finishes.
+        self._on_reply = on_reply
         # passive_replies is true if passive_replies is not nil and not false OR conversation_reference is nil
         self._passive_replies = passive_replies if passive_replies else conversation_reference is None
 
@@ -31,7 +33,7 @@ class ReplyClient(object):
             body = self.__create_reply_payload(response, message_options, [])
             self._api_client.post(self._reply_url, body)
         else:
-            self._responses.append(str(response))
+            self.__add_passive_reply(response)
 
     def reply_with_image(self, image, response, title, title_url, color, message_options):
         if not self._passive_replies:
@@ -46,7 +48,7 @@ class ReplyClient(object):
             ])
             self._api_client.post(self._reply_url, body)
         else:
-            self._responses.append(str(response))
+            self.__add_passive_reply(response)
 
     def reply_with_buttons(self, response, buttons, buttons_label, image_url, title, color, message_options):
         """
@@ -72,7 +74,7 @@ class ReplyClient(object):
             ])
             self._api_client.post(self._reply_url, body)
         else:
-            self._responses.append(str(response))
+            self.__add_passive_reply(response)
 
     def reply_later(self, response, delay_in_seconds, message_options):
         """
@@ -86,7 +88,13 @@ class ReplyClient(object):
             body = self.__create_reply_payload(response, message_options, schedule=delay_in_seconds)
             self._api_client.post(self._reply_url, body)
         else:
-            self._responses.append(str(response))
+            self.__add_passive_reply(response)
+
+    def __add_passive_reply(self, response):
+        message = str(response)
+        self._responses.append(message)
+        if self._on_reply is not None:
+            self._on_reply(message)
 
     def __create_reply_payload(self, response: str, message_options: MessageOptions, attachments: list = [], schedule: int = 0):
         
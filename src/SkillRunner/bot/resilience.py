@@ -0,0 +1,212 @@
+"""
+Keeps transient Abbot API failures from becoming skill failures, and stops calling the API while it's down.
+
+Failed requests are retried with jittered exponential backoff when it's safe to: requests with an idempotent
+method are retried after connection errors, timeouts and 5xx gateway errors, and requests with any method are
+retried after a 429 or 503 (which mean the request wasn't processed), waiting as long as the Retry-After header asks.
+
+A process-wide circuit breaker counts consecutive failures. Once there have been enough of them it opens,
+and requests fail straight away rather than adding to the load on a struggling API. After a cool-down it
+half-opens, letting a single request through to probe whether the API has recovered.
+"""
+
+import email.utils
+import os
+import random
+import threading
+import time
+
+from typing import Callable, Optional
+
+import requests
+
+from .exceptions import ApiError
+from .metrics import REGISTRY
+
+DEFAULT_RETRIES = 2
+DEFAULT_RETRY_BASE_DELAY = 0.1
+DEFAULT_RETRY_MAX_DELAY = 2.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_RESET_TIMEOUT = 10.0
+
+IDEMPOTENT_METHODS = frozenset(["GET", "HEAD", "OPTIONS", "PUT", "DELETE"])
+# Responses that mean the request wasn't processed, so it can be retried whatever its method.
+UNPROCESSED_STATUSES = frozenset([429, 503])
+# Responses that may be transient, so idempotent requests can be retried.
+TRANSIENT_STATUSES = frozenset([500, 502, 503, 504])
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+API_RETRIES = REGISTRY.counter(
+    "abbot_runner_api_retries_total",
+    "Retried requests to the Abbot API, by method and path template.",
+    ("method", "path"))
+
+class RetryPolicy(object):
+    """Decides whether, and after how long, a failed request is retried."""
+    def __init__(self, retries: int = DEFAULT_RETRIES, base_delay: float = DEFAULT_RETRY_BASE_DELAY, max_delay: float = DEFAULT_RETRY_MAX_DELAY):
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @classmethod
+    def from_env(cls) -> 'RetryPolicy':
+        """
+        Returns the retry policy configured by ABBOT_API_RETRIES, ABBOT_API_RETRY_BASE_DELAY and ABBOT_API_RETRY_MAX_DELAY.
+        """
+        return cls(
+            int(os.environ.get("ABBOT_API_RETRIES", DEFAULT_RETRIES)),
+            float(os.environ.get("ABBOT_API_RETRY_BASE_DELAY", DEFAULT_RETRY_BASE_DELAY)),
+            float(os.environ.get("ABBOT_API_RETRY_MAX_DELAY", DEFAULT_RETRY_MAX_DELAY)))
+
+    def delay(self, attempt: int, method: str, response: Optional[requests.Response], error: Optional[Exception], idempotent: Optional[bool] = None) -> Optional[float]:
+        """
+        Returns the seconds to wait before retrying a request that failed on the provided (zero-based) attempt,
+        or None if it shouldn't be retried. `idempotent` overrides whether the request's method is idempotent.
+        """
+        if attempt >= self.retries or not is_retryable(method, response, error, idempotent):
+            return None
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = parse_retry_after(response.headers.get("Retry-After")) if response is not None else None
+        if retry_after is None:
+            return backoff
+        # The server knows better than our backoff, but we won't hold up the skill for longer than max_delay.
+        return retry_after if retry_after <= self.max_delay else None
+
+def is_retryable(method: str, response: Optional[requests.Response], error: Optional[Exception], idempotent: Optional[bool] = None) -> bool:
+    """Returns whether a request that got the provided response (or raised the provided error) can be retried."""
+    if idempotent is None:
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+    if error is not None:
+        return idempotent and isinstance(error, (requests.ConnectionError, requests.Timeout))
+    if response.status_code in UNPROCESSED_STATUSES:
+        return True
+    return idempotent and response.status_code in TRANSIENT_STATUSES
+
+def is_failure(response: Optional[requests.Response], error: Optional[Exception]) -> bool:
+    """Returns whether a request's outcome counts against the API's health (errors other than 4xx client errors)."""
+    if error is not None:
+        return True
+    return response.status_code >= 500 or response.status_code == 429
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Returns the seconds a Retry-After header (in seconds or an HTTP date) asks us to wait, or None if it's missing or invalid."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class CircuitBreaker(object):
+    """
+    Opens after `failure_threshold` consecutive failures, and half-opens `reset_timeout` seconds later
+    to let one request through. It closes again when a request succeeds.
+    """
+    def __init__(self, failure_threshold: int = DEFAULT_BREAKER_THRESHOLD, reset_timeout: float = DEFAULT_BREAKER_RESET_TIMEOUT):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'CircuitBreaker':
+        """Returns the circuit breaker configured by ABBOT_API_BREAKER_THRESHOLD and ABBOT_API_BREAKER_RESET_TIMEOUT."""
+        return cls(
+            int(os.environ.get("ABBOT_API_BREAKER_THRESHOLD", DEFAULT_BREAKER_THRESHOLD)),
+            float(os.environ.get("ABBOT_API_BREAKER_RESET_TIMEOUT", DEFAULT_BREAKER_RESET_TIMEOUT)))
+
+    def allow(self) -> bool:
+        """
+        Returns whether a request may be sent. Every allowed request must be followed by a call to `record`.
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = HALF_OPEN
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record(self, success: bool) -> None:
+        """Records the outcome of an allowed request."""
+        with self._lock:
+            self._probing = False
+            if success:
+                self.state = CLOSED
+                self.consecutive_failures = 0
+                return
+            self.consecutive_failures += 1
+            if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+
+    def status(self) -> dict:
+        """Returns the breaker's state, for the status endpoint."""
+        with self._lock:
+            status = { "state": self.state, "consecutiveFailures": self.consecutive_failures }
+            if self.state == OPEN:
+                status["retryIn"] = max(0.0, round(self.reset_timeout - (time.monotonic() - self.opened_at), 3))
+            return status
+
+_lock = threading.Lock()
+_breaker = None
+_breaker_pid = None
+
+def circuit_breaker() -> CircuitBreaker:
+    """Returns this process's circuit breaker for the Abbot API, creating it on first use."""
+    global _breaker, _breaker_pid # pylint: disable=global-statement
+    with _lock:
+        if _breaker is None or _breaker_pid != os.getpid():
+            # A forked process judges the API's health for itself.
+            _breaker = CircuitBreaker.from_env()
+            _breaker_pid = os.getpid()
+        return _breaker
+
+def send_with_retries(
+    send: Callable[[], requests.Response],
+    method: str,
+    template: str,
+    policy: Optional[RetryPolicy] = None,
+    breaker: Optional[CircuitBreaker] = None,
+    idempotent: Optional[bool] = None) -> requests.Response:
+    """
+    Sends a request with `send`, retrying it according to `policy` and recording its outcomes with `breaker`.
+    `template` is the request's path template, for the metrics, and `idempotent` overrides whether
+    the request's method is safe to repeat (e.g. for a POST that only reads).
+    Returns the last response, which may be an error, or raises the last error.
+    Raises ApiError straight away if the circuit breaker is open.
+    """
+    policy = policy or RetryPolicy.from_env()
+    breaker = breaker or circuit_breaker()
+    attempt = 0
+    while True:
+        if not breaker.allow():
+            raise ApiError("Failed to communicate with Abbot: the API is unavailable.")
+        response = error = None
+        try:
+            response = send()
+        except requests.RequestException as e:
+            error = e
+        finally:
+            breaker.record(response is not None and not is_failure(response, None))
+
+        delay = policy.delay(attempt, method, response, error, idempotent)
+        if delay is None:
+            if error is not None:
+                raise error
+            return response
+        API_RETRIES.inc(method=method, path=template)
+        time.sleep(delay)
+        attempt += 1
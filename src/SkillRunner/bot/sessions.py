@@ -0,0 +1,69 @@
+"""
+Keeps pooled, keep-alive HTTP sessions for calls to the Abbot API.
+
+A session (and its pool of connections) is shared by every ApiClient in the process that calls the same API base URL,
+so a skill's brain, secret, reply and signal calls, and the calls of the skills that run after it, reuse connections
+rather than each paying for a new TCP and TLS handshake. Sessions are safe to use from many threads at once.
+They're never shared across processes: a process that finds sessions created by its parent before a fork
+(e.g. a pre-forked server process or a pool worker) discards them and creates its own.
+"""
+
+import http.cookiejar
+import os
+import threading
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+DEFAULT_POOL_SIZE = 32
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+
+_lock = threading.Lock()
+_sessions = {}
+_sessions_pid = os.getpid()
+
+def pool_size() -> int:
+    """Returns the number of connections kept open to each API base URL, from ABBOT_API_POOL_SIZE."""
+    return int(os.environ.get("ABBOT_API_POOL_SIZE", DEFAULT_POOL_SIZE))
+
+def request_timeout() -> tuple[float, float]:
+    """
+    Returns the (connect, read) timeout of API requests in seconds,
+    from ABBOT_API_CONNECT_TIMEOUT and ABBOT_API_READ_TIMEOUT.
+    """
+    return (
+        float(os.environ.get("ABBOT_API_CONNECT_TIMEOUT", DEFAULT_CONNECT_TIMEOUT)),
+        float(os.environ.get("ABBOT_API_READ_TIMEOUT", DEFAULT_READ_TIMEOUT)))
+
+def get_session(base_url: str) -> requests.Session:
+    """Returns this process's session for the provided API base URL, creating it on first use."""
+    global _sessions_pid # pylint: disable=global-statement
+    with _lock:
+        if _sessions_pid != os.getpid():
+            # Inherited from the parent process, along with the parent's connections. Drop them without closing
+            # them, since closing would shut down connections the parent may still be using.
+            _sessions.clear()
+            _sessions_pid = os.getpid()
+        session = _sessions.get(base_url)
+        if session is None:
+            session = _sessions[base_url] = _create_session()
+        return session
+
+def close_sessions() -> None:
+    """Closes this process's sessions and their connections."""
+    with _lock:
+        sessions = list(_sessions.values()) if _sessions_pid == os.getpid() else []
+        _sessions.clear()
+    for session in sessions:
+        session.close()
+
+def _create_session() -> requests.Session:
+    session = requests.Session()
+    # The session is shared by every skill, so it mustn't carry cookies from one skill's calls to another's.
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size())
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
@@ -1,14 +1,79 @@
+import copy
 import json
+import logging
+import os
+import threading
+import time
 import urllib.parse
 
+from .brain_cache import BRAIN_CACHE
+from .brain_codec import decode_value, encode_value
+from .brain_index import BrainIndex
+from .concurrency import gather
+from .exceptions import ApiError
+
+DEFAULT_BATCH_SIZE = 100
+DEFAULT_PAGE_SIZE = 100
+
+# Marks a key that's been deleted in the write-back buffer.
+_DELETED = object()
+
+# The bulk operations are sent to `/brain/bulk`, in batches:
+#   {"operations": [{"op": "get", "key": "a"}, {"op": "write", "key": "b", "value": "<JSON>"}, {"op": "delete", "key": "c"}]}
+# which responds with a result for each operation, in order:
+#   {"results": [{"key": "a", "status": 200, "value": "<JSON>"}, {"key": "b", "status": 200}, {"key": "c", "status": 404}]}
+# Where the API doesn't have it (it responds with a 404), each operation is sent to `/brain?key=...` instead,
+# concurrently, and we don't try the bulk endpoint again for a while.
+_BULK_PATH = "/brain/bulk"
+BULK_API_RETRY_SECONDS = 300
+_bulk_api_unavailable_until = 0.0
+
+# Items are listed a page at a time from `/brain/items?pageSize=...&prefix=...&keysOnly=true&continuationToken=...`,
+# which responds with the page's items and the token for the next page, which is missing on the last page:
+#   {"items": [{"key": "a", "value": "<JSON>"}, ...], "continuationToken": "..."}
+_ITEMS_PATH = "/brain/items"
+
+# Searches are sent to `/brain/search`, which takes the `term`, `prefix`, `field` and `equals` (as JSON) criteria,
+# and pages like `/brain/items`. Where the API doesn't have it (it responds with a 404), we search an index instead,
+# and don't try the API again for a while.
+_SEARCH_PATH = "/brain/search"
+SEARCH_API_RETRY_SECONDS = 300
+_search_api_unavailable_until = 0.0
+
+def write_back_enabled() -> bool:
+    """Returns whether brain writes are buffered until the end of the invocation, from ABBOT_BRAIN_WRITE_BACK."""
+    return os.environ.get("ABBOT_BRAIN_WRITE_BACK", "false").lower() in ("1", "true")
+
+def default_page_size() -> int:
+    """Returns the number of items fetched in each page when iterating over the brain, from ABBOT_BRAIN_PAGE_SIZE."""
+    return int(os.environ.get("ABBOT_BRAIN_PAGE_SIZE", DEFAULT_PAGE_SIZE))
+
+def batch_size() -> int:
+    """Returns the most operations sent in one bulk brain request, from ABBOT_BRAIN_BATCH_SIZE."""
+    return int(os.environ.get("ABBOT_BRAIN_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+
 class Brain(object):
     """
     Abbot's brain. 
 
     This has already been instantiated for you in ``bot.brain``.
+
+    In write-back mode, writes and deletes are buffered rather than sent straight away, and only the last
+    change to each key is sent when the skill finishes (or calls `flush`). Reads, listings and searches
+    see the buffered changes.
+
+    With a BrainCache, `get` serves values cached by earlier invocations (see `brain_cache`).
+    Large values may be stored compressed (see `brain_codec`).
     """
-    def __init__(self, api_client):
+    def __init__(self, api_client, write_back=False, cache=None):
         self._api_client = api_client
+        self.write_back = write_back
+        self._cache = cache
+        # Maps keys to their pending JSON-serialized values, or _DELETED.
+        self._buffer = {}
+        self._buffer_lock = threading.Lock()
+        # The index searches use when the API can't search, built the first time it's needed.
+        self._index = None
 
     def __get_path(self, key):
         return f"/brain?key={urllib.parse.quote_plus(key)}"
@@ -23,25 +88,212 @@ class Brain(object):
         Returns:
             The string or object stored in Value. This data is JSON serialized.
         """
+        with self._buffer_lock:
+            pending = self._buffer.get(key)
+        if pending is _DELETED:
+            return None
+        if pending is not None:
+            return decode_value(pending)
+
         path = self.__get_path(key)
         try:
+            if self._cache is not None:
+                value = self.__get_cached(key, path)
+                return None if value is None else decode_value(value)
             output = self._api_client.get(path)
             if output:
-                return json.loads(output.get("value"))
+                return decode_value(output.get("value"))
             else:
                 return None
         except Exception:
             return None
 
+    def __get_cached(self, key, path):
+        skill_id = self._api_client.skill_id
+        entry, fresh = self._cache.get(skill_id, key)
+        if fresh:
+            BRAIN_CACHE.inc(result="hit")
+            return entry.value
+        try:
+            modified, output, etag = self._api_client.get_conditional(path, entry.etag if entry is not None else None)
+        except Exception as e:
+            if entry is None or getattr(e, "status_code", None) == 404:
+                self.__invalidate_cache([key])
+                raise
+            # Serve the value we have rather than treating a transient failure (e.g. an open circuit breaker) as a deleted item.
+            logging.getLogger("Brain").warning("Serving a stale cached value for '%s' because revalidating it failed: %s", key, e)
+            BRAIN_CACHE.inc(result="stale")
+            return entry.value
+        if not modified:
+            BRAIN_CACHE.inc(result="revalidated")
+            self._cache.revalidated(skill_id, key, entry)
+            return entry.value
+        BRAIN_CACHE.inc(result="miss")
+        value = output.get("value") if output else None
+        self._cache.put(skill_id, key, value, etag)
+        return value
+
     def read(self, key):
         """
         See `get`.
         """
         return self.get(key)
 
+    def get_many(self, keys):
+        """
+        Get several items from Abbot's brain at once.
+
+        Args:
+            keys (list[str]): The items' keys.
+
+        Returns:
+            dict: The value stored for each key (JSON deserialized), or None if there's no item with that key.
+
+        Raises:
+            ApiError: If any of the items couldn't be read.
+        """
+        values = {}
+        missing = []
+        with self._buffer_lock:
+            for key in keys:
+                pending = self._buffer.get(key)
+                if pending is _DELETED:
+                    values[key] = None
+                elif pending is not None:
+                    values[key] = pending
+                elif key not in values:
+                    values[key] = None
+                    missing.append(key)
+        values = { key: None if value is None else decode_value(value) for key, value in values.items() }
+
+        results = self._bulk([{ "op": "get", "key": key } for key in missing], read_only=True)
+        failed = [result for result in results if result.get("status") not in (200, 404)]
+        if failed:
+            _raise_failed("read", failed)
+        for result in results:
+            if result["status"] == 200 and result.get("value") is not None:
+                values[result["key"]] = decode_value(result["value"])
+        return values
+
     def list(self):
+        """
+        Lists every item in Abbot's brain, in a single request. Use `iterate` for brains with many items.
+        """
+        pending = self.__pending()
         path = self.__get_path("")
-        return self._api_client.get(path)
+        items = self._api_client.get(path)
+        if not pending:
+            return items
+        items = [item for item in items or [] if item.get("key") not in pending]
+        items.extend({ "key": key, "value": value } for key, value in pending.items() if value is not _DELETED)
+        return items
+
+    def iterate(self, prefix=None, keys_only=False, page_size=None):
+        """
+        Iterates over the items in Abbot's brain, fetching them a page at a time as they're needed,
+        so only one page is in memory at once however many items there are.
+
+        Args:
+            prefix (str): Only include items whose keys start with this prefix.
+            keys_only (bool): Yield only the items' keys, without fetching their values.
+            page_size (int): The number of items to fetch in each request. Defaults to 100.
+
+        Yields:
+            The key of each item if `keys_only` is True, otherwise a (key, value) tuple, where the value is JSON deserialized.
+            In write-back mode, items with buffered changes come last.
+        """
+        pending = { key: value for key, value in self.__pending().items() if not prefix or key.startswith(prefix) }
+        query = { "pageSize": page_size or default_page_size() }
+        if prefix:
+            query["prefix"] = prefix
+        if keys_only:
+            query["keysOnly"] = "true"
+        pages = self._pages(_ITEMS_PATH, query, keys_only)
+        return self.__overlay(pages, pending, keys_only) if pending else pages
+
+    def search(self, term=None, prefix=None, field=None, equals=None, keys_only=False):
+        """
+        Searches Abbot's brain for the items that match every provided criterion.
+
+        Args:
+            term (str): Only include items whose keys contain this text (ignoring case).
+            prefix (str): Only include items whose keys start with this prefix.
+            field (str): Only include items whose values are objects with this field.
+            equals (object): Only include items whose `field` has this value.
+            keys_only (bool): Return only the items' keys.
+
+        Returns:
+            list: The matching items' keys if `keys_only` is True, otherwise (key, value) tuples, where the value is JSON deserialized.
+        """
+        global _search_api_unavailable_until # pylint: disable=global-statement
+        if self._index is None and time.monotonic() >= _search_api_unavailable_until:
+            query = { "pageSize": default_page_size() }
+            criteria = { "term": term, "prefix": prefix, "field": field, "equals": None if equals is None else json.dumps(equals) }
+            query.update({ name: value for name, value in criteria.items() if value })
+            if keys_only:
+                query["keysOnly"] = "true"
+            pending = self.__pending()
+            try:
+                found = list(self._pages(_SEARCH_PATH, query, keys_only))
+            except ApiError as e:
+                if e.status_code != 404:
+                    raise
+                _search_api_unavailable_until = time.monotonic() + SEARCH_API_RETRY_SECONDS
+            else:
+                if not pending:
+                    return found
+                # The API only knows what's been sent, so search the buffered changes ourselves.
+                written = BrainIndex((key, decode_value(value)) for key, value in pending.items() if value is not _DELETED)
+                found = [item for item in found if (item if keys_only else item[0]) not in pending]
+                found.extend(key if keys_only else (key, written.get(key)) for key in written.search(term, prefix, field, equals))
+                return sorted(found, key=lambda item: item if keys_only else item[0])
+
+        # The index is kept in step with the skill's changes, buffered or not.
+        if self._index is None:
+            self._index = BrainIndex(self.__all_items())
+        keys = self._index.search(term, prefix, field, equals)
+        # The skill may modify the values it gets back, so give it copies.
+        return keys if keys_only else [(key, copy.deepcopy(self._index.get(key))) for key in keys]
+
+    def __all_items(self):
+        # Lists every item to index, a page at a time or, where the API can't page, in a single request.
+        try:
+            return list(self.iterate())
+        except ApiError as e:
+            if e.status_code != 404:
+                raise
+        return [(item["key"], decode_value(item["value"])) for item in self.list() or []]
+
+    def __pending(self):
+        # Returns a snapshot of the buffered changes.
+        with self._buffer_lock:
+            return dict(self._buffer)
+
+    def __overlay(self, items, pending, keys_only):
+        # Yields listed items with the buffered changes applied: items with changes are replaced by
+        # their buffered values (after the other items), and deleted items are skipped.
+        for item in items:
+            if (item if keys_only else item[0]) not in pending:
+                yield item
+        for key, value in pending.items():
+            if value is not _DELETED:
+                yield key if keys_only else (key, decode_value(value))
+
+    def _pages(self, path, query, keys_only):
+        # Yields the items of each page of a paged listing, fetching the next page when it's needed.
+        query = dict(query)
+        while True:
+            page = self._api_client.get(f"{path}?{urllib.parse.urlencode(query)}", memoize=False) or {}
+            for item in page.get("items") or []:
+                if keys_only:
+                    yield item["key"]
+                else:
+                    value = item.get("value")
+                    yield item["key"], None if value is None else decode_value(value)
+            token = page.get("continuationToken")
+            if not token:
+                return
+            query["continuationToken"] = token
 
     def write(self, key, value):
         """
@@ -53,12 +305,32 @@ class Brain(object):
             key (str): The lookup key for the object.
             value (object): The string or object to store in Abbot's brain. This data is JSON serialized.
         """
-        path = self.__get_path(key)
-        data = {"value": json.dumps(value)}
-        return self._api_client.post(path, data)
+        serialized = encode_value(value)
+        self.__update_index({ key: serialized })
+        if self.write_back:
+            with self._buffer_lock:
+                self._buffer[key] = serialized
+            return None
+        return self.__send_change([key], lambda: self._api_client.post(self.__get_path(key), {"value": serialized}))
 
-    def search(self, term):
-        raise NotImplementedError
+    def write_many(self, items):
+        """
+        Write several items to Abbot's brain at once, overwriting any existing items with the same keys.
+
+        Args:
+            items (dict): The objects to store, by key. They're JSON serialized.
+
+        Returns:
+            dict: Whether each item was saved, by key.
+        """
+        serialized = { key: encode_value(value) for key, value in items.items() }
+        self.__update_index(serialized)
+        if self.write_back:
+            with self._buffer_lock:
+                self._buffer.update(serialized)
+            return { key: True for key in serialized }
+        results = self._bulk([{ "op": "write", "key": key, "value": value } for key, value in serialized.items()])
+        return self.__check_changes(results, "write")
 
     def delete(self, key):
         """
@@ -67,11 +339,163 @@ class Brain(object):
         Args:
             key (str): The lookup key for the object to delete.
         """
+        self.__update_index({ key: _DELETED })
+        if self.write_back:
+            with self._buffer_lock:
+                self._buffer[key] = _DELETED
+            return None
+        return self.__send_change([key], lambda: self._api_client.delete(self.__get_path(key)))
+
+    def delete_many(self, keys):
+        """
+        Delete several items from Abbot's brain at once.
+
+        Args:
+            keys (list[str]): The lookup keys of the objects to delete.
+
+        Returns:
+            dict: Whether each item was deleted (or didn't exist), by key.
+        """
+        self.__update_index({ key: _DELETED for key in keys })
+        if self.write_back:
+            with self._buffer_lock:
+                for key in keys:
+                    self._buffer[key] = _DELETED
+            return { key: True for key in keys }
+        results = self._bulk([{ "op": "delete", "key": key } for key in dict.fromkeys(keys)])
+        return self.__check_changes(results, "delete")
+
+    def flush(self):
+        """
+        Sends the writes and deletes buffered in write-back mode to Abbot's brain.
+        This happens automatically when the skill finishes.
+
+        Raises:
+            ApiError: If any of the changes couldn't be saved. Those changes stay buffered.
+        """
+        with self._buffer_lock:
+            pending = self._buffer
+            self._buffer = {}
+        if not pending:
+            return
+
+        operations = [
+            { "op": "delete", "key": key } if value is _DELETED else { "op": "write", "key": key, "value": value }
+            for key, value in pending.items()
+        ]
+        results = self._bulk(operations)
+        failed = [result for operation, result in zip(operations, results) if not _succeeded(result, operation["op"])]
+        logging.getLogger("Brain").debug("Flushed %d brain changes (%d failed)", len(operations), len(failed))
+        if failed:
+            with self._buffer_lock:
+                # Keep the failed changes, unless the skill has changed those keys again since.
+                for result in failed:
+                    self._buffer.setdefault(result["key"], pending[result["key"]])
+            _raise_failed("save", failed)
+
+    def __update_index(self, changes):
+        # Keeps the search index in step with the skill's changes, so it doesn't need rebuilding,
+        # and forgets cached values for the keys that are changing.
+        self.__invalidate_cache(changes)
+        if self._index is None:
+            return
+        for key, serialized in changes.items():
+            if serialized is _DELETED:
+                self._index.remove(key)
+            else:
+                self._index.set(key, decode_value(serialized))
+
+    def __send_change(self, keys, send):
+        try:
+            return send()
+        except Exception:
+            # The index no longer matches the brain, so build it again the next time it's needed.
+            self._index = None
+            raise
+        finally:
+            # Another invocation may have cached the old value while the change was in flight.
+            self.__invalidate_cache(keys)
+
+    def __invalidate_cache(self, keys):
+        if self._cache is not None:
+            self._cache.invalidate(self._api_client.skill_id, keys)
+
+    def __check_changes(self, results, op):
+        succeeded = { result["key"]: _succeeded(result, op) for result in results }
+        if not all(succeeded.values()):
+            self._index = None
+        return succeeded
+
+    def _bulk(self, operations, read_only=False):
+        """
+        Sends the operations to the bulk endpoint, in batches (sent concurrently), and returns their results in order.
+        The results of a batch that fails, or whose response doesn't have one result per operation in order, have no status, and the error.
+        Where the API has no bulk endpoint, the operations are sent one at a time (concurrently) instead.
+        """
+        global _bulk_api_unavailable_until # pylint: disable=global-statement
+        size = batch_size()
+        batches = [operations[i:i + size] for i in range(0, len(operations), size)]
+
+        def send(batch):
+            response = self._api_client.post(_BULK_PATH, { "operations": batch }, read_only=read_only)
+            results = response.get("results") if isinstance(response, dict) else None
+            # Results are matched to operations by position, so anything else fails the batch.
+            if not isinstance(results, list) or [result.get("key") if isinstance(result, dict) else None for result in results] != [operation["key"] for operation in batch]:
+                raise ApiError("Failed to communicate with Abbot: unexpected bulk response.")
+            return results
+
+        results = []
+        if time.monotonic() < _bulk_api_unavailable_until:
+            results = self.__send_each(operations)
+            batches = []
+        for batch, batch_results in zip(batches, gather(*[lambda batch=batch: send(batch) for batch in batches], return_exceptions=True)):
+            if isinstance(batch_results, ApiError) and batch_results.status_code == 404:
+                _bulk_api_unavailable_until = time.monotonic() + BULK_API_RETRY_SECONDS
+                results.extend(self.__send_each(batch))
+            elif isinstance(batch_results, Exception):
+                results.extend({ "key": operation["key"], "status": None, "error": batch_results } for operation in batch)
+            else:
+                results.extend(batch_results)
+        if not read_only:
+            self.__invalidate_cache([operation["key"] for operation in operations])
+        return results
+
+    def __send_each(self, operations):
+        # Sends each operation to the single item endpoint, and returns their results as the bulk endpoint would.
+        return gather(*[lambda operation=operation: self.__send_one(operation) for operation in operations])
+
+    def __send_one(self, operation):
+        key = operation["key"]
         path = self.__get_path(key)
-        return self._api_client.delete(path)
+        try:
+            if operation["op"] == "get":
+                output = self._api_client.get(path)
+                if not output:
+                    return { "key": key, "status": 404 }
+                return { "key": key, "status": 200, "value": output.get("value") }
+            if operation["op"] == "write":
+                self._api_client.post(path, { "value": operation["value"] })
+            else:
+                self._api_client.delete(path)
+            return { "key": key, "status": 200 }
+        except ApiError as e:
+            if e.status_code == 404:
+                return { "key": key, "status": 404 }
+            return { "key": key, "status": e.status_code, "error": e }
 
     def __str__(self):
         return "Brain for the skill."
 
     def __repr__(self):
-        return "Brain for the skill."
\ No newline at end of file
+        return "Brain for the skill."
+
+def _succeeded(result, op):
+    status = result.get("status")
+    # Deleting an item that doesn't exist leaves the brain as the skill wanted.
+    return status is not None and (200 <= status < 300 or (op == "delete" and status == 404))
+
+def _raise_failed(action, failed):
+    error = next((result["error"] for result in failed if "error" in result), None)
+    status_code = next((result["status"] for result in failed if result.get("status") is not None), getattr(error, "status_code", None))
+    keys = ", ".join(result["key"] for result in failed)
+    raise ApiError(f"Failed to {action} {len(failed)} brain item(s): {keys}", status_code) from error
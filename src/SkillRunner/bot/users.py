@@ -2,6 +2,7 @@ import urllib.parse
 
 from .mention import UserMessageTarget, UserProfile
 from .apiclient import ApiClient
+from .concurrency import gather
 
 class Users(object):
     """
@@ -39,4 +40,18 @@ class Users(object):
             UserProfile: The user profile.
         """
         response = self._api_client.get(f"/users/{urllib.parse.quote_plus(user_id)}")
-        return UserProfile.from_json(response)
\ No newline at end of file
+        return UserProfile.from_json(response)
+
+    def get_users(self, user_ids: list[str], max_concurrency: int = None) -> list[UserProfile]:
+        """
+        Gets the profiles of several users at once, given their platform-specific IDs.
+        The profiles are looked up concurrently, so this takes about as long as looking up one.
+
+        Args:
+            user_ids (list[str]): The platform-specific IDs of the users.
+            max_concurrency (int): The most lookups to make at once. Defaults to (and can't be more than) 8.
+
+        Returns:
+            list[UserProfile]: The user profiles, in the same order as the IDs.
+        """
+        return gather(*[lambda user_id=user_id: self.get_user(user_id) for user_id in user_ids], max_concurrency=max_concurrency)
@@ -0,0 +1,3 @@
+"""
+Infrastructure for hosting the skill runner: executing skills on behalf of a server, and managing the processes that do it.
+"""
@@ -0,0 +1,162 @@
+"""
+Limits how many skill invocations a server process runs at once, shedding the load it can't handle.
+
+Requests beyond the concurrency limit wait in a bounded queue for up to a deadline.
+Requests that find the queue full, or are still waiting at the deadline, are rejected straight away
+so the caller can retry elsewhere (the servers respond with a 503 and a Retry-After header),
+rather than every request slowing down together until callers time out.
+"""
+
+import asyncio
+import collections
+import os
+import threading
+import time
+
+from typing import Optional
+
+from ..bot.metrics import PHASE_SECONDS, REGISTRY
+
+REJECTED = REGISTRY.counter(
+    "abbot_runner_rejected_total",
+    "Requests rejected by admission control, by reason (queue_full or queue_timeout).",
+    ("reason",))
+
+class AdmissionController(object):
+    """
+    Admits up to `max_in_flight` concurrent requests, queueing up to `max_queue` more for at most `queue_timeout` seconds.
+    Use `acquire` and `release` from request threads.
+    """
+    def __init__(self, max_in_flight: int, max_queue: int = 0, queue_timeout: float = 5, retry_after: int = 1):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.queued = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> bool:
+        """
+        Admits a request, waiting in the queue if the server is at capacity.
+        Returns False if the request should be rejected. Admitted requests must call `release` when they're done.
+        """
+        with self._condition:
+            if self.in_flight < self.max_in_flight and self.queued == 0:
+                self.in_flight += 1
+                return True
+            if self.queued >= self.max_queue:
+                REJECTED.inc(reason="queue_full")
+                return False
+
+            self.queued += 1
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        REJECTED.inc(reason="queue_timeout")
+                        return False
+                    self._condition.wait(remaining)
+                self.in_flight += 1
+            finally:
+                self.queued -= 1
+            PHASE_SECONDS.observe(time.monotonic() - started, phase="queue")
+            return True
+
+    def release(self) -> None:
+        """Marks an admitted request as done, admitting the next queued request if there is one."""
+        with self._condition:
+            self.in_flight -= 1
+            self._condition.notify()
+
+    def status(self) -> dict:
+        """Returns the current load, for the status endpoint."""
+        return _status(self)
+
+class AsyncAdmissionController(object):
+    """
+    The asyncio equivalent of AdmissionController, for requests handled on an event loop.
+    Use `acquire` and `release` from the event loop's thread.
+    """
+    def __init__(self, max_in_flight: int, max_queue: int = 0, queue_timeout: float = 5, retry_after: int = 1):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self._waiters = collections.deque()
+
+    @property
+    def queued(self) -> int:
+        """The number of requests waiting to be admitted."""
+        return len(self._waiters)
+
+    async def acquire(self) -> bool:
+        """
+        Admits a request, waiting in the queue if the server is at capacity.
+        Returns False if the request should be rejected. Admitted requests must call `release` when they're done.
+        """
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            REJECTED.inc(reason="queue_full")
+            return False
+
+        # A releasing request hands its slot straight to the first waiter, so in_flight doesn't change.
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            REJECTED.inc(reason="queue_timeout")
+            return False
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # We were handed a slot just as the request was cancelled, so pass it on.
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+        PHASE_SECONDS.observe(time.monotonic() - started, phase="queue")
+        return True
+
+    def release(self) -> None:
+        """Marks an admitted request as done, admitting the next queued request if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def status(self) -> dict:
+        """Returns the current load, for the status endpoint."""
+        return _status(self)
+
+def _status(controller) -> dict:
+    return {
+        "inFlight": controller.in_flight,
+        "queueDepth": controller.queued,
+        "maxInFlight": controller.max_in_flight,
+        "maxQueueDepth": controller.max_queue,
+    }
+
+def create_admission_controller_from_env(controller_type: type = AdmissionController) -> Optional[AdmissionController]:
+    """
+    Creates the admission controller configured by the environment, or returns None if admission control is disabled.
+    It's enabled by setting ABBOT_RUNNER_MAX_IN_FLIGHT, and configured by ABBOT_RUNNER_MAX_QUEUE,
+    ABBOT_RUNNER_QUEUE_TIMEOUT and ABBOT_RUNNER_RETRY_AFTER.
+    """
+    max_in_flight = os.environ.get("ABBOT_RUNNER_MAX_IN_FLIGHT")
+    if not max_in_flight:
+        return None
+    return controller_type(
+        int(max_in_flight),
+        int(os.environ.get("ABBOT_RUNNER_MAX_QUEUE", 0)),
+        float(os.environ.get("ABBOT_RUNNER_QUEUE_TIMEOUT", 5)),
+        int(os.environ.get("ABBOT_RUNNER_RETRY_AFTER", 1)))
@@ -0,0 +1,85 @@
+"""
+Runs a batch of skill invocations received in a single request.
+"""
+
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Union
+
+from .encoding import SKILL_RUN_RESPONSE_FIELDS, encode_responses
+from .execution import SkillRunResponse
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_SIZE = 100
+
+# An invocation's arguments for `run_skill` (body, api token, trace parent).
+Invocation = tuple[dict, Optional[str], Optional[str]]
+
+def batch_max_concurrency() -> int:
+    """Returns the number of a batch's invocations that run at once, from ABBOT_RUNNER_BATCH_CONCURRENCY."""
+    return int(os.environ.get("ABBOT_RUNNER_BATCH_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+
+def batch_max_size() -> int:
+    """Returns the largest number of invocations a batch may contain, from ABBOT_RUNNER_BATCH_MAX_SIZE."""
+    return int(os.environ.get("ABBOT_RUNNER_BATCH_MAX_SIZE", DEFAULT_MAX_SIZE))
+
+def parse_batch(items, api_token: Optional[str], trace_parent: Optional[str]) -> list[Union[Invocation, SkillRunResponse]]:
+    """
+    Parses the body of a batch request, a JSON array of invocations.
+
+    Each invocation is the body `/api/v1/execute` accepts, and may also have its own "SkillApiToken"
+    and "TraceParent", which otherwise default to the request's `X-Abbot-SkillApiToken` and `traceparent` headers.
+    Returns an entry per item: the invocation, or a failed response if the item isn't a valid invocation.
+    Raises ValueError if the body isn't an array, or has more than ABBOT_RUNNER_BATCH_MAX_SIZE items.
+    """
+    if not isinstance(items, list):
+        raise ValueError("The request body must be an array of skill invocations.")
+    max_size = batch_max_size()
+    if len(items) > max_size:
+        raise ValueError(f"A batch may contain at most {max_size} skill invocations.")
+
+    invocations = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            response = SkillRunResponse()
+            response.add_error({ "errorId": "InvalidInvocation", "description": f"Item {index} is not a skill invocation." })
+            invocations.append(response)
+        else:
+            invocations.append((item, item.get("SkillApiToken", api_token), item.get("TraceParent", trace_parent)))
+    return invocations
+
+def run_batch(
+    invocations: list[Union[Invocation, SkillRunResponse]],
+    run: Callable[[dict, Optional[str], Optional[str]], SkillRunResponse],
+    max_concurrency: Optional[int] = None,
+    logger: Optional[logging.Logger] = None) -> list[SkillRunResponse]:
+    """
+    Runs the provided invocations (as returned by `parse_batch`) with `run`, up to `max_concurrency` at once,
+    and returns their responses in the same order.
+    A failure running one invocation is reported in its response and doesn't affect the others.
+    """
+    logger = logger or logging.getLogger("Batch")
+    max_concurrency = max_concurrency or batch_max_concurrency()
+
+    def run_one(invocation):
+        if isinstance(invocation, SkillRunResponse):
+            return invocation
+        try:
+            return run(*invocation)
+        except Exception as e: # pylint: disable=broad-except
+            logger.exception("Failed to run skill invocation")
+            response = SkillRunResponse()
+            response.add_error({ "errorId": type(e).__name__, "description": str(e) })
+            return response
+
+    pending = [i for i in invocations if not isinstance(i, SkillRunResponse)]
+    if len(pending) <= 1:
+        return [run_one(i) for i in invocations]
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(pending)), thread_name_prefix="batch") as executor:
+        return list(executor.map(run_one, invocations))
+
+def encode_batch(responses: list[SkillRunResponse]) -> bytes:
+    """Returns the UTF-8 JSON array of the provided responses."""
+    return encode_responses(responses, SKILL_RUN_RESPONSE_FIELDS)
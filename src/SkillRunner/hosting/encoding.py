@@ -0,0 +1,67 @@
+"""
+Encodes the responses the runner sends back to Abbot.
+
+Both the standalone runner's SkillRunResponse and the Azure Function's ResponseManager are
+encoded from a fixed list of fields straight to UTF-8 JSON bytes, in a single pass of the C
+JSON encoder, rather than by reflecting over the objects. Errors may be dicts or exceptions;
+InterpreterErrors keep their line and span information.
+"""
+
+import json
+
+from typing import Any
+
+from ..bot.exceptions import InterpreterError
+
+# The fields of each response type, in the order they're written.
+SKILL_RUN_RESPONSE_FIELDS = ("contentType", "content", "success", "errors", "replies", "headers", "outputs")
+RESPONSE_MANAGER_FIELDS = ("ContentType", "Content", "Success", "Errors", "Replies", "Headers")
+
+def encode_error(error) -> dict:
+    """Returns the serialized form of an error reported in a response."""
+    if isinstance(error, InterpreterError):
+        return {
+            "errorId": error.errorId,
+            "lineStart": error.lineStart,
+            "lineEnd": error.lineEnd,
+            "spanStart": error.spanStart,
+            "spanEnd": error.spanEnd,
+            "description": error.description,
+        }
+    if isinstance(error, Exception):
+        return { "errorId": type(error).__name__, "description": str(error) }
+    return error
+
+def _default(o: Any):
+    # Called for values the JSON encoder doesn't handle itself, e.g. an exception or an object a skill put in its outputs.
+    if isinstance(o, Exception):
+        return encode_error(o)
+    if hasattr(o, "__dict__"):
+        return o.__dict__
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+_encoder = json.JSONEncoder(separators=(",", ":"), default=_default)
+
+def encode_json(value: Any) -> bytes:
+    """Encodes the provided value as UTF-8 JSON."""
+    return _encoder.encode(value).encode("utf-8")
+
+def encode_response(response, fields: tuple[str, ...]) -> bytes:
+    """
+    Encodes the provided fields of a response object as UTF-8 JSON.
+    A field named "errors" (in any case) holds errors, which are encoded with `encode_error`.
+    """
+    return encode_json(_response_dict(response, fields))
+
+def encode_responses(responses: list, fields: tuple[str, ...]) -> bytes:
+    """Encodes the provided fields of each of a list of response objects as a UTF-8 JSON array."""
+    return encode_json([_response_dict(response, fields) for response in responses])
+
+def _response_dict(response, fields: tuple[str, ...]) -> dict:
+    values = {}
+    for field in fields:
+        value = getattr(response, field)
+        if value and field.lower() == "errors":
+            value = [encode_error(e) for e in value]
+        values[field] = value
+    return values
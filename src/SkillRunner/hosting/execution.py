@@ -0,0 +1,98 @@
+"""
+Runs a skill invocation and builds the response the runner sends back to Abbot.
+"""
+
+import logging
+
+from typing import Callable, Optional
+
+from ..bot.bot import Bot
+from ..bot import exceptions
+from ..bot.metrics import time_phase
+from .encoding import SKILL_RUN_RESPONSE_FIELDS, encode_response
+
+class SkillRunResponse:
+    """
+    Body of the response when calling a skill via the skill editor or the abbot cli.
+    This maps to the C# SkillRunResponse class.
+    """
+    def __init__(self):
+        self.contentType = None
+        self.content = None
+        self.success = True
+        self.errors = []
+        self.replies = []
+        self.headers = None
+        self.outputs = None
+
+    def add_reply(self, message):
+        """
+        Adds a reply to the response
+        """
+        self.replies.append(message)
+
+    def add_error(self, error):
+        """
+        Adds an error to the response
+        """
+        self.errors.append(error)
+        self.success = False
+
+    def encode(self) -> bytes:
+        """
+        Returns the UTF-8 JSON representation of the response
+        """
+        return encode_response(self, SKILL_RUN_RESPONSE_FIELDS)
+
+    def toJSON(self):
+        """
+        Returns a JSON representation of the response
+        """
+        return self.encode().decode("utf-8")
+
+def run_skill(body: dict, api_token: Optional[str], trace_parent: Optional[str], logger: Optional[logging.Logger] = None, on_reply: Optional[Callable[[str], None]] = None) -> SkillRunResponse:
+    """
+    Runs the skill invocation described by the provided request body, and returns the response.
+    Errors raised by the skill are reported in the response rather than raised.
+    If provided, `on_reply` is called with each reply that's returned in the response, as soon as the skill sends it.
+    """
+    logger = logger or logging.getLogger("Bot")
+    response = SkillRunResponse()
+
+    try:
+        with time_phase("bot_init"):
+            bot = Bot(body, api_token, trace_parent, logger, on_reply)
+    except Exception as e:
+        logger.exception("Invalid skill invocation")
+        response.add_error({ "errorId": type(e).__name__, "description": str(e) })
+        return response
+
+    logger.debug("Running user skill")
+    try:
+        bot.run_user_script()
+    except exceptions.InterpreterError as e:
+        response.add_error(e)
+    except Exception as e:
+        logging.error(e)
+        response.add_error({ "errorId": type(e).__name__, "description": str(e) })
+    flush_error = bot._flush_error # pylint: disable=protected-access
+    if flush_error is not None:
+        response.add_error({ "errorId": type(flush_error).__name__, "description": str(flush_error) })
+
+    logger.debug(f"Received {len(bot.responses)} responses")
+    for reply in bot.responses:
+        response.add_reply(reply)
+
+    response.outputs = {}
+    for key, value in bot.outputs.items():
+        response.outputs[key] = value
+
+    if bot.is_request:
+        response.content = bot.response.raw_content
+        response.contentType = bot.response.content_type
+        headers = {}
+        for key, value in bot.response.headers.items():
+            headers[key] = [value]
+        response.headers = headers
+
+    return response
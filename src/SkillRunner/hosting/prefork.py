@@ -0,0 +1,235 @@
+"""
+Implements a pre-forking HTTP server for running the standalone runner in production.
+"""
+
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+
+from typing import Callable, Optional
+
+from werkzeug.exceptions import InternalServerError
+from werkzeug.serving import WSGIRequestHandler, make_server
+from werkzeug.wsgi import LimitedStream
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """
+    A WSGI request handler that keeps HTTP/1.1 connections open between requests.
+
+    Werkzeug's handler always sends "Connection: close", because it can't know how much of
+    the request body the app read. We bound the body by its Content-Length and drain whatever
+    the app didn't read, so the next request on the connection starts in the right place.
+    Responses without a Content-Length are sent with chunked transfer encoding.
+    """
+    protocol_version = "HTTP/1.1"
+
+    def run_wsgi(self):
+        if self.headers.get("Expect", "").lower().strip() == "100-continue":
+            self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        environ = self.make_environ()
+        request_body = None
+        if environ.get("wsgi.input_terminated"):
+            # We can't tell where a chunked request body ends if the app doesn't read it all.
+            self.close_connection = True
+        else:
+            request_body = LimitedStream(self.rfile, int(environ.get("CONTENT_LENGTH") or 0))
+            environ["wsgi.input"] = request_body
+
+        response = { "status": None, "headers": None, "sent": False, "chunked": False }
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info is not None and response["sent"]:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"] = status
+            response["headers"] = headers
+            return write
+
+        def write(data: bytes):
+            if not response["sent"]:
+                response["sent"] = True
+                code, _, message = response["status"].partition(" ")
+                self.send_response(int(code), message)
+                header_keys = set()
+                for key, value in response["headers"]:
+                    self.send_header(key, value)
+                    header_keys.add(key.lower())
+                if "content-length" not in header_keys and environ["REQUEST_METHOD"] != "HEAD" and int(code) not in (204, 304):
+                    response["chunked"] = True
+                    self.send_header("Transfer-Encoding", "chunked")
+                if self.close_connection:
+                    self.send_header("Connection", "close")
+                self.end_headers()
+            if data:
+                if response["chunked"]:
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                else:
+                    self.wfile.write(data)
+
+        app_iter = None
+        try:
+            app_iter = self.server.app(environ, start_response)
+            for data in app_iter:
+                write(data)
+            if not response["sent"]:
+                write(b"")
+            if response["chunked"]:
+                self.wfile.write(b"0\r\n\r\n")
+        except (ConnectionError, TimeoutError):
+            self.close_connection = True
+            return
+        except Exception: # pylint: disable=broad-except
+            self.server.log("error", "Error on request:\n%s", traceback.format_exc())
+            self.close_connection = True
+            if not response["sent"]:
+                # Nothing has been sent yet, so we can still send a proper error response.
+                for data in InternalServerError()(environ, start_response):
+                    write(data)
+            return
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+
+        if request_body is not None:
+            request_body.exhaust()
+
+class PreforkServer(object):
+    """
+    Serves a WSGI app from a fixed number of forked worker processes that share one listening socket.
+
+    The parent process binds the socket and loads the app (along with anything `preload` warms up),
+    then forks `workers` children that inherit both, so the app is only imported once and its memory
+    is shared copy-on-write.
+    Each child runs a threaded HTTP/1.1 server, so connections are kept alive between requests
+    until they've been idle for `keepalive_timeout` seconds.
+    The parent supervises the children, replacing any that exit, and on SIGTERM or SIGINT asks them
+    to stop, waiting up to `graceful_timeout` seconds before killing them.
+    If provided, `on_worker_exit` is called in the parent with the pid of each child that exits.
+    """
+    def __init__(self, app, host: str, port: int, workers: int, keepalive_timeout: float = 75, graceful_timeout: float = 30, preload: Optional[Callable[[], None]] = None, logger: Optional[logging.Logger] = None, on_worker_exit: Optional[Callable[[int], None]] = None):
+        self.app = app
+        self.on_worker_exit = on_worker_exit
+        self.workers = workers
+        self.keepalive_timeout = keepalive_timeout
+        self.graceful_timeout = graceful_timeout
+        self.preload = preload
+        self.logger = logger or logging.getLogger("PreforkServer")
+        self.socket = socket.create_server((host, port), family=socket.AF_INET6 if ":" in host else socket.AF_INET, backlog=2048)
+        self.socket.set_inheritable(True)
+        self.host = host
+        self.port = self.socket.getsockname()[1]
+        self._children = {}
+        self._stopping = False
+
+    def serve_forever(self):
+        """Forks the workers and supervises them until the server is asked to stop."""
+        if self.preload is not None:
+            self.preload()
+
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        signal.signal(signal.SIGINT, self._handle_stop)
+
+        self.logger.info("Listening on %s:%s with %s workers", self.host, self.port, self.workers)
+        for _ in range(self.workers):
+            self._spawn()
+
+        while not self._stopping:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            started = self._children.pop(pid, None)
+            self._worker_exited(pid)
+            if not self._stopping:
+                self.logger.warning("Worker %s exited with status %s, replacing it.", pid, status)
+                if started is not None and time.monotonic() - started < 1:
+                    # Don't spin if workers are failing as soon as they start.
+                    time.sleep(1)
+                self._spawn()
+
+        self._stop_children()
+        self.socket.close()
+
+    def _spawn(self):
+        pid = os.fork()
+        if pid != 0:
+            self._children[pid] = time.monotonic()
+            return
+
+        # We're in the child: serve requests until the parent asks us to stop.
+        exit_code = 0
+        try:
+            self._serve_in_child()
+        except BaseException: # pylint: disable=broad-except
+            self.logger.exception("Worker %s failed", os.getpid())
+            exit_code = 1
+        finally:
+            os._exit(exit_code) # pylint: disable=protected-access
+
+    def _serve_in_child(self):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        handler = type("KeepAliveRequestHandler", (KeepAliveRequestHandler,), {
+            # Applies to every read on the connection, so idle keep-alive connections are closed after this long.
+            "timeout": self.keepalive_timeout,
+        })
+        server = make_server(self.host, self.port, self.app, threaded=True, request_handler=handler, fd=self.socket.fileno())
+        # Let in-flight requests finish when we're stopped, server_close() waits for them.
+        server.daemon_threads = False
+        signal.signal(signal.SIGTERM, lambda *_: _shutdown_from_signal(server))
+        server.serve_forever()
+        server.server_close()
+
+    def _handle_stop(self, signum, _frame):
+        if self._stopping:
+            return
+        self._stopping = True
+        self.logger.info("Received signal %s, stopping workers.", signum)
+        self._signal_children(signal.SIGTERM)
+
+    def _stop_children(self):
+        deadline = time.monotonic() + self.graceful_timeout
+        while self._children and time.monotonic() < deadline:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                break
+            if pid == 0:
+                time.sleep(0.1)
+            else:
+                self._children.pop(pid, None)
+                self._worker_exited(pid)
+
+        if self._children:
+            self.logger.warning("Killing %s workers that didn't stop within %s seconds.", len(self._children), self.graceful_timeout)
+            self._signal_children(signal.SIGKILL)
+            for pid in list(self._children):
+                try:
+                    os.waitpid(pid, 0)
+                except ChildProcessError:
+                    pass
+                self._worker_exited(pid)
+            self._children.clear()
+
+    def _worker_exited(self, pid: int):
+        if self.on_worker_exit is None:
+            return
+        try:
+            self.on_worker_exit(pid)
+        except Exception: # pylint: disable=broad-except
+            self.logger.exception("Failed to clean up after worker %s", pid)
+
+    def _signal_children(self, signum):
+        for pid in list(self._children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                self._children.pop(pid, None)
+
+def _shutdown_from_signal(server):
+    # shutdown() waits for serve_forever() to return, so it can't be called from the thread running it.
+    threading.Thread(target=server.shutdown, daemon=True).start()
@@ -0,0 +1,48 @@
+"""
+Settings shared by the standalone runner's entry points (runner.py and runner_asgi.py).
+"""
+
+import os
+
+from typing import Optional
+
+def runner_env() -> str:
+    """Returns the environment the runner is running in, from ABBOT_ENV."""
+    return os.environ.get("ABBOT_ENV", "production")
+
+def load_runner_secret() -> str:
+    """
+    Returns the shared secret callers must present, from ABBOT_SKILL_RUNNER_TOKEN.
+    Raises if it isn't set, or is too short outside of development.
+    """
+    secret = os.environ.get("ABBOT_SKILL_RUNNER_TOKEN")
+    if secret is None:
+        raise Exception("ABBOT_SKILL_RUNNER_TOKEN environment variable not set")
+    if len(secret) < 64 and runner_env() != "dev":
+        raise Exception("ABBOT_SKILL_RUNNER_TOKEN is too short")
+    return secret
+
+def load_branch_info(directory: str) -> dict:
+    """
+    Reads the branch and commit the runner was built from, from the build_info.txt file in the provided directory.
+    """
+    # pylint: disable=bare-except
+    try:
+        with open(os.path.join(directory, "build_info.txt"), "r", encoding='utf-8') as f:
+            lines = f.readlines()
+            return { "branch": lines[0], "sha": lines[1] }
+    except:
+        # Ignore all failures
+        return { "branch": "<unknown>", "sha": "<unknown>" }
+    # pylint: enable=bare-except
+
+def parse_token(authorization_header: Optional[str], code: Optional[str]) -> Optional[str]:
+    """
+    Retrieves the auth token from either the Authorization header or the 'code' query string parameter
+    (The latter of which is intended only to emulate Azure Functions)
+    """
+    if authorization_header is not None:
+        splat = authorization_header.split(' ')
+        if len(splat) == 2 and splat[0] == "Bearer":
+            return splat[1]
+    return code
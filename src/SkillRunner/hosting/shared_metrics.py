@@ -0,0 +1,115 @@
+"""
+Shares metrics between the pre-forked server processes, so a scrape reports the whole server.
+
+Metrics are recorded in the process that serves each request, and a scrape reaches whichever process
+accepts it. So each process publishes a snapshot of its metrics to a file in a directory the processes share,
+every `interval` seconds and whenever it's scraped, and renders the sum of every process's snapshot.
+When a process exits, the server folds its snapshot into a total of every exited process's metrics (see `retire`),
+so their counts aren't lost when they're replaced, and the directory doesn't grow.
+A forked process discards the metrics it inherited when it starts publishing, so they aren't counted twice.
+"""
+
+import contextlib
+import fcntl
+import logging
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+
+from typing import Optional
+
+from ..bot.metrics import MetricsRegistry
+
+DEFAULT_INTERVAL = 1.0
+_SUFFIX = ".metrics"
+# The sum of the metrics of every process that has exited.
+_RETIRED = "retired" + _SUFFIX
+# Held shared while reading snapshots, and exclusively while folding a process's snapshot into the total,
+# so a scrape never sees a process's metrics both in its own snapshot and the total, or in neither.
+_LOCK = ".lock"
+
+class SharedMetrics(object):
+    """Publishes a registry's metrics to `directory`, and renders the metrics of every process that publishes there."""
+    def __init__(self, registry: MetricsRegistry, directory: str, interval: float = DEFAULT_INTERVAL, logger: Optional[logging.Logger] = None):
+        self.registry = registry
+        self.directory = directory
+        self.interval = interval
+        self.logger = logger or logging.getLogger("SharedMetrics")
+        self._lock = threading.Lock()
+        self._path = None
+        self._pid = None
+        self._created_pid = os.getpid()
+
+    def start(self) -> None:
+        """Starts publishing this process's metrics in the background, if it hasn't already."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked process publishes to its own file, so it doesn't overwrite its parent's (or a previous process's with the same pid).
+            self._pid = os.getpid()
+            self._path = os.path.join(self.directory, f"{self._pid}-{uuid.uuid4().hex}{_SUFFIX}")
+            if self._pid != self._created_pid:
+                # What was recorded before the fork belongs to the process this was created in.
+                self.registry.drain()
+        threading.Thread(target=self._publish_periodically, name="metrics-publisher", daemon=True).start()
+
+    def publish(self) -> None:
+        """Writes this process's metrics to its file."""
+        self.start()
+        try:
+            self._write(self._path, self.registry.snapshot())
+        except OSError:
+            self.logger.warning("Failed to publish metrics to '%s'", self.directory, exc_info=True)
+
+    def retire(self, pid: int) -> None:
+        """Folds the snapshot of a process that has exited into the total, and removes its files."""
+        prefix = f"{pid}-"
+        with self._locked(fcntl.LOCK_EX):
+            paths = [entry.path for entry in os.scandir(self.directory) if entry.name.startswith(prefix)]
+            snapshots = [self._read(path) for path in paths if path.endswith(_SUFFIX)]
+            if any(snapshot is not None for snapshot in snapshots):
+                retired_path = os.path.join(self.directory, _RETIRED)
+                snapshots.append(self._read(retired_path))
+                total = self.registry.aggregate([snapshot for snapshot in snapshots if snapshot is not None]).snapshot()
+                self._write(retired_path, total)
+            for path in paths:
+                os.remove(path)
+
+    def render(self) -> str:
+        """Returns the sum of every process's metrics in the Prometheus text format."""
+        self.publish()
+        with self._locked(fcntl.LOCK_SH):
+            snapshots = [self._read(entry.path) for entry in os.scandir(self.directory) if entry.name.endswith(_SUFFIX)]
+        return self.registry.aggregate([snapshot for snapshot in snapshots if snapshot is not None]).render()
+
+    def _write(self, path: str, snapshot: dict) -> None:
+        # Temporary files are named for their process too, so `retire` removes them if it dies while writing.
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix=f"{os.getpid()}-", suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(snapshot, f)
+        # Replaced atomically, so readers never see a partial snapshot.
+        os.replace(temp_path, path)
+
+    def _read(self, path: str) -> Optional[dict]:
+        try:
+            with open(path, "rb") as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    @contextlib.contextmanager
+    def _locked(self, operation: int):
+        with open(os.path.join(self.directory, _LOCK), "a") as lock:
+            fcntl.flock(lock, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _publish_periodically(self) -> None:
+        while True:
+            time.sleep(self.interval)
+            self.publish()
@@ -0,0 +1,103 @@
+"""
+Streams a skill invocation's results as newline-delimited JSON (NDJSON) events while the skill runs.
+
+Callers opt in with an `Accept: application/x-ndjson` header. The response is a sequence of events:
+  {"type": "reply", "message": "..."}                  as soon as the skill sends each reply
+  {"type": "output", "key": "...", "value": ...}       for each of the skill's outputs, once it finishes
+  {"type": "error", "error": {...}}                    for each error, once it finishes
+  {"type": "summary", "success": ..., ...}             last, with the rest of the response
+
+The skill runs on a process-wide pool of ABBOT_RUNNER_MAX_STREAMS threads while the response is streamed,
+so at most that many streamed invocations run at once, and further ones wait for a free thread.
+"""
+
+import logging
+import os
+import queue
+import threading
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Iterator, Optional
+
+from .encoding import encode_error, encode_json
+from .execution import SkillRunResponse
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+DEFAULT_MAX_STREAMS = 32
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+def stream_executor() -> ThreadPoolExecutor:
+    """Returns this process's executor for streamed invocations, creating it on first use."""
+    global _executor, _executor_pid # pylint: disable=global-statement
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            # An executor inherited across a fork has no threads, so it can't be reused.
+            max_streams = int(os.environ.get("ABBOT_RUNNER_MAX_STREAMS", DEFAULT_MAX_STREAMS))
+            _executor = ThreadPoolExecutor(max_workers=max_streams, thread_name_prefix="skill-stream")
+            _executor_pid = os.getpid()
+        return _executor
+
+def wants_stream(accept: Optional[str]) -> bool:
+    """Returns whether the provided Accept header asks for a streamed response."""
+    if not accept:
+        return False
+    return any(media_range.split(";")[0].strip().lower() == NDJSON_MIMETYPE for media_range in accept.split(","))
+
+def reply_event(message: str) -> dict:
+    """Returns the event for a reply the skill sent."""
+    return { "type": "reply", "message": message }
+
+def result_events(response: SkillRunResponse) -> list[dict]:
+    """Returns the events that follow a skill's replies, once it has finished: its outputs, errors and the summary."""
+    events = [{ "type": "output", "key": key, "value": value } for key, value in (response.outputs or {}).items()]
+    events.extend({ "type": "error", "error": encode_error(e) } for e in response.errors)
+    events.append({
+        "type": "summary",
+        "success": response.success,
+        "replyCount": len(response.replies),
+        "errorCount": len(response.errors),
+        "contentType": response.contentType,
+        "content": response.content,
+        "headers": response.headers,
+    })
+    return events
+
+def encode_event(event: dict) -> bytes:
+    """Encodes an event as a line of NDJSON."""
+    return encode_json(event) + b"\n"
+
+def stream_skill(
+    run: Callable[..., SkillRunResponse],
+    body: dict,
+    api_token: Optional[str],
+    trace_parent: Optional[str],
+    logger: Optional[logging.Logger] = None,
+    executor: Optional[Executor] = None) -> Iterator[bytes]:
+    """
+    Runs a skill invocation with `run` (which is passed an `on_reply` callback) on `executor`
+    (by default, the process's `stream_executor`), and yields its events as lines of NDJSON as they're produced.
+    """
+    logger = logger or logging.getLogger("Streaming")
+    events = queue.Queue()
+    done = object()
+
+    def run_in_background():
+        try:
+            response = run(body, api_token, trace_parent, on_reply=lambda message: events.put(reply_event(message)))
+        except Exception as e: # pylint: disable=broad-except
+            logger.exception("Failed to run skill invocation")
+            response = SkillRunResponse()
+            response.add_error({ "errorId": type(e).__name__, "description": str(e) })
+        for event in result_events(response):
+            events.put(event)
+        events.put(done)
+
+    (executor or stream_executor()).submit(run_in_background)
+    while True:
+        event = events.get()
+        if event is done:
+            return
+        yield encode_event(event)
@@ -0,0 +1,38 @@
+"""
+Implements a pool of threads that run skills concurrently in the server process.
+"""
+
+import logging
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from .execution import SkillRunResponse, run_skill
+
+class ThreadPool(object):
+    """
+    A pool of threads that run skill invocations in the server process.
+
+    Unlike the worker pool, skills share the process, so this is cheaper per invocation
+    but a misbehaving skill can affect the others. At most `size` skills run at once;
+    further invocations block until a thread is available.
+    """
+    def __init__(self, size: int, logger: Optional[logging.Logger] = None):
+        self.size = size
+        self.logger = logger or logging.getLogger("ThreadPool")
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="skill")
+
+    def start(self) -> 'ThreadPool':
+        """Threads are started on demand, so this just returns this pool."""
+        return self
+
+    def run(self, body: dict, api_token: Optional[str], trace_parent: Optional[str], on_reply: Optional[Callable[[str], None]] = None) -> SkillRunResponse:
+        """
+        Runs the provided skill invocation on a pool thread and returns its response.
+        If provided, `on_reply` is called with each reply as soon as the skill sends it.
+        """
+        return self._executor.submit(run_skill, body, api_token, trace_parent, self.logger.getChild("Bot"), on_reply).result()
+
+    def close(self):
+        """Waits for running skills to finish and stops the threads."""
+        self._executor.shutdown(wait=True)
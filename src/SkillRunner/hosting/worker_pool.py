@@ -0,0 +1,197 @@
+"""
+Implements a pool of pre-forked worker processes that run skills in isolation from the server process.
+"""
+
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from typing import Callable, Optional, Union
+
+from ..bot.metrics import REGISTRY
+from .encoding import encode_error
+from .execution import SkillRunResponse, run_skill
+from .thread_pool import ThreadPool
+
+# Modules imported once by the fork server, so every worker starts with them already loaded.
+DEFAULT_PRELOAD_MODULES = [
+    "pandas",
+    "numpy",
+    "bs4",
+    "boto3",
+    "SkillRunner.bot.bot",
+]
+
+def _worker_main(conn, max_runs: int):
+    """
+    The entry point of a worker process.
+    Runs skill invocations received over `conn` and sends back their responses (preceded by
+    each reply as it's sent, if the invocation asks for them), exiting after `max_runs`
+    invocations so the pool can replace it with a fresh process.
+    """
+    logger = logging.getLogger("SkillRunner.Worker").getChild("Bot")
+    for _ in range(max_runs):
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        body, api_token, trace_parent, stream_replies = job
+        response = run_skill(body, api_token, trace_parent, logger, conn.send if stream_replies else None)
+
+        # Exceptions don't survive pickling reliably, so send errors in their serialized form.
+        response.errors = [encode_error(e) for e in response.errors]
+        # The server reports the metrics, so hand over what this invocation recorded.
+        conn.send(REGISTRY.drain())
+        try:
+            conn.send(response)
+        except Exception as e: # pylint: disable=broad-except
+            # Most likely the skill set an output that can't be pickled.
+            failed = SkillRunResponse()
+            failed.add_error({ "errorId": type(e).__name__, "description": f"Failed to return the skill response: {e}" })
+            conn.send(failed)
+
+class _Worker(object):
+    def __init__(self, process, conn):
+        self.process = process
+        self.conn = conn
+        self.runs = 0
+
+class WorkerPool(object):
+    """
+    A supervised pool of worker processes that run skill invocations.
+
+    Workers are forked from a fork server that has already imported the `preload` modules,
+    so starting a worker doesn't pay the cost of importing pandas, numpy and friends.
+    Each invocation is dispatched to an idle worker, blocking until one is available.
+    A worker is recycled after `max_runs` invocations, and replaced if it crashes or
+    exceeds `timeout` seconds, so a misbehaving skill can't affect other requests.
+    """
+    def __init__(self, size: int, max_runs: int = 100, timeout: Optional[float] = None, preload: Optional[list[str]] = None, logger: Optional[logging.Logger] = None):
+        self.size = size
+        self.max_runs = max_runs
+        self.timeout = timeout
+        self.logger = logger or logging.getLogger("WorkerPool")
+        self._context = multiprocessing.get_context("forkserver")
+        self._context.set_forkserver_preload(DEFAULT_PRELOAD_MODULES if preload is None else preload)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._closed = False
+        self._started = False
+
+    def start(self) -> 'WorkerPool':
+        """Starts the worker processes. Returns this pool."""
+        with self._lock:
+            if not self._started:
+                self._started = True
+                for _ in range(self.size):
+                    self._idle.put(self._spawn())
+        return self
+
+    def run(self, body: dict, api_token: Optional[str], trace_parent: Optional[str], on_reply: Optional[Callable[[str], None]] = None) -> SkillRunResponse:
+        """
+        Runs the provided skill invocation on an idle worker and returns its response.
+        Failures of the worker itself are reported as errors in the response.
+        If provided, `on_reply` is called with each reply as soon as the skill sends it.
+        """
+        self.start()
+        worker = self._checkout()
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        try:
+            worker.conn.send((body, api_token, trace_parent, on_reply is not None))
+            while True:
+                if not worker.conn.poll(None if deadline is None else max(0, deadline - time.monotonic())):
+                    self.logger.warning("Worker %s timed out after %s seconds, replacing it.", worker.process.pid, self.timeout)
+                    self._replace(worker)
+                    return _error_response("TimeoutError", f"The skill did not complete within {self.timeout} seconds.")
+                message = worker.conn.recv()
+                if isinstance(message, SkillRunResponse):
+                    response = message
+                    break
+                if isinstance(message, dict):
+                    REGISTRY.merge(message)
+                else:
+                    on_reply(message)
+        except (EOFError, OSError):
+            self.logger.warning("Worker %s exited with code %s, replacing it.", worker.process.pid, worker.process.exitcode)
+            self._replace(worker)
+            return _error_response("WorkerError", "The skill process exited unexpectedly.")
+        except BaseException:
+            # The worker may be mid-conversation (e.g. `on_reply` failed, or a message didn't unpickle),
+            # so it can't be reused, but the pool mustn't lose it either.
+            self._replace(worker)
+            raise
+
+        worker.runs += 1
+        if self._closed:
+            self._stop(worker)
+        elif worker.runs >= self.max_runs:
+            self._replace(worker)
+        else:
+            self._idle.put(worker)
+        return response
+
+    def close(self):
+        """Stops all the idle workers. Workers that are running a skill are stopped when they finish."""
+        self._closed = True
+        while True:
+            try:
+                worker = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._stop(worker)
+
+    def _checkout(self) -> _Worker:
+        worker = self._idle.get()
+        if not worker.process.is_alive():
+            self.logger.warning("Worker %s died while idle, replacing it.", worker.process.pid)
+            self._stop(worker)
+            worker = self._spawn()
+        return worker
+
+    def _spawn(self) -> _Worker:
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(target=_worker_main, args=(child_conn, self.max_runs), daemon=True)
+        process.start()
+        child_conn.close()
+        return _Worker(process, parent_conn)
+
+    def _replace(self, worker: _Worker):
+        self._stop(worker)
+        if not self._closed:
+            self._idle.put(self._spawn())
+
+    def _stop(self, worker: _Worker):
+        if worker.process.is_alive():
+            worker.process.kill()
+        worker.process.join()
+        worker.conn.close()
+
+def create_worker_pool_from_env(logger: Optional[logging.Logger] = None) -> Optional[Union[WorkerPool, ThreadPool]]:
+    """
+    Creates and starts the pool configured by the environment, or returns None if skills should run inline.
+    When ABBOT_RUNNER_EXECUTION is "pool", skills run in worker processes configured by
+    ABBOT_RUNNER_POOL_SIZE, ABBOT_RUNNER_POOL_MAX_RUNS and ABBOT_RUNNER_POOL_TIMEOUT.
+    When it's "threads", skills run on ABBOT_RUNNER_THREADS threads in the server process.
+    """
+    execution = os.environ.get("ABBOT_RUNNER_EXECUTION", "inline")
+    if execution == "threads":
+        return ThreadPool(int(os.environ.get("ABBOT_RUNNER_THREADS", 32)), logger).start()
+    if execution != "pool":
+        return None
+    timeout = os.environ.get("ABBOT_RUNNER_POOL_TIMEOUT")
+    return WorkerPool(
+        int(os.environ.get("ABBOT_RUNNER_POOL_SIZE", os.cpu_count() or 1)),
+        int(os.environ.get("ABBOT_RUNNER_POOL_MAX_RUNS", 100)),
+        float(timeout) if timeout else None,
+        logger=logger).start()
+
+def _error_response(error_id: str, description: str) -> SkillRunResponse:
+    response = SkillRunResponse()
+    response.add_error({ "errorId": error_id, "description": description })
+    return response
@@ -0,0 +1,44 @@
+"""
+Micro-benchmark for the restricted environment's import hook.
+
+Every `import` statement in skill code goes through `RestrictedEnvironment._handle_import`,
+including imports inside functions and loops, so this measures the per-import overhead
+of the policy check on top of Python's own `__import__`.
+
+Run from the 'src' directory with: python -m benchmarks.import_hook
+"""
+
+import logging
+import timeit
+
+from SkillRunner.bot.policy import get_policy
+
+MODULES = [
+    "json",
+    "pandas",
+    "numpy.linalg",
+    "bs4.element",
+    "xml.etree.ElementTree",
+    "os.path", # denied
+    "colorsys",
+]
+
+def main(number: int = 100000):
+    """Times the import hook for a representative set of modules."""
+    logging.disable(logging.WARNING)
+    env = get_policy("restrictive")._get_environment() # pylint: disable=protected-access
+
+    for module in MODULES:
+        def do_import(module=module):
+            try:
+                env._handle_import(module) # pylint: disable=protected-access
+            except PermissionError:
+                pass
+        do_import()
+
+        hook = min(timeit.repeat(do_import, number=number, repeat=5)) / number
+        native = min(timeit.repeat(lambda module=module: __import__(module), number=number, repeat=5)) / number
+        print(f"{module:<24} hook: {hook * 1e9:8.0f} ns/import  (__import__ alone: {native * 1e9:6.0f} ns)")
+
+if __name__ == "__main__":
+    main()
@@ -3,77 +3,42 @@
 # Authentication takes place using a single shared secret
 # in the environment variable ABBOT_SKILL_RUNNER_TOKEN
 
-import json
-import os
+import functools
 import logging
-
-from SkillRunner.bot.bot import Bot
-from SkillRunner.bot import exceptions
+import os
+import shutil
+import tempfile
+import threading
+
+from SkillRunner.bot.metrics import REGISTRY, record_errors, time_phase
+from SkillRunner.bot.policy import configured_policy_name, get_policy
+from SkillRunner.bot.resilience import circuit_breaker
+from SkillRunner.hosting.admission import create_admission_controller_from_env
+from SkillRunner.hosting.batch import encode_batch, parse_batch, run_batch
+from SkillRunner.hosting.execution import run_skill
+from SkillRunner.hosting.prefork import PreforkServer
+from SkillRunner.hosting.settings import load_branch_info, load_runner_secret, parse_token, runner_env
+from SkillRunner.hosting.shared_metrics import SharedMetrics
+from SkillRunner.hosting.streaming import NDJSON_MIMETYPE, stream_skill, wants_stream
+from SkillRunner.hosting.worker_pool import create_worker_pool_from_env
 
 from flask import Flask,redirect,request,Response
 
 
-class SkillRunResponse:
-    """
-    Body of the response when calling a skill via the skill editor or the abbot cli.
-    This maps to the C# SkillRunResponse class.
-    """
-    def __init__(self):
-        self.contentType = None
-        self.content = None
-        self.success = True
-        self.errors = []
-        self.replies = []
-        self.headers = None
-        self.outputs = None
-
-    def add_reply(self, message):
-        """
-        Adds a reply to the response
-        """
-        self.replies.append(message)
-
-    def add_error(self, error):
-        """
-        Adds an error to the response
-        """
-        self.errors.append(error)
-        self.success = False
-    
-    def toJSON(self):
-        """
-        Returns a JSON representation of the response
-        """
-        # Serialize the dict version of ourselves, since all the keys are intended for serialization
-        return json.dumps(self.__dict__)
-
-secret = os.environ.get("ABBOT_SKILL_RUNNER_TOKEN")
-if secret is None:
-    raise Exception("ABBOT_SKILL_RUNNER_TOKEN environment variable not set")
-
-env = os.environ.get("ABBOT_ENV", "production")
+secret = load_runner_secret()
+
+env = runner_env()
 if env == "dev":
     Flask.debug = True
-if len(secret) < 64 and env != "dev":
-    raise Exception("ABBOT_SKILL_RUNNER_TOKEN is too short")
 
 app = Flask(__name__)
 
-my_path = os.path.realpath(__file__)
-branch_info_path = os.path.join(my_path, "build_info.txt")
+branch_info = load_branch_info(os.path.dirname(os.path.realpath(__file__)))
 
-branch_info = { "branch": "unknown", "sha": "unknown" }
+REGISTRY.set_constant_labels(entrypoint="flask", policy=configured_policy_name())
 
-# pylint: disable=bare-except
-try:
-    with open(branch_info_path, "r", encoding='utf-8') as f:
-        lines = f.readlines()
-        branch_info["branch"] = lines[0]
-        branch_info["sha"] = lines[1]
-except:
-    # Ignore all failures
-    branch_info = { "branch": "<unknown>", "sha": "<unknown>" }
-# pylint: enable=bare-except
+# Limits the skills this server process runs at once, if ABBOT_RUNNER_MAX_IN_FLIGHT is set.
+admission = create_admission_controller_from_env()
 
 @app.route("/")
 def index():
@@ -91,74 +56,174 @@ def status():
         "status": "ok",
         "branch": branch_info["branch"],
         "sha": branch_info["sha"],
+        **(admission.status() if admission is not None else {}),
+        "circuitBreaker": circuit_breaker().status(),
     }
 
+@app.route("/api/v1/metrics", methods=["GET"])
+def metrics():
+    """
+    Returns the runner's metrics in the Prometheus text format
+    """
+    return Response((shared_metrics or REGISTRY).render(), mimetype="text/plain; version=0.0.4")
+
+# Shares metrics between the server's processes when it's pre-forked, so every scrape reports all of them.
+shared_metrics = None
+
+@app.before_request
+def publish_metrics():
+    """
+    Starts publishing this server process's metrics to the others, if it's pre-forked
+    """
+    if shared_metrics is not None:
+        shared_metrics.start()
+
+worker_pool = None
+worker_pool_created = False
+worker_pool_lock = threading.Lock()
+
+def get_worker_pool():
+    """
+    Returns the pool (of processes or threads) skills run in, or None if they run inline (see ABBOT_RUNNER_EXECUTION).
+    The pool is created on first use, so each server process gets its own.
+    """
+    global worker_pool, worker_pool_created # pylint: disable=global-statement
+    if not worker_pool_created:
+        with worker_pool_lock:
+            if not worker_pool_created:
+                worker_pool = create_worker_pool_from_env(app.logger.getChild("WorkerPool"))
+                worker_pool_created = True
+    return worker_pool
+
+def run(body, api_token, trace_parent, on_reply=None):
+    """
+    Runs a skill invocation, in the worker pool if there is one.
+    """
+    with time_phase("run"):
+        pool = get_worker_pool()
+        if pool is not None:
+            response = pool.run(body, api_token, trace_parent, on_reply)
+        else:
+            response = run_skill(body, api_token, trace_parent, app.logger.getChild('Bot'), on_reply)
+    record_errors(response.errors)
+    return response
+
+def authenticated(handler):
+    """
+    Runs the decorated request handler if the request presents the runner's secret, responding with a 401 if it doesn't.
+    """
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        # Authenticate using either a Bearer token, or the 'code' parameter
+        token = get_token()
+        if token != secret:
+            app.logger.debug("Request does not contain a token")
+            return Response("Access Denied", status = 401)
+        return handler(*args, **kwargs)
+    return wrapper
+
+def admitted(handler):
+    """
+    Runs the decorated request handler once admission control admits the request,
+    responding with a 503 straight away if the server is over capacity.
+    Apply it under `authenticated`, so unauthenticated requests can't use up the server's capacity.
+    """
+    @functools.wraps(handler)
+    def wrapper(*args, **kwargs):
+        if admission is None:
+            return handler(*args, **kwargs)
+        if not admission.acquire():
+            return Response("The runner is over capacity.", status = 503, headers = { "Retry-After": str(admission.retry_after) })
+        try:
+            response = app.make_response(handler(*args, **kwargs))
+        except BaseException:
+            admission.release()
+            raise
+        # Streamed responses are still running the skill, so wait until they're done.
+        response.call_on_close(admission.release)
+        return response
+    return wrapper
+
 def get_token():
     """
     Retrieves the auth token from either the Authorization header or the 'code' query string parameter
     (The latter of which is intended only to emulate Azure Functions)
     """
-    auth_header = request.headers.get("Authorization")
-    if auth_header is not None:
-        splat = auth_header.split(' ')
-        if len(splat) == 2 and splat[0] == "Bearer":
-            app.logger.debug("Using 'Authorization' header to authenticate")
-            return splat[1]
-    code = request.args.get('code')
-    if code is not None:
-        app.logger.debug("Using 'code' query string value to authenticate")
-        return code
+    return parse_token(request.headers.get("Authorization"), request.args.get('code'))
 
 @app.route("/api/v1/execute", methods=["POST"])
+@authenticated
+@admitted
 def execute():
     """
     Executes skill code
     """
-
-    # Authenticate using either a Bearer token, or the 'code' parameter
-    token = get_token()
-    if token != secret:
-        app.logger.debug("Request does not contain a token")
-        return Response("Access Denied", status = 401)
-
-    body = request.json
+    with time_phase("parse"):
+        body = request.json
     api_token = request.headers.get('x-abbot-skillapitoken')
     trace_parent = request.headers.get('traceparent')
 
-    bot = Bot(body, api_token, trace_parent, app.logger.getChild('Bot'))
+    if wants_stream(request.headers.get('Accept')):
+        app.logger.debug("Streaming user skill")
+        return Response(stream_skill(run, body, api_token, trace_parent, app.logger.getChild("Streaming")), mimetype=NDJSON_MIMETYPE)
+
     app.logger.debug("Running user skill")
+    response = run(body, api_token, trace_parent)
+
+    with time_phase("encode"):
+        response_body = response.encode()
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Responding with: '%s'", response_body.decode("utf-8"))
+    return Response(response_body, mimetype="application/vnd.abbot.v1+json")
+
+@app.route("/api/v1/execute-batch", methods=["POST"])
+@authenticated
+@admitted
+def execute_batch():
+    """
+    Executes a batch of skill invocations, and responds with an array of their results
+    """
+    try:
+        with time_phase("parse"):
+            invocations = parse_batch(request.json, request.headers.get('x-abbot-skillapitoken'), request.headers.get('traceparent'))
+    except ValueError as e:
+        return Response(str(e), status = 400)
 
-    response = SkillRunResponse()
+    app.logger.debug(f"Running batch of {len(invocations)} user skills")
+    responses = run_batch(invocations, run, logger=app.logger.getChild("Batch"))
 
-    try:
-        bot.run_user_script()
-    except exceptions.InterpreterError as e:
-        response.add_error(e)
-    except Exception as e: 
-        logging.error(e)
-        response.add_error({ "errorId": type(e).__name__, "description": str(e) })
-
-    app.logger.debug(f"Received {len(bot.responses)} responses")
-    for reply in bot.responses:
-        response.add_reply(reply)
-
-    response.outputs = {}
-    for key, value in bot.outputs.items():
-        response.outputs[key] = value
-
-    if bot.is_request:
-        response.Content = bot.response.raw_content
-        response.ContentType = bot.response.content_type
-        headers = {}
-        for key, value in bot.response.headers.items():
-            headers[key] = [value]
-        response.Headers = headers
-
-    response_str = response.toJSON()
-    app.logger.debug(f"Responding with: '{response_str}'")
-    return Response(response_str, mimetype="application/vnd.abbot.v1+json")
+    with time_phase("encode"):
+        response_body = encode_batch(responses)
+    if app.logger.isEnabledFor(logging.DEBUG):
+        app.logger.debug("Responding with: '%s'", response_body.decode("utf-8"))
+    return Response(response_body, mimetype="application/vnd.abbot.v1+json")
+
+def preload():
+    """
+    Warms up everything that can be shared by the server's worker processes before they're forked.
+    """
+    get_policy(configured_policy_name(), app.logger.getChild('Bot').getChild('Policy'))
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 9001))
     host = os.environ.get("HOST", "127.0.0.1")
-    app.run(host=host, port=port)
\ No newline at end of file
+
+    # Setting ABBOT_RUNNER_WORKERS (to a number, or "auto" for one per CPU) serves with pre-forked worker processes,
+    # otherwise we use the Flask development server.
+    workers = os.environ.get("ABBOT_RUNNER_WORKERS")
+    if workers:
+        shared_metrics = SharedMetrics(REGISTRY, tempfile.mkdtemp(prefix="abbot-metrics-"), logger=app.logger.getChild("SharedMetrics"))
+        server = PreforkServer(
+            app,
+            host,
+            port,
+            (os.cpu_count() or 1) if workers == "auto" else int(workers),
+            keepalive_timeout=float(os.environ.get("ABBOT_RUNNER_KEEPALIVE_TIMEOUT", 75)),
+            graceful_timeout=float(os.environ.get("ABBOT_RUNNER_GRACEFUL_TIMEOUT", 30)),
+            preload=preload,
+            logger=app.logger.getChild("PreforkServer"),
+            on_worker_exit=shared_metrics.retire)
+        server.serve_forever()
+        shutil.rmtree(shared_metrics.directory, ignore_errors=True)
+    else:
+        app.run(host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,334 @@
+# An ASGI entry point for the standalone Python skill runner.
+# Serves the same API as runner.py, but accepts requests on an event loop,
+# so a slow skill only occupies an executor thread rather than a whole server worker.
+# Run it with an ASGI server, e.g. `uvicorn runner_asgi:app --app-dir src`.
+# Authentication takes place using a single shared secret
+# in the environment variable ABBOT_SKILL_RUNNER_TOKEN
+
+import asyncio
+import json
+import logging
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from SkillRunner.bot.metrics import REGISTRY, record_errors, time_phase
+from SkillRunner.bot.policy import configured_policy_name, get_policy
+from SkillRunner.bot.resilience import circuit_breaker
+from SkillRunner.hosting.admission import AsyncAdmissionController, create_admission_controller_from_env
+from SkillRunner.hosting.batch import batch_max_concurrency, encode_batch, parse_batch, run_batch
+from SkillRunner.hosting.execution import SkillRunResponse, run_skill
+from SkillRunner.hosting.settings import load_branch_info, load_runner_secret, parse_token, runner_env
+from SkillRunner.hosting.streaming import NDJSON_MIMETYPE, encode_event, reply_event, result_events, wants_stream
+from SkillRunner.hosting.worker_pool import create_worker_pool_from_env
+
+secret = load_runner_secret()
+
+env = runner_env()
+
+logger = logging.getLogger("runner_asgi")
+if env == "dev":
+    logger.setLevel(logging.DEBUG)
+
+branch_info = load_branch_info(os.path.dirname(os.path.realpath(__file__)))
+
+REGISTRY.set_constant_labels(entrypoint="asgi", policy=configured_policy_name())
+
+# Limits the requests this server process handles at once, if ABBOT_RUNNER_MAX_IN_FLIGHT is set.
+admission = create_admission_controller_from_env(AsyncAdmissionController)
+
+# Skills are synchronous, so each in-flight skill occupies one of these threads while it runs,
+# most of which is spent waiting on Abbot API calls. This bounds how many run at once.
+max_concurrency = int(os.environ.get("ABBOT_RUNNER_MAX_CONCURRENCY", 256))
+
+executor = None
+worker_pool = None
+
+def startup():
+    """
+    Creates the executor skills run on, the worker pool if one is configured, and warms up the sandbox policy.
+    """
+    global executor, worker_pool # pylint: disable=global-statement
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="skill")
+        worker_pool = create_worker_pool_from_env(logger.getChild("WorkerPool"))
+        get_policy(configured_policy_name(), logger.getChild('Bot').getChild('Policy'))
+
+def shutdown():
+    """
+    Waits for in-flight skills to finish and stops the worker pool.
+    """
+    global executor, worker_pool # pylint: disable=global-statement
+    if executor is not None:
+        executor.shutdown(wait=True)
+        executor = None
+    if worker_pool is not None:
+        worker_pool.close()
+        worker_pool = None
+
+async def app(scope, receive, send):
+    """
+    The ASGI application.
+    """
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"]
+    method = scope["method"]
+    if path == "/":
+        await respond(send, 302, b"", headers=[(b"location", b"/api/v1/status")])
+    elif path == "/api/v1/status":
+        if method != "GET":
+            await respond(send, 405, b"Method Not Allowed")
+            return
+        await respond_json(send, 200, {
+            "status": "ok",
+            "branch": branch_info["branch"],
+            "sha": branch_info["sha"],
+            **(admission.status() if admission is not None else {}),
+            "circuitBreaker": circuit_breaker().status(),
+        })
+    elif path == "/api/v1/metrics":
+        if method != "GET":
+            await respond(send, 405, b"Method Not Allowed")
+            return
+        await respond(send, 200, REGISTRY.render().encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8")
+    elif path == "/api/v1/execute":
+        if method != "POST":
+            await respond(send, 405, b"Method Not Allowed")
+            return
+        await admitted(execute, scope, receive, send)
+    elif path == "/api/v1/execute-batch":
+        if method != "POST":
+            await respond(send, 405, b"Method Not Allowed")
+            return
+        await admitted(execute_batch, scope, receive, send)
+    else:
+        await respond(send, 404, b"Not Found")
+
+async def lifespan(receive, send):
+    """
+    Handles the ASGI server's startup and shutdown events.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            try:
+                startup()
+            except Exception as e: # pylint: disable=broad-except
+                await send({ "type": "lifespan.startup.failed", "message": str(e) })
+                return
+            await send({ "type": "lifespan.startup.complete" })
+        elif message["type"] == "lifespan.shutdown":
+            await asyncio.get_running_loop().run_in_executor(None, shutdown)
+            await send({ "type": "lifespan.shutdown.complete" })
+            return
+
+async def admitted(handler, scope, receive, send):
+    """
+    Runs the provided request handler once the request is authenticated and admission control admits it,
+    responding with a 503 straight away if the server is over capacity.
+    Requests are authenticated first, so unauthenticated ones can't use up the server's capacity.
+    """
+    if not await authenticated(scope, send):
+        return
+    if admission is None:
+        await handler(scope, receive, send)
+        return
+    if not await admission.acquire():
+        await respond(send, 503, b"The runner is over capacity.", headers=[(b"retry-after", str(admission.retry_after).encode("latin-1"))])
+        return
+    try:
+        await handler(scope, receive, send)
+    finally:
+        admission.release()
+
+async def execute(scope, receive, send):
+    """
+    Executes skill code
+    """
+    request = await read_request(scope, receive, send)
+    if request is None:
+        return
+    body, headers = request
+    api_token = headers.get('x-abbot-skillapitoken')
+    trace_parent = headers.get('traceparent')
+
+    if wants_stream(headers.get('accept')):
+        logger.debug("Streaming user skill")
+        await stream(send, body, api_token, trace_parent)
+        return
+
+    logger.debug("Running user skill")
+    response = await run_in_executor(body, api_token, trace_parent)
+
+    with time_phase("encode"):
+        response_body = response.encode()
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Responding with: '%s'", response_body.decode("utf-8"))
+    await respond(send, 200, response_body, "application/vnd.abbot.v1+json")
+
+async def execute_batch(scope, receive, send):
+    """
+    Executes a batch of skill invocations, and responds with an array of their results
+    """
+    request = await read_request(scope, receive, send)
+    if request is None:
+        return
+    body, headers = request
+
+    try:
+        invocations = parse_batch(body, headers.get('x-abbot-skillapitoken'), headers.get('traceparent'))
+    except ValueError as e:
+        await respond(send, 400, str(e).encode("utf-8"))
+        return
+
+    logger.debug("Running batch of %s user skills", len(invocations))
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(batch_max_concurrency())
+    async def run_one(invocation):
+        async with semaphore:
+            # Run each invocation as a batch of one, so it reports its own failures.
+            [response] = await loop.run_in_executor(executor, run_batch, [invocation], run_in_worker, 1, logger.getChild("Batch"))
+            return response
+    responses = await asyncio.gather(*[run_one(invocation) for invocation in invocations])
+
+    with time_phase("encode"):
+        response_body = encode_batch(responses)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Responding with: '%s'", response_body.decode("utf-8"))
+    await respond(send, 200, response_body, "application/vnd.abbot.v1+json")
+
+async def authenticated(scope, send) -> bool:
+    """
+    Returns whether the request presents the runner's secret, responding with a 401 if it doesn't.
+    """
+    headers = request_headers(scope)
+    query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+
+    # Authenticate using either a Bearer token, or the 'code' parameter
+    token = parse_token(headers.get("authorization"), query.get("code", [None])[0])
+    if token != secret:
+        logger.debug("Request does not contain a token")
+        await respond(send, 401, b"Access Denied")
+        return False
+    return True
+
+def request_headers(scope) -> dict:
+    """
+    Returns the request's headers, with lower-cased names.
+    """
+    return { k.decode("latin-1").lower(): v.decode("latin-1") for k, v in scope["headers"] }
+
+async def read_request(scope, receive, send):
+    """
+    Reads the (already authenticated) request's JSON body.
+    Returns the body and the (lower-cased) request headers, or responds with an error and returns None.
+    """
+    headers = request_headers(scope)
+    request_body = await read_body(receive)
+    try:
+        with time_phase("parse"):
+            body = json.loads(request_body)
+    except ValueError:
+        await respond(send, 400, b"The request body must be JSON.")
+        return None
+
+    # Servers that don't send lifespan events never call startup() for us.
+    startup()
+    return body, headers
+
+async def stream(send, body, api_token, trace_parent):
+    """
+    Runs a skill invocation on the executor, and sends its events as NDJSON as they're produced.
+    """
+    loop = asyncio.get_running_loop()
+    replies = asyncio.Queue()
+    done = object()
+
+    def run():
+        try:
+            return run_in_worker(body, api_token, trace_parent, lambda message: loop.call_soon_threadsafe(replies.put_nowait, message))
+        except Exception as e: # pylint: disable=broad-except
+            logger.exception("Failed to run skill invocation")
+            response = SkillRunResponse()
+            response.add_error({ "errorId": type(e).__name__, "description": str(e) })
+            return response
+        finally:
+            loop.call_soon_threadsafe(replies.put_nowait, done)
+
+    future = loop.run_in_executor(executor, run)
+    await send({
+        "type": "http.response.start",
+        "status": 200,
+        "headers": [(b"content-type", NDJSON_MIMETYPE.encode("latin-1"))],
+    })
+    while (message := await replies.get()) is not done:
+        await send({ "type": "http.response.body", "body": encode_event(reply_event(message)), "more_body": True })
+    events = result_events(await future)
+    await send({ "type": "http.response.body", "body": b"".join(encode_event(event) for event in events) })
+
+def run_in_worker(body, api_token, trace_parent, on_reply=None):
+    """
+    Runs a skill invocation, on the worker pool if there is one.
+    """
+    with time_phase("run"):
+        if worker_pool is not None:
+            response = worker_pool.run(body, api_token, trace_parent, on_reply)
+        else:
+            response = run_skill(body, api_token, trace_parent, logger.getChild('Bot'), on_reply)
+    record_errors(response.errors)
+    return response
+
+async def run_in_executor(body, api_token, trace_parent):
+    """
+    Runs a skill invocation on the executor, without blocking the event loop.
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor, run_in_worker, body, api_token, trace_parent)
+
+async def read_body(receive) -> bytes:
+    """
+    Reads the whole request body.
+    """
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    return b"".join(chunks)
+
+async def respond_json(send, status: int, value):
+    """
+    Sends a JSON response.
+    """
+    await respond(send, status, json.dumps(value).encode("utf-8"), "application/json")
+
+async def respond(send, status: int, body: bytes, content_type: str = "text/plain; charset=utf-8", headers=None):
+    """
+    Sends a complete response.
+    """
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", content_type.encode("latin-1")),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            *(headers or []),
+        ],
+    })
+    await send({ "type": "http.response.body", "body": body })
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(
+        "runner_asgi:app",
+        host=os.environ.get("HOST", "127.0.0.1"),
+        port=int(os.environ.get("PORT", 9001)),
+        timeout_keep_alive=int(os.environ.get("ABBOT_RUNNER_KEEPALIVE_TIMEOUT", 75)))
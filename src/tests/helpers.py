@@ -0,0 +1,18 @@
+from SkillRunner.bot.platform_type import PlatformType
+
+#pylint: disable=missing-docstring,
+
+def create_request(code, skill_id=42):
+    return {
+        "SkillInfo": {
+            "PlatformType": PlatformType.UNIT_TEST,
+            "Bot": {},
+            "From": { "Id": "U314" },
+            "RoomId": "C111",
+            "MessageId": "9999.1111",
+        },
+        "RunnerInfo": {
+            "SkillId": skill_id,
+            "Code": code,
+        },
+    }
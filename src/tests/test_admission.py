@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from SkillRunner.hosting.admission import AdmissionController, AsyncAdmissionController
+
+#pylint: disable=missing-docstring,
+
+class AdmissionControllerTest(unittest.TestCase):
+    def test_admits_up_to_limit_then_rejects_when_queue_is_full(self):
+        admission = AdmissionController(2, max_queue=0)
+
+        self.assertTrue(admission.acquire())
+        self.assertTrue(admission.acquire())
+        started = time.monotonic()
+        self.assertFalse(admission.acquire())
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertEqual({ "inFlight": 2, "queueDepth": 0, "maxInFlight": 2, "maxQueueDepth": 0 }, admission.status())
+
+        admission.release()
+        self.assertTrue(admission.acquire())
+
+    def test_queued_request_is_admitted_when_a_slot_frees_up(self):
+        admission = AdmissionController(1, max_queue=1, queue_timeout=5)
+        admission.acquire()
+        results = []
+        waiter = threading.Thread(target=lambda: results.append(admission.acquire()))
+        waiter.start()
+        while admission.status()["queueDepth"] == 0:
+            time.sleep(0.01)
+
+        admission.release()
+        waiter.join(5)
+
+        self.assertEqual([True], results)
+        self.assertEqual(1, admission.status()["inFlight"])
+        self.assertEqual(0, admission.status()["queueDepth"])
+
+    def test_rejects_queued_request_at_deadline(self):
+        admission = AdmissionController(1, max_queue=1, queue_timeout=0.1)
+        admission.acquire()
+
+        started = time.monotonic()
+        self.assertFalse(admission.acquire())
+        self.assertGreaterEqual(time.monotonic() - started, 0.1)
+        self.assertEqual(0, admission.status()["queueDepth"])
+        self.assertEqual(1, admission.status()["inFlight"])
+
+class AsyncAdmissionControllerTest(unittest.IsolatedAsyncioTestCase):
+    async def test_admits_up_to_limit_then_rejects_when_queue_is_full(self):
+        admission = AsyncAdmissionController(1, max_queue=0)
+
+        self.assertTrue(await admission.acquire())
+        self.assertFalse(await admission.acquire())
+
+        admission.release()
+        self.assertTrue(await admission.acquire())
+
+    async def test_hands_slot_to_queued_request(self):
+        admission = AsyncAdmissionController(1, max_queue=1, queue_timeout=5)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+        self.assertEqual(1, admission.status()["queueDepth"])
+
+        admission.release()
+
+        self.assertTrue(await waiter)
+        self.assertEqual({ "inFlight": 1, "queueDepth": 0, "maxInFlight": 1, "maxQueueDepth": 1 }, admission.status())
+
+    async def test_rejects_queued_request_at_deadline(self):
+        admission = AsyncAdmissionController(1, max_queue=1, queue_timeout=0.05)
+        await admission.acquire()
+
+        self.assertFalse(await admission.acquire())
+        self.assertEqual(0, admission.status()["queueDepth"])
+
+        admission.release()
+        self.assertEqual(0, admission.status()["inFlight"])
+
+    async def test_cancelled_waiter_does_not_leak_slot(self):
+        admission = AsyncAdmissionController(1, max_queue=1, queue_timeout=5)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiter
+        admission.release()
+
+        self.assertEqual(0, admission.status()["inFlight"])
+        self.assertTrue(await admission.acquire())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import threading
+import time
+import unittest
+
+from SkillRunner.hosting.batch import encode_batch, parse_batch, run_batch
+from SkillRunner.hosting.execution import SkillRunResponse, run_skill
+
+from tests.helpers import create_request
+
+#pylint: disable=missing-docstring,
+
+class BatchTest(unittest.TestCase):
+    def test_parse_uses_request_token_unless_item_has_its_own(self):
+        first = create_request("pass")
+        second = { **create_request("pass"), "SkillApiToken": "item-token", "TraceParent": "item-trace" }
+
+        invocations = parse_batch([first, second], "request-token", "request-trace")
+
+        self.assertEqual((first, "request-token", "request-trace"), invocations[0])
+        self.assertEqual((second, "item-token", "item-trace"), invocations[1])
+
+    def test_parse_reports_invalid_items(self):
+        invocations = parse_batch([create_request("pass"), "nope"], None, None)
+
+        self.assertIsInstance(invocations[0], tuple)
+        self.assertFalse(invocations[1].success)
+        self.assertEqual("InvalidInvocation", invocations[1].errors[0]["errorId"])
+
+    def test_parse_rejects_non_arrays(self):
+        with self.assertRaises(ValueError):
+            parse_batch(create_request("pass"), None, None)
+
+    def test_runs_skills_and_keeps_errors_separate(self):
+        invocations = parse_batch([
+            create_request("bot.reply('one')", 1),
+            create_request("raise ValueError('two')", 2),
+            "three",
+            create_request("bot.reply('four')", 4),
+        ], "token", None)
+
+        responses = run_batch(invocations, run_skill)
+
+        self.assertEqual(["one"], responses[0].replies)
+        self.assertEqual([{ "errorId": "ValueError", "description": "two" }], responses[1].errors)
+        self.assertEqual("InvalidInvocation", responses[2].errors[0]["errorId"])
+        self.assertEqual(["four"], responses[3].replies)
+        self.assertTrue(responses[3].success)
+
+    def test_reports_failures_of_the_runner(self):
+        def run(body, _api_token, _trace_parent):
+            if body["RunnerInfo"]["SkillId"] == 2:
+                raise RuntimeError("worker is gone")
+            return SkillRunResponse()
+
+        responses = run_batch(parse_batch([create_request("pass", 1), create_request("pass", 2)], None, None), run)
+
+        self.assertTrue(responses[0].success)
+        self.assertEqual([{ "errorId": "RuntimeError", "description": "worker is gone" }], responses[1].errors)
+
+    def test_limits_concurrency(self):
+        running = []
+        peak = []
+        lock = threading.Lock()
+        def run(*_):
+            with lock:
+                running.append(1)
+                peak.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.pop()
+            return SkillRunResponse()
+
+        run_batch(parse_batch([create_request("pass")] * 12, None, None), run, max_concurrency=3)
+
+        self.assertEqual(3, max(peak))
+
+    def test_encode(self):
+        response = SkillRunResponse()
+        response.add_reply("Hello")
+
+        self.assertEqual([response.__dict__, SkillRunResponse().__dict__], json.loads(encode_batch([response, SkillRunResponse()])))
+
+if __name__ == '__main__':
+    unittest.main()
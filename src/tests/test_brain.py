@@ -0,0 +1,471 @@
+import json
+import logging
+import os
+import unittest
+
+from unittest import mock
+
+import azure.functions as func
+import responses
+
+from responses import matchers
+
+import SkillRunner
+from SkillRunner.bot import resilience, storage
+from SkillRunner.bot.apiclient import ApiClient
+from SkillRunner.bot.brain_codec import COMPRESSED_MARKER, decode_value, encode_value
+from SkillRunner.bot.brain_index import BrainIndex
+from SkillRunner.bot.exceptions import ApiError
+from SkillRunner.bot.local_brain import LocalBrainApi
+from SkillRunner.bot.storage import Brain
+from SkillRunner.hosting.execution import run_skill
+
+from tests.helpers import create_request
+
+#pylint: disable=missing-docstring,
+
+BRAIN_URL = "https://localhost:4979/api/skills/42/brain"
+
+def bulk_results(request):
+    operations = json.loads(request.body)["operations"]
+    return (200, {}, json.dumps({ "results": [{ "key": o["key"], "status": 200 } for o in operations] }))
+
+class BrainTest(unittest.TestCase):
+    def test_single_key_operations(self):
+        api = LocalBrainApi({ "a": 1 })
+        brain = Brain(api)
+
+        brain.write("b", { "x": [1, 2] })
+        brain.delete("a")
+
+        self.assertIsNone(brain.get("a"))
+        self.assertEqual({ "x": [1, 2] }, brain.get("b"))
+        self.assertEqual([{ "key": "b", "value": '{"x": [1, 2]}' }], brain.list())
+
+    def test_bulk_operations_send_one_request(self):
+        api = LocalBrainApi({ "a": 1, "b": "two" })
+        brain = Brain(api)
+
+        self.assertEqual({ "a": 1, "b": "two", "c": None }, brain.get_many(["a", "b", "c", "a"]))
+        self.assertEqual({ "c": True, "d": True }, brain.write_many({ "c": [3], "d": None }))
+        self.assertEqual({ "a": True, "z": True }, brain.delete_many(["a", "z"]))
+
+        self.assertEqual({ "b": '"two"', "c": "[3]", "d": "null" }, api.items)
+        self.assertEqual([("POST", "/brain/bulk")] * 3, api.requests)
+
+    @mock.patch.dict(os.environ, { "ABBOT_BRAIN_BATCH_SIZE": "2" })
+    def test_bulk_operations_are_batched(self):
+        api = LocalBrainApi()
+        brain = Brain(api)
+
+        brain.write_many({ str(i): i for i in range(5) })
+
+        self.assertEqual({ str(i): i for i in range(5) }, brain.get_many([str(i) for i in range(5)]))
+        self.assertEqual(6, len(api.requests))
+
+    @responses.activate
+    def test_bulk_request_format(self):
+        responses.post(f"{BRAIN_URL}/bulk", json={ "results": [
+            { "key": "a", "status": 200, "value": "1" },
+            { "key": "b", "status": 404 },
+        ] })
+        brain = Brain(ApiClient(42, None, None, None, None))
+
+        self.assertEqual({ "a": 1, "b": None }, brain.get_many(["a", "b"]))
+        self.assertEqual(
+            { "operations": [{ "op": "get", "key": "a" }, { "op": "get", "key": "b" }] },
+            json.loads(responses.calls[0].request.body))
+
+    def test_get_many_raises_for_failed_items(self):
+        api = LocalBrainApi()
+        api.send = mock.Mock(return_value={ "results": [{ "key": "a", "status": 500 }] })
+
+        with self.assertRaises(ApiError) as context:
+            Brain(api).get_many(["a"])
+
+        self.assertEqual(500, context.exception.status_code)
+
+    def test_unexpected_bulk_responses_fail_the_batch(self):
+        for response in [{}, { "results": [{ "key": "a", "status": 200 }] }, { "results": [{ "key": "b", "status": 200 }, { "key": "a", "status": 200 }] }]:
+            with self.subTest(response=response):
+                api = LocalBrainApi()
+                api.send = mock.Mock(return_value=response)
+                brain = Brain(api, write_back=True)
+                brain.write("a", 1)
+                brain.write("b", 2)
+
+                with self.assertRaises(ApiError) as context:
+                    brain.flush()
+
+                self.assertIn("a, b", str(context.exception))
+                self.assertEqual({ "a": "1", "b": "2" }, brain._buffer) # pylint: disable=protected-access
+
+class BrainIterateTest(unittest.TestCase):
+    def test_iterates_a_page_at_a_time(self):
+        api = LocalBrainApi({ f"user:{i:02}": i for i in range(25) })
+        api.items["other"] = "\"x\""
+        brain = Brain(api)
+
+        items = brain.iterate(prefix="user:", page_size=10)
+
+        self.assertEqual(("user:00", 0), next(items))
+        self.assertEqual(1, len(api.requests))
+        self.assertEqual([f"user:{i:02}" for i in range(1, 25)], [key for key, _ in items])
+        self.assertEqual(3, len(api.requests))
+
+    def test_iterates_keys_only(self):
+        api = LocalBrainApi({ "a": 1, "b": 2 })
+
+        self.assertEqual(["a", "b"], list(Brain(api).iterate(keys_only=True)))
+        self.assertIn("keysOnly=true", api.requests[0][1])
+
+    def test_sees_buffered_writes(self):
+        brain = Brain(LocalBrainApi({ "a": 1 }), write_back=True)
+        brain.write("b", 2)
+        brain.delete("a")
+
+        self.assertEqual([("b", 2)], list(brain.iterate()))
+
+    @responses.activate
+    def test_page_request_format(self):
+        responses.get(f"{BRAIN_URL}/items", match=[matchers.query_param_matcher({ "pageSize": "2", "prefix": "a" })], json={
+            "items": [{ "key": "a1", "value": "1" }, { "key": "a2", "value": "2" }],
+            "continuationToken": "t1",
+        })
+        responses.get(f"{BRAIN_URL}/items", match=[matchers.query_param_matcher({ "pageSize": "2", "prefix": "a", "continuationToken": "t1" })], json={
+            "items": [{ "key": "a3", "value": "3" }],
+        })
+        brain = Brain(ApiClient(42, None, None, None, None))
+
+        self.assertEqual([("a1", 1), ("a2", 2), ("a3", 3)], list(brain.iterate(prefix="a", page_size=2)))
+        self.assertEqual([("a1", 1), ("a2", 2), ("a3", 3)], list(brain.iterate(prefix="a", page_size=2)))
+        # Pages aren't memoized, so they don't stay in memory.
+        self.assertEqual(4, len(responses.calls))
+
+    @responses.activate
+    def test_skill_iterates(self):
+        responses.get(f"{BRAIN_URL}/items", json={ "items": [{ "key": "a" }, { "key": "b" }] })
+
+        response = run_skill(create_request("bot.reply(','.join(bot.brain.iterate(keys_only=True)))"), None, None)
+
+        self.assertEqual([], response.errors)
+        self.assertEqual(["a,b"], response.replies)
+
+CUSTOMER_ITEMS = {
+    "order:1": { "customer": "acme", "total": 10 },
+    "order:2": { "customer": "globex", "total": 20 },
+    "order:3": { "customer": "acme", "total": 30 },
+    "ORDER-archive": { "customer": "acme" },
+    "settings": "plain",
+}
+
+class BrainIndexTest(unittest.TestCase):
+    def test_search(self):
+        index = BrainIndex(CUSTOMER_ITEMS.items())
+
+        self.assertEqual(["order:1", "order:2", "order:3"], index.search(prefix="order:"))
+        self.assertEqual(["ORDER-archive", "order:1", "order:2", "order:3"], index.search(term="order"))
+        self.assertEqual(["ORDER-archive", "order:1", "order:3"], index.search(field="customer", equals="acme"))
+        self.assertEqual(["order:1", "order:3"], index.search(prefix="order:", field="customer", equals="acme"))
+        self.assertEqual(["order:1", "order:2", "order:3"], index.search(field="total"))
+        self.assertEqual([], index.search(prefix="zzz"))
+
+    def test_updates(self):
+        index = BrainIndex(CUSTOMER_ITEMS.items())
+        index.search(field="customer", equals="acme")
+
+        index.set("order:4", { "customer": "acme" })
+        index.set("order:1", { "customer": "globex" })
+        index.remove("order:3")
+        index.remove("missing")
+
+        self.assertEqual(["ORDER-archive", "order:4"], index.search(field="customer", equals="acme"))
+
+class BrainWithoutBulkApiTest(unittest.TestCase):
+    def setUp(self):
+        for patcher in [mock.patch.object(storage, "_bulk_api_unavailable_until", 0.0), mock.patch.object(resilience, "_breaker", None)]:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_sends_each_operation_when_the_api_has_no_bulk_endpoint(self):
+        api = LocalBrainApi({ "a": 1, "b": "two" }, bulk=False)
+        brain = Brain(api)
+
+        self.assertEqual({ "a": 1, "b": "two", "c": None }, brain.get_many(["a", "b", "c"]))
+        self.assertEqual({ "c": True, "d": True }, brain.write_many({ "c": [3], "d": None }))
+        self.assertEqual({ "a": True, "z": True }, brain.delete_many(["a", "z"]))
+
+        self.assertEqual({ "b": '"two"', "c": "[3]", "d": "null" }, api.items)
+        # The bulk endpoint is only tried once.
+        self.assertEqual(1, api.requests.count(("POST", "/brain/bulk")))
+        self.assertEqual(8, len(api.requests))
+
+    def test_flushes_each_change_when_the_api_has_no_bulk_endpoint(self):
+        api = LocalBrainApi({ "old": "x" }, bulk=False)
+        brain = Brain(api, write_back=True)
+        brain.write("count", 1)
+        brain.delete("old")
+
+        brain.flush()
+
+        self.assertEqual({ "count": "1" }, api.items)
+        self.assertEqual(
+            sorted([("POST", "/brain/bulk"), ("POST", "/brain?key=count"), ("DELETE", "/brain?key=old")]),
+            sorted(api.requests))
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_API_RETRIES": "0" })
+    def test_per_item_failures_are_reported(self):
+        responses.post(f"{BRAIN_URL}/bulk", status=404)
+        responses.post(f"{BRAIN_URL}?key=a")
+        responses.post(f"{BRAIN_URL}?key=b", status=500)
+        brain = Brain(ApiClient(42, None, None, None, None), write_back=True)
+        brain.write_many({ "a": 1, "b": 2 })
+
+        with self.assertRaises(ApiError) as context:
+            brain.flush()
+
+        self.assertEqual(500, context.exception.status_code)
+        self.assertIn("b", str(context.exception))
+        self.assertEqual({ "b": "2" }, brain._buffer) # pylint: disable=protected-access
+
+class BrainSearchTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(storage, "_search_api_unavailable_until", 0.0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_searches_an_index_when_the_api_cannot(self):
+        api = LocalBrainApi(CUSTOMER_ITEMS)
+        brain = Brain(api)
+
+        self.assertEqual(
+            [("order:1", { "customer": "acme", "total": 10 }), ("order:3", { "customer": "acme", "total": 30 })],
+            brain.search(prefix="order:", field="customer", equals="acme"))
+        self.assertEqual(["ORDER-archive", "order:1", "order:2", "order:3"], brain.search("order", keys_only=True))
+        self.assertEqual([("GET", "/brain/search?pageSize=100&prefix=order%3A&field=customer&equals=%22acme%22"), ("GET", "/brain/items?pageSize=100")], api.requests)
+
+        brain.write("order:4", { "customer": "acme" })
+        brain.delete_many(["order:1"])
+
+        self.assertEqual(["order:3", "order:4"], brain.search(prefix="order:", field="customer", equals="acme", keys_only=True))
+        self.assertEqual(4, len(api.requests))
+
+    def test_indexes_the_full_listing_when_the_api_cannot_page(self):
+        api = LocalBrainApi(CUSTOMER_ITEMS)
+        send = api.send
+        def send_without_pages(path, method, data=None, read_only=False):
+            if path.startswith("/brain/items"):
+                api.requests.append((method, path))
+                raise ApiError("Failed to communicate with Abbot.", 404)
+            return send(path, method, data, read_only)
+        api.send = send_without_pages
+        brain = Brain(api)
+
+        self.assertEqual(["order:1", "order:3"], brain.search(prefix="order:", field="customer", equals="acme", keys_only=True))
+        self.assertEqual([("GET", "/brain/search?pageSize=100&prefix=order%3A&field=customer&equals=%22acme%22&keysOnly=true"), ("GET", "/brain/items?pageSize=100"), ("GET", "/brain?key=")], api.requests)
+
+    def test_does_not_retry_the_api_for_a_while(self):
+        Brain(LocalBrainApi(CUSTOMER_ITEMS)).search(prefix="order:")
+        api = LocalBrainApi(CUSTOMER_ITEMS)
+
+        Brain(api).search(prefix="order:")
+
+        self.assertEqual([("GET", "/brain/items?pageSize=100")], api.requests)
+
+    def test_search_results_are_copies(self):
+        brain = Brain(LocalBrainApi(CUSTOMER_ITEMS))
+        brain.search(prefix="order:1")[0][1]["total"] = 0
+
+        self.assertEqual(10, brain.search(prefix="order:1")[0][1]["total"])
+
+    @responses.activate
+    def test_searches_with_the_api(self):
+        responses.get(f"{BRAIN_URL}/search", match=[matchers.query_param_matcher({ "pageSize": "100", "term": "order", "keysOnly": "true" })], json={
+            "items": [{ "key": "order:1" }, { "key": "order:2" }],
+        })
+
+        self.assertEqual(["order:1", "order:2"], Brain(ApiClient(42, None, None, None, None)).search("order", keys_only=True))
+
+    def test_raises_other_api_errors(self):
+        api = LocalBrainApi()
+        api.send = mock.Mock(side_effect=ApiError("Failed to communicate with Abbot.", 500))
+
+        with self.assertRaises(ApiError):
+            Brain(api).search("order")
+
+TABLE = [{ "id": i, "name": f"row {i}", "tags": ["a", "b"] } for i in range(500)]
+
+class BrainCompressionTest(unittest.TestCase):
+    def test_does_not_compress_by_default(self):
+        self.assertEqual(json.dumps(TABLE), encode_value(TABLE))
+
+    @mock.patch.dict(os.environ, { "ABBOT_BRAIN_COMPRESS_THRESHOLD": "1024" })
+    def test_compresses_large_values(self):
+        encoded = encode_value(TABLE)
+
+        self.assertTrue(encoded.startswith(COMPRESSED_MARKER))
+        self.assertLess(len(encoded), len(json.dumps(TABLE)) / 4)
+        self.assertEqual(TABLE, decode_value(encoded))
+        self.assertEqual('{"small": true}', encode_value({ "small": True }))
+
+    @mock.patch.dict(os.environ, { "ABBOT_BRAIN_COMPRESS_THRESHOLD": "1024" })
+    def test_brain_compresses_on_write_and_decompresses_on_read(self):
+        api = LocalBrainApi({ "legacy": TABLE })
+        brain = Brain(api)
+
+        brain.write("table", TABLE)
+        brain.write_many({ "copy": TABLE, "small": 1 })
+
+        self.assertTrue(api.items["table"].startswith(COMPRESSED_MARKER))
+        self.assertTrue(api.items["copy"].startswith(COMPRESSED_MARKER))
+        self.assertEqual("1", api.items["small"])
+        self.assertEqual(TABLE, brain.get("table"))
+        self.assertEqual(TABLE, brain.get("legacy"))
+        self.assertEqual({ "copy": TABLE, "legacy": TABLE }, brain.get_many(["copy", "legacy"]))
+        self.assertEqual({ "copy": TABLE, "legacy": TABLE, "small": 1, "table": TABLE }, dict(brain.iterate()))
+        self.assertEqual([("table", TABLE)], brain.search(prefix="t"))
+
+class BrainWriteBackTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(resilience, "_breaker", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @responses.activate
+    def test_writes_through_by_default(self):
+        write = responses.post(f"{BRAIN_URL}?key=count")
+
+        Brain(ApiClient(42, None, None, None, None)).write("count", 1)
+
+        self.assertEqual(1, write.call_count)
+        self.assertEqual({ "value": "1" }, json.loads(responses.calls[0].request.body))
+
+    def test_buffers_writes_and_collapses_them_per_key(self):
+        api = LocalBrainApi({ "old": "x" })
+        brain = Brain(api, write_back=True)
+
+        for i in range(10):
+            brain.write("count", i)
+        brain.write_many({ "a": 1, "b": 2 })
+        brain.delete("old")
+        brain.delete_many(["b"])
+
+        self.assertEqual(9, brain.get("count"))
+        self.assertEqual({ "a": 1, "b": None, "old": None }, brain.get_many(["a", "b", "old"]))
+        self.assertEqual([], api.requests)
+
+        brain.flush()
+        brain.flush()
+
+        self.assertEqual({ "count": "9", "a": "1" }, api.items)
+        self.assertEqual([("POST", "/brain/bulk")], api.requests)
+
+    def test_buffered_values_are_snapshots(self):
+        brain = Brain(LocalBrainApi(), write_back=True)
+        items = ["a"]
+
+        brain.write("items", items)
+        items.append("b")
+
+        self.assertEqual(["a"], brain.get("items"))
+
+    def test_listings_overlay_buffered_changes_without_sending_them(self):
+        api = LocalBrainApi({ "a": 1, "b": 2, "c": 3 })
+        brain = Brain(api, write_back=True)
+        brain.write("b", 20)
+        brain.write("d", 4)
+        brain.delete("c")
+
+        self.assertEqual([{ "key": "a", "value": "1" }, { "key": "b", "value": "20" }, { "key": "d", "value": "4" }], brain.list())
+        self.assertEqual([("a", 1), ("b", 20), ("d", 4)], list(brain.iterate()))
+        self.assertEqual(["a", "b"], list(brain.iterate(prefix="a", keys_only=True)) + list(brain.iterate(prefix="b", keys_only=True)))
+        with mock.patch.object(storage, "_search_api_unavailable_until", 0.0):
+            self.assertEqual(["a", "b", "d"], brain.search(keys_only=True))
+        self.assertNotIn(("POST", "/brain/bulk"), api.requests)
+        self.assertEqual({ "a": "1", "b": "2", "c": "3" }, api.items)
+
+    @responses.activate
+    def test_api_searches_overlay_buffered_changes(self):
+        responses.get(f"{BRAIN_URL}/search", json={
+            "items": [{ "key": "order:1", "value": "1" }, { "key": "order:2", "value": "2" }, { "key": "order:3", "value": "3" }],
+        })
+        brain = Brain(ApiClient(42, None, None, None, None), write_back=True)
+        brain.write("order:2", 20)
+        brain.write("order:0", 0)
+        brain.write("other", 5)
+        brain.delete("order:3")
+
+        with mock.patch.object(storage, "_search_api_unavailable_until", 0.0):
+            self.assertEqual([("order:0", 0), ("order:1", 1), ("order:2", 20)], brain.search("order"))
+        self.assertEqual(1, len(responses.calls))
+
+    def test_failed_changes_stay_buffered(self):
+        api = LocalBrainApi()
+        api.send = mock.Mock(return_value={ "results": [{ "key": "a", "status": 500 }, { "key": "b", "status": 200 }] })
+        brain = Brain(api, write_back=True)
+        brain.write("a", 1)
+        brain.write("b", 2)
+
+        with self.assertRaises(ApiError) as context:
+            brain.flush()
+
+        self.assertIn("a", str(context.exception))
+        self.assertEqual(500, context.exception.status_code)
+        self.assertEqual(1, brain.get("a"))
+        self.assertEqual({ "a": "1" }, brain._buffer) # pylint: disable=protected-access
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_BRAIN_WRITE_BACK": "true" })
+    def test_skill_writes_are_flushed_when_it_finishes(self):
+        responses.get(f"{BRAIN_URL}?key=count", status=404)
+        bulk = responses.add_callback(responses.POST, f"{BRAIN_URL}/bulk", callback=bulk_results)
+        code = "for i in range(5):\n    bot.brain.write('count', (bot.brain.get('count') or 0) + 1)\nbot.reply(str(bot.brain.get('count')))"
+
+        response = run_skill(create_request(code), None, None)
+
+        self.assertEqual([], response.errors)
+        self.assertEqual(["5"], response.replies)
+        self.assertEqual(1, bulk.call_count)
+        self.assertEqual(
+            { "operations": [{ "op": "write", "key": "count", "value": "5" }] },
+            json.loads(bulk.calls[0].request.body))
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_BRAIN_WRITE_BACK": "true", "ABBOT_API_RETRIES": "0" })
+    def test_flush_failures_are_reported_in_the_response(self):
+        responses.post(f"{BRAIN_URL}/bulk", status=500)
+
+        response = run_skill(create_request("bot.brain.write('count', 1)\nbot.reply('done')"), None, None)
+
+        self.assertFalse(response.success)
+        self.assertEqual("ApiError", response.errors[0]["errorId"])
+        self.assertEqual(["done"], response.replies)
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_BRAIN_WRITE_BACK": "true", "ABBOT_API_RETRIES": "0" })
+    def test_flush_failures_are_reported_with_the_skills_own_error(self):
+        responses.post(f"{BRAIN_URL}/bulk", status=500)
+
+        response = run_skill(create_request("bot.brain.write('count', 1)\nraise ValueError('nope')"), None, None)
+
+        self.assertFalse(response.success)
+        self.assertEqual({ "errorId": "ValueError", "description": "nope" }, response.errors[0])
+        self.assertEqual("ApiError", response.errors[1]["errorId"])
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_BRAIN_WRITE_BACK": "true", "ABBOT_API_RETRIES": "0" })
+    @mock.patch.object(logging.Logger.root, "level", logging.Logger.root.level)
+    def test_function_reports_flush_failures_with_the_skills_own_error(self):
+        responses.post(f"{BRAIN_URL}/bulk", status=500)
+        request = func.HttpRequest("POST", "/api/SkillRunner", body=json.dumps(create_request("bot.brain.write('count', 1)\nraise ValueError('nope')")).encode())
+
+        response = SkillRunner.main(request)
+
+        self.assertEqual(500, response.status_code)
+        errors = json.loads(response.get_body())["Errors"]
+        self.assertEqual({ "errorId": "ValueError", "description": "nope" }, errors[0])
+        self.assertEqual("ApiError", errors[1]["errorId"])
+
+if __name__ == '__main__':
+    unittest.main()
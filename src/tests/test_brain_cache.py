@@ -0,0 +1,144 @@
+import json
+import os
+import unittest
+
+from unittest import mock
+
+import responses
+
+from responses import matchers
+
+from SkillRunner.bot import brain_cache, resilience
+from SkillRunner.bot.apiclient import ApiClient
+from SkillRunner.bot.brain_cache import BrainCache, get_brain_cache
+from SkillRunner.bot.local_brain import LocalBrainApi
+from SkillRunner.bot.storage import Brain
+
+#pylint: disable=missing-docstring,
+
+BRAIN_URL = "https://localhost:4979/api/skills/42/brain"
+
+class BrainCacheTest(unittest.TestCase):
+    def test_evicts_least_recently_used(self):
+        cache = BrainCache(2)
+        cache.put(1, "a", "1", None)
+        cache.put(1, "b", "2", None)
+        cache.get(1, "a")
+        cache.put(1, "c", "3", None)
+
+        self.assertEqual(2, len(cache))
+        self.assertIsNone(cache.get(1, "b")[0])
+        self.assertEqual("1", cache.get(1, "a")[0].value)
+
+    def test_entries_are_fresh_until_ttl(self):
+        cache = BrainCache(10, ttl=60)
+        cache.put(1, "a", "1", '"v1"')
+
+        entry, fresh = cache.get(1, "a")
+
+        self.assertTrue(fresh)
+        self.assertEqual('"v1"', entry.etag)
+        self.assertIsNone(cache.get(2, "a")[0])
+
+        cache.ttl = 0
+        self.assertFalse(cache.get(1, "a")[1])
+
+    def test_invalidate(self):
+        cache = BrainCache(10)
+        cache.put(1, "a", "1", None)
+        cache.put(1, "b", "2", None)
+
+        cache.invalidate(1, ["a", "missing"])
+
+        self.assertIsNone(cache.get(1, "a")[0])
+        self.assertIsNotNone(cache.get(1, "b")[0])
+
+    @mock.patch.object(brain_cache, "_cache", None)
+    def test_is_opt_in(self):
+        with mock.patch.dict(os.environ, { "ABBOT_BRAIN_CACHE_SIZE": "0" }):
+            self.assertIsNone(get_brain_cache())
+        with mock.patch.dict(os.environ, { "ABBOT_BRAIN_CACHE_SIZE": "10", "ABBOT_BRAIN_CACHE_TTL": "30" }):
+            cache = get_brain_cache()
+            self.assertEqual((10, 30.0), (cache.max_entries, cache.ttl))
+            self.assertIs(cache, get_brain_cache())
+
+class CachedBrainTest(unittest.TestCase):
+    def create_brain(self, cache):
+        # A new client for each invocation, as the Bot creates.
+        return Brain(ApiClient(42, None, None, None, None), cache=cache)
+
+    @responses.activate
+    def test_serves_values_across_invocations(self):
+        read = responses.get(f"{BRAIN_URL}?key=config", json={ "value": json.dumps({ "mode": "fast" }) }, headers={ "ETag": '"v1"' })
+        cache = BrainCache(10, ttl=60)
+
+        self.assertEqual({ "mode": "fast" }, self.create_brain(cache).get("config"))
+        self.assertEqual({ "mode": "fast" }, self.create_brain(cache).get("config"))
+
+        self.assertEqual(1, read.call_count)
+
+    @responses.activate
+    def test_revalidates_stale_values(self):
+        responses.get(f"{BRAIN_URL}?key=config", json={ "value": "1" }, headers={ "ETag": '"v1"' })
+        not_modified = responses.get(
+            f"{BRAIN_URL}?key=config",
+            status=304,
+            match=[matchers.header_matcher({ "If-None-Match": '"v1"' })])
+        cache = BrainCache(10, ttl=0)
+
+        self.assertEqual(1, self.create_brain(cache).get("config"))
+        self.assertEqual(1, self.create_brain(cache).get("config"))
+
+        self.assertEqual(1, not_modified.call_count)
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_API_RETRIES": "0" })
+    @mock.patch.object(resilience, "_breaker", None)
+    def test_serves_stale_values_when_revalidating_fails(self):
+        responses.get(f"{BRAIN_URL}?key=config", json={ "value": "1" }, headers={ "ETag": '"v1"' })
+        responses.get(f"{BRAIN_URL}?key=config", status=503)
+        cache = BrainCache(10, ttl=0)
+
+        self.assertEqual(1, self.create_brain(cache).get("config"))
+        self.assertEqual(1, self.create_brain(cache).get("config"))
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_API_RETRIES": "0" })
+    def test_forgets_values_that_are_gone(self):
+        responses.get(f"{BRAIN_URL}?key=config", json={ "value": "1" }, headers={ "ETag": '"v1"' })
+        responses.get(f"{BRAIN_URL}?key=config", status=404)
+        cache = BrainCache(10, ttl=0)
+
+        self.assertEqual(1, self.create_brain(cache).get("config"))
+        self.assertIsNone(self.create_brain(cache).get("config"))
+        self.assertEqual(0, len(cache))
+
+    @responses.activate
+    def test_writes_invalidate_values(self):
+        read = responses.get(f"{BRAIN_URL}?key=config", json={ "value": "1" }, headers={ "ETag": '"v1"' })
+        responses.post(f"{BRAIN_URL}?key=config")
+        cache = BrainCache(10, ttl=60)
+        self.create_brain(cache).get("config")
+
+        self.create_brain(cache).write("config", 2)
+        self.create_brain(cache).get("config")
+
+        self.assertEqual(2, read.call_count)
+        self.assertNotIn("If-None-Match", responses.calls[-1].request.headers)
+
+    def test_bulk_and_buffered_writes_invalidate_values(self):
+        api = LocalBrainApi({ "a": 1, "b": 2 })
+        cache = BrainCache(10, ttl=60)
+        Brain(api, cache=cache).get("a")
+        Brain(api, cache=cache).get("b")
+
+        Brain(api, cache=cache).write_many({ "a": 10 })
+        buffered = Brain(api, write_back=True, cache=cache)
+        buffered.write("b", 20)
+        buffered.flush()
+
+        self.assertEqual(10, Brain(api, cache=cache).get("a"))
+        self.assertEqual(20, Brain(api, cache=cache).get("b"))
+
+if __name__ == '__main__':
+    unittest.main()
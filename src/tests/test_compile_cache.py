@@ -0,0 +1,165 @@
+import importlib.util
+import marshal
+import os
+import tempfile
+import unittest
+
+from SkillRunner.bot.policy import RestrictivePolicy
+from SkillRunner.bot.policy.compile_cache import CompileCache, get_compile_cache, source_hash
+from SkillRunner.bot.policy.compile_store import CompiledSkillStore
+
+#pylint: disable=missing-docstring,
+
+class CompileCacheTest(unittest.TestCase):
+    def test_reuses_compiled_code(self):
+        cache = CompileCache()
+        compiled = []
+        def compile_func(code):
+            compiled.append(code)
+            return compile(code, "<test>", "exec")
+
+        first = cache.get_or_compile("x = 1", "test", compile_func)
+        second = cache.get_or_compile("x = 1", "test", compile_func)
+
+        self.assertIs(first, second)
+        self.assertEqual(["x = 1"], compiled)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+
+    def test_policy_key_is_part_of_cache_key(self):
+        cache = CompileCache()
+        first = cache.get_or_compile("x = 1", "a", lambda code: compile(code, "<a>", "exec"))
+        second = cache.get_or_compile("x = 1", "b", lambda code: compile(code, "<b>", "exec"))
+
+        self.assertIsNot(first, second)
+        self.assertEqual(2, cache.misses)
+
+    def test_evicts_least_recently_used(self):
+        cache = CompileCache(max_entries=2)
+        compile_func = lambda code: compile(code, "<test>", "exec")
+        cache.get_or_compile("a = 1", "test", compile_func)
+        cache.get_or_compile("b = 1", "test", compile_func)
+        cache.get_or_compile("a = 1", "test", compile_func)
+        cache.get_or_compile("c = 1", "test", compile_func)
+
+        # 'b' was the least recently used, so it was evicted
+        cache.get_or_compile("a = 1", "test", compile_func)
+        self.assertEqual(2, cache.hits)
+        cache.get_or_compile("b = 1", "test", compile_func)
+        self.assertEqual(4, cache.misses)
+        self.assertEqual(2, cache.evictions)
+
+    def test_evicts_by_source_size(self):
+        cache = CompileCache(max_source_bytes=12)
+        compile_func = lambda code: compile(code, "<test>", "exec")
+        cache.get_or_compile("a = 1", "test", compile_func)
+        cache.get_or_compile("b = 1", "test", compile_func)
+        cache.get_or_compile("c = 1", "test", compile_func)
+
+        self.assertEqual(2, cache.stats()["entries"])
+        self.assertEqual(10, cache.stats()["source_bytes"])
+
+    def test_does_not_cache_compile_errors(self):
+        cache = CompileCache()
+        with self.assertRaises(SyntaxError):
+            cache.get_or_compile("x = ", "test", lambda code: compile(code, "<test>", "exec"))
+        self.assertEqual(0, cache.stats()["entries"])
+
+    def test_restrictive_policy_uses_process_cache(self):
+        code = "output.append(1)"
+        RestrictivePolicy().exec(code, { "output": [] })
+        hits = get_compile_cache().hits
+
+        output = []
+        RestrictivePolicy().exec(code, { "output": output })
+        self.assertEqual([1], output)
+        self.assertEqual(hits + 1, get_compile_cache().hits)
+
+class CompiledSkillStoreTest(unittest.TestCase):
+    def setUp(self):
+        self._dir = tempfile.TemporaryDirectory()
+        self.directory = self._dir.name
+
+    def tearDown(self):
+        self._dir.cleanup()
+
+    def test_survives_a_new_cache(self):
+        store = CompiledSkillStore(self.directory)
+        compiled = []
+        def compile_func(code):
+            compiled.append(code)
+            return compile(code, "<test>", "exec")
+
+        CompileCache(store=store).get_or_compile("output.append(1)", "test", compile_func)
+
+        # A fresh cache (as after a restart) loads from disk instead of compiling
+        code = CompileCache(store=CompiledSkillStore(self.directory)).get_or_compile("output.append(1)", "test", compile_func)
+        output = []
+        exec(code, { "output": output }) # pylint: disable=exec-used
+        self.assertEqual([1], output)
+        self.assertEqual(["output.append(1)"], compiled)
+
+    def test_key_includes_policy(self):
+        store = CompiledSkillStore(self.directory)
+        store.save(source_hash("x = 1"), "a", compile("x = 1", "<test>", "exec"))
+        self.assertIsNotNone(store.load(source_hash("x = 1"), "a"))
+        self.assertIsNone(store.load(source_hash("x = 1"), "b"))
+
+    def test_discards_corrupt_entries(self):
+        store = CompiledSkillStore(self.directory)
+        key = source_hash("x = 1")
+        store.save(key, "test", compile("x = 1", "<test>", "exec"))
+        [path] = [e.path for e in os.scandir(self.directory)]
+        with open(path, "wb") as f:
+            f.write(b"garbage")
+
+        self.assertIsNone(store.load(key, "test"))
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_discards_entries_that_are_not_code(self):
+        store = CompiledSkillStore(self.directory)
+        key = source_hash("x = 1")
+        store.save(key, "test", compile("x = 1", "<test>", "exec"))
+        [path] = [e.path for e in os.scandir(self.directory)]
+        with open(path, "wb") as f:
+            f.write(importlib.util.MAGIC_NUMBER + marshal.dumps({ "not": "code" }))
+
+        self.assertIsNone(store.load(key, "test"))
+        self.assertEqual([], os.listdir(self.directory))
+
+    def test_enforces_size_cap(self):
+        store = CompiledSkillStore(self.directory, max_bytes=1024)
+        for i in range(100):
+            code = f"x = {i}"
+            store.save(source_hash(code), "test", compile(code, "<test>", "exec"))
+
+        total = sum(e.stat().st_size for e in os.scandir(self.directory))
+        self.assertNotEqual([], os.listdir(self.directory))
+        self.assertLessEqual(total, 1024)
+
+    def test_overwriting_an_entry_does_not_count_it_twice(self):
+        first = compile("x = 1", "<test>", "exec")
+        entry_bytes = len(importlib.util.MAGIC_NUMBER + marshal.dumps(first))
+        store = CompiledSkillStore(self.directory, max_bytes=entry_bytes * 3)
+        store.save(source_hash("x = 1"), "test", first)
+        store.save(source_hash("x = 1"), "test", first)
+
+        self.assertEqual(entry_bytes, store._total_bytes) # pylint: disable=protected-access
+
+    def test_warm_from_directory(self):
+        with tempfile.TemporaryDirectory() as sources:
+            with open(os.path.join(sources, "hello.py"), "w", encoding="utf-8") as f:
+                f.write("bot.reply('hello')")
+            with open(os.path.join(sources, "broken.py"), "w", encoding="utf-8") as f:
+                f.write("bot.reply(")
+
+            store = CompiledSkillStore(self.directory)
+            class Policy:
+                def compile(self, code):
+                    return CompileCache(store=store).get_or_compile(code, "test", lambda c: compile(c, "<test>", "exec"))
+
+            self.assertEqual(1, store.warm(sources, Policy()))
+            self.assertIsNotNone(store.load(source_hash("bot.reply('hello')"), "test"))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from SkillRunner.bot.policy import RestrictivePolicy
+from SkillRunner.hosting.thread_pool import ThreadPool
+
+from tests.helpers import create_request
+
+#pylint: disable=missing-docstring,
+
+def try_import(policy, module):
+    output = []
+    try:
+        policy.exec(f"import {module}\noutput.append({module})", { "output": output })
+    except PermissionError:
+        return "denied"
+    return output[0].__name__
+
+class ConcurrentExecutionTest(unittest.TestCase):
+    def test_environments_do_not_share_import_policy(self):
+        json_only = RestrictivePolicy()
+        json_only.allow_module("json")
+        json_only.deny_module("csv")
+        json_only.freeze()
+
+        csv_only = RestrictivePolicy()
+        csv_only.allow_module("csv")
+        csv_only.deny_module("json")
+        csv_only.freeze()
+
+        # The environment built last used to win for every policy.
+        self.assertEqual("json", try_import(json_only, "json"))
+        self.assertEqual("denied", try_import(json_only, "csv"))
+
+        cases = [(json_only, "json", "json"), (json_only, "csv", "denied"), (csv_only, "csv", "csv"), (csv_only, "json", "denied")] * 100
+        with ThreadPoolExecutor(max_workers=16) as executor:
+            results = list(executor.map(lambda case: try_import(case[0], case[1]), cases))
+
+        self.assertEqual([expected for _, _, expected in cases], results)
+
+    def test_parallel_skills_do_not_interfere(self):
+        pool = ThreadPool(16)
+        self.addCleanup(pool.close)
+
+        code = """
+import json
+for i in range(200):
+    bot.outputs['count'] = i + 1
+bot.reply(json.dumps({ 'skill': bot.skill_id, 'count': bot.outputs['count'] }))
+"""
+        def run(skill_id):
+            if skill_id % 3 == 0:
+                return pool.run(create_request("import os", skill_id), "token", None)
+            return pool.run(create_request(code, skill_id), "token", None)
+
+        with ThreadPoolExecutor(max_workers=32) as executor:
+            responses = list(executor.map(run, range(1, 301)))
+
+        for skill_id, response in enumerate(responses, start=1):
+            if skill_id % 3 == 0:
+                self.assertFalse(response.success)
+                self.assertEqual("PermissionError", response.errors[0]["errorId"])
+            else:
+                self.assertTrue(response.success, response.errors)
+                self.assertEqual([f'{{"skill": {skill_id}, "count": 200}}'], response.replies)
+                self.assertEqual({ "count": 200 }, response.outputs)
+
+if __name__ == '__main__':
+    unittest.main()
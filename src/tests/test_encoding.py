@@ -0,0 +1,72 @@
+import json
+import unittest
+
+import jsonpickle
+
+from SkillRunner import ResponseManager
+from SkillRunner.bot.exceptions import InterpreterError
+from SkillRunner.hosting.encoding import RESPONSE_MANAGER_FIELDS, encode_error, encode_json, encode_response
+from SkillRunner.hosting.execution import SkillRunResponse
+
+#pylint: disable=missing-docstring,
+
+class EncodingTest(unittest.TestCase):
+    def test_encodes_interpreter_error(self):
+        error = InterpreterError("SyntaxError", "invalid syntax", 3, 7)
+
+        self.assertEqual({
+            "errorId": "SyntaxError",
+            "lineStart": 3,
+            "lineEnd": 3,
+            "spanStart": 7,
+            "spanEnd": 8,
+            "description": "invalid syntax",
+        }, encode_error(error))
+
+    def test_encodes_other_exceptions_and_dicts(self):
+        self.assertEqual({ "errorId": "ValueError", "description": "nope" }, encode_error(ValueError("nope")))
+        self.assertEqual({ "errorId": "X", "description": "y" }, encode_error({ "errorId": "X", "description": "y" }))
+
+    def test_skill_run_response_with_interpreter_error(self):
+        response = SkillRunResponse()
+        response.add_reply("Hello ✨")
+        response.add_error(InterpreterError("NoResponseError", "You must reply", 0, 0))
+        response.outputs = { "answer": 42 }
+
+        encoded = response.encode()
+
+        self.assertIsInstance(encoded, bytes)
+        self.assertEqual({
+            "contentType": None,
+            "content": None,
+            "success": False,
+            "errors": [{ "errorId": "NoResponseError", "lineStart": 0, "lineEnd": 0, "spanStart": 0, "spanEnd": 1, "description": "You must reply" }],
+            "replies": ["Hello ✨"],
+            "headers": None,
+            "outputs": { "answer": 42 },
+        }, json.loads(encoded))
+        self.assertEqual(encoded.decode("utf-8"), response.toJSON())
+
+    def test_response_manager_matches_previous_encoding(self):
+        rm = ResponseManager()
+        rm.add("Hello")
+        rm.addError(InterpreterError("RuntimeError", "boom", 1, 2))
+        rm.addError({ "errorId": "ValueError", "description": "nope" })
+        rm.Headers = { "X-Test": ["1"] }
+
+        expected = json.loads(jsonpickle.encode(rm, unpicklable=False))
+        self.assertEqual(expected, json.loads(encode_response(rm, RESPONSE_MANAGER_FIELDS)))
+
+    def test_encodes_objects_by_their_attributes(self):
+        class Thing:
+            def __init__(self):
+                self.name = "thing"
+
+        self.assertEqual({ "value": { "name": "thing" } }, json.loads(encode_json({ "value": Thing() })))
+
+    def test_rejects_values_that_cannot_be_encoded(self):
+        with self.assertRaises(TypeError):
+            encode_json({ "value": { 1, 2 } })
+
+if __name__ == '__main__':
+    unittest.main()
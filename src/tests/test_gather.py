@@ -0,0 +1,118 @@
+import os
+import threading
+import time
+import unittest
+
+from unittest import mock
+
+import responses
+
+from SkillRunner.bot.apiclient import ApiClient
+from SkillRunner.bot.concurrency import gather
+from SkillRunner.bot.users import Users
+from SkillRunner.hosting.execution import run_skill
+
+from tests.helpers import create_request
+
+#pylint: disable=missing-docstring,
+
+USERS_API_BASE = "https://localhost:4979/api/skills/42/users"
+
+class Tracker(object):
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.running = 0
+        self.most_running = 0
+
+    def call(self, result, delay=0.02):
+        with self.lock:
+            self.running += 1
+            self.most_running = max(self.most_running, self.running)
+        time.sleep(delay)
+        with self.lock:
+            self.running -= 1
+        return result
+
+class GatherTest(unittest.TestCase):
+    def test_returns_results_in_order(self):
+        tracker = Tracker()
+
+        results = gather(*[lambda i=i: tracker.call(i, delay=0.001 * (10 - i)) for i in range(10)])
+
+        self.assertEqual(list(range(10)), results)
+
+    def test_runs_calls_concurrently_up_to_limit(self):
+        tracker = Tracker()
+
+        started = time.monotonic()
+        gather(*[lambda i=i: tracker.call(i, delay=0.1) for i in range(12)], max_concurrency=4)
+
+        self.assertEqual(4, tracker.most_running)
+        self.assertLess(time.monotonic() - started, 0.6)
+
+    @mock.patch.dict(os.environ, { "ABBOT_API_MAX_CONCURRENCY": "3" })
+    def test_caps_requested_concurrency(self):
+        tracker = Tracker()
+
+        gather(*[lambda i=i: tracker.call(i, delay=0.05) for i in range(12)], max_concurrency=1000)
+
+        self.assertEqual(3, tracker.most_running)
+
+    def test_raises_first_error_after_all_calls_finish(self):
+        tracker = Tracker()
+        def fail(message):
+            raise ValueError(message)
+
+        with self.assertRaises(ValueError) as context:
+            gather(lambda: tracker.call(1, delay=0.05), lambda: fail("first"), lambda: fail("second"))
+
+        self.assertEqual("first", str(context.exception))
+        self.assertEqual(0, tracker.running)
+
+    def test_returns_exceptions_when_asked(self):
+        def fail():
+            raise ValueError("nope")
+
+        results = gather(lambda: 1, fail, return_exceptions=True)
+
+        self.assertEqual(1, results[0])
+        self.assertIsInstance(results[1], ValueError)
+
+    def test_nested_gather_runs_inline(self):
+        results = gather(*[lambda i=i: gather(lambda: i, lambda: -i) for i in range(3)])
+
+        self.assertEqual([[0, 0], [1, -1], [2, -2]], results)
+
+class AsyncApiClientTest(unittest.IsolatedAsyncioTestCase):
+    @responses.activate
+    async def test_send_async(self):
+        responses.get(f"{USERS_API_BASE}/U1", json={ "Id": "U1" })
+        client = ApiClient(42, None, None, None, None)
+
+        self.assertEqual({ "Id": "U1" }, await client.get_async("/users/U1"))
+
+class GetUsersTest(unittest.TestCase):
+    @responses.activate
+    def test_get_users(self):
+        for user_id in ["U1", "U2", "U3"]:
+            responses.get(f"{USERS_API_BASE}/{user_id}", json={ "Id": user_id, "Name": f"User {user_id}", "customFields": {} })
+        users = Users(ApiClient(42, None, None, None, None))
+
+        profiles = users.get_users(["U3", "U1", "U2"])
+
+        self.assertEqual(["U3", "U1", "U2"], [p.id for p in profiles])
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_skill_gathers_calls(self):
+        for user_id in ["U1", "U2"]:
+            responses.get(f"{USERS_API_BASE}/{user_id}", json={ "Id": user_id, "Name": f"User {user_id}", "customFields": {} })
+        code = 'names = bot.gather(lambda: bot.users.get_user("U1").name, lambda: bot.users.get_user("U2").name)\nbot.reply(", ".join(names))'
+
+        response = run_skill(create_request(code), None, None)
+
+        self.assertEqual([], response.errors)
+        self.assertEqual(["User U1, User U2"], response.replies)
+
+if __name__ == '__main__':
+    unittest.main()
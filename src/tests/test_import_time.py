@@ -0,0 +1,53 @@
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+#pylint: disable=missing-docstring,
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Generous enough to pass on a slow CI machine, tight enough to catch an eager import of a heavy library.
+IMPORT_BUDGET_SECONDS = float(os.environ.get("ABBOT_IMPORT_BUDGET_SECONDS", 1.0))
+
+# Libraries we make available to skills, but which skills have to import themselves.
+LAZY_MODULES = [
+    "nltk",
+    "numpy",
+    "pandas",
+    "bs4",
+    "soupsieve",
+    "boto3",
+]
+
+MEASURE_IMPORT = """
+import json, sys, time
+start = time.perf_counter()
+import SkillRunner.bot.bot
+elapsed = time.perf_counter() - start
+print(json.dumps({ "elapsed": elapsed, "modules": sorted(sys.modules) }))
+"""
+
+class ImportTimeTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        # Measure in a fresh interpreter, since this one has already imported everything.
+        output = subprocess.run(
+            [sys.executable, "-c", MEASURE_IMPORT],
+            cwd=SRC_DIR,
+            env={ **os.environ, "ABBOT_ENV": "test" },
+            capture_output=True,
+            check=True,
+            text=True)
+        cls.result = json.loads(output.stdout)
+
+    def test_heavy_skill_libraries_are_not_imported(self):
+        loaded = [m for m in LAZY_MODULES if m in self.result["modules"]]
+        self.assertEqual([], loaded)
+
+    def test_import_is_within_budget(self):
+        self.assertLess(self.result["elapsed"], IMPORT_BUDGET_SECONDS)
+
+if __name__ == '__main__':
+    unittest.main()
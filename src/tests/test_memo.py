@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+import time
+import unittest
+
+from unittest import mock
+
+import responses
+
+from SkillRunner.bot.apiclient import ApiClient
+from SkillRunner.bot.memo import GetMemo
+from SkillRunner.bot.storage import Brain
+
+#pylint: disable=missing-docstring,
+
+BRAIN_URL = "https://localhost:4979/api/skills/42/brain"
+
+class GetMemoTest(unittest.TestCase):
+    def test_memoizes_responses(self):
+        memo = GetMemo()
+        fetch = mock.Mock(return_value={ "value": [1] })
+
+        first = memo.get("/users/U1", fetch)
+        first["value"].append(2)
+
+        self.assertEqual({ "value": [1] }, memo.get("/users/U1", fetch))
+        self.assertEqual(1, fetch.call_count)
+        self.assertEqual({ "hits": 1, "coalesced": 0, "misses": 1 }, memo.stats())
+
+    def test_does_not_memoize_failures(self):
+        memo = GetMemo()
+        fetch = mock.Mock(side_effect=[ValueError("boom"), { "ok": True }])
+
+        with self.assertRaises(ValueError):
+            memo.get("/secret?key=a", fetch)
+
+        self.assertEqual({ "ok": True }, memo.get("/secret?key=a", fetch))
+
+    def test_coalesces_concurrent_requests(self):
+        memo = GetMemo()
+        fetch = mock.Mock(side_effect=lambda: time.sleep(0.1) or "result")
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(memo.get("/users/U1", fetch))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(["result"] * 5, results)
+        self.assertEqual(1, fetch.call_count)
+        self.assertEqual({ "hits": 0, "coalesced": 4, "misses": 1 }, memo.stats())
+
+    def test_invalidates_affected_resources(self):
+        memo = GetMemo()
+        paths = ["/brain?key=a", "/brain?key=b", "/brain?key=", "/customers", "/customers/5", "/customers/name/acme", "/users/U1"]
+        for path in paths:
+            memo.get(path, lambda: "cached")
+
+        memo.invalidate("/brain?key=a")
+        memo.invalidate("/customers/5")
+        fetch = mock.Mock(return_value="fresh")
+
+        self.assertEqual(
+            ["fresh", "cached", "fresh", "fresh", "fresh", "fresh", "cached"],
+            [memo.get(path, fetch) for path in paths])
+
+class ApiClientMemoTest(unittest.TestCase):
+    @responses.activate
+    def test_brain_reads_are_memoized_until_written(self):
+        read = responses.get(f"{BRAIN_URL}?key=count", json={ "value": json.dumps(1) })
+        write = responses.post(f"{BRAIN_URL}?key=count")
+        brain = Brain(ApiClient(42, None, None, None, None))
+
+        self.assertEqual([1, 1, 1], [brain.get("count") for _ in range(3)])
+        self.assertEqual(1, read.call_count)
+
+        brain.write("count", 2)
+        brain.get("count")
+
+        self.assertEqual(1, write.call_count)
+        self.assertEqual(2, read.call_count)
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_API_MEMOIZE": "false" })
+    def test_memoization_can_be_disabled(self):
+        read = responses.get(f"{BRAIN_URL}?key=count", json={ "value": json.dumps(1) })
+        brain = Brain(ApiClient(42, None, None, None, None))
+
+        brain.get("count")
+        brain.get("count")
+
+        self.assertEqual(2, read.call_count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import multiprocessing
+import os
+import tempfile
+import unittest
+
+import responses
+
+from SkillRunner.bot.apiclient import ApiClient
+from SkillRunner.bot.metrics import API_REQUESTS, COMPILE_CACHE, ERRORS, PHASE_SECONDS, REGISTRY, MetricsRegistry, path_template, record_errors
+from SkillRunner.bot.policy.compile_cache import CompileCache
+from SkillRunner.hosting.execution import run_skill
+from SkillRunner.hosting.shared_metrics import SharedMetrics
+from SkillRunner.hosting.worker_pool import WorkerPool
+
+from tests.helpers import create_request
+
+#pylint: disable=missing-docstring,protected-access
+
+def phase_count(phase):
+    series = PHASE_SECONDS._values.get((phase,))
+    return 0 if series is None else series[2]
+
+class MetricsRegistryTest(unittest.TestCase):
+    def test_renders_prometheus_text(self):
+        registry = MetricsRegistry()
+        registry.set_constant_labels(entrypoint="flask", policy="restrictive")
+        counter = registry.counter("test_total", "A counter.", ("kind",))
+        histogram = registry.histogram("test_seconds", "A histogram.", ("phase",), buckets=(0.1, 1.0))
+        counter.inc(kind="a")
+        counter.inc(2, kind="a")
+        histogram.observe(0.05, phase="exec")
+        histogram.observe(0.5, phase="exec")
+        histogram.observe(5, phase="exec")
+
+        self.assertEqual("\n".join([
+            "# HELP test_total A counter.",
+            "# TYPE test_total counter",
+            'test_total{entrypoint="flask",policy="restrictive",kind="a"} 3',
+            "# HELP test_seconds A histogram.",
+            "# TYPE test_seconds histogram",
+            'test_seconds_bucket{entrypoint="flask",policy="restrictive",phase="exec",le="0.1"} 1',
+            'test_seconds_bucket{entrypoint="flask",policy="restrictive",phase="exec",le="1.0"} 2',
+            'test_seconds_bucket{entrypoint="flask",policy="restrictive",phase="exec",le="+Inf"} 3',
+            'test_seconds_sum{entrypoint="flask",policy="restrictive",phase="exec"} 5.55',
+            'test_seconds_count{entrypoint="flask",policy="restrictive",phase="exec"} 3',
+        ]) + "\n", registry.render())
+
+    def test_escapes_label_values(self):
+        registry = MetricsRegistry()
+        registry.counter("test_total", "A counter.", ("error_id",)).inc(error_id='a "quoted"\nvalue')
+
+        self.assertIn('test_total{error_id="a \\"quoted\\"\\nvalue"} 1', registry.render())
+
+    def test_drain_and_merge(self):
+        worker = MetricsRegistry()
+        worker.counter("test_total", "A counter.", ("kind",)).inc(kind="a")
+        worker.histogram("test_seconds", "A histogram.", buckets=(1.0,)).observe(0.5)
+        server = MetricsRegistry()
+        counter = server.counter("test_total", "A counter.", ("kind",))
+        histogram = server.histogram("test_seconds", "A histogram.", buckets=(1.0,))
+        counter.inc(kind="a")
+
+        server.merge(worker.drain())
+        server.merge(worker.drain())
+
+        self.assertEqual({ ("a",): 2 }, counter._values)
+        self.assertEqual({ (): [[1, 0], 0.5, 1] }, histogram._values)
+
+    def test_path_template(self):
+        self.assertEqual("/brain", path_template("/brain?key=secret"))
+        self.assertEqual("/rooms/{id}/topic", path_template("/rooms/C123/topic"))
+        self.assertEqual("/customers/name/{id}", path_template("/customers/name/Acme"))
+        self.assertEqual("/users/{id}", path_template("/users/U123"))
+        self.assertEqual("/reply", path_template("/reply"))
+
+    def test_path_template_keeps_brain_bulk_endpoint(self):
+        self.assertEqual("/brain/bulk", path_template("/brain/bulk"))
+
+    def test_path_template_keeps_brain_items_endpoint(self):
+        self.assertEqual("/brain/items", path_template("/brain/items?pageSize=100&prefix=user%3A"))
+
+    def test_path_template_keeps_brain_search_endpoint(self):
+        self.assertEqual("/brain/search", path_template("/brain/search?term=order"))
+
+    def test_record_errors(self):
+        before = ERRORS._values.get(("TestError",), 0)
+        record_errors([{ "errorId": "TestError", "description": "" }, { "errorId": "TestError", "description": "" }])
+        self.assertEqual(before + 2, ERRORS._values[("TestError",)])
+
+class InstrumentationTest(unittest.TestCase):
+    @responses.activate
+    def test_counts_api_calls_by_path_template(self):
+        responses.add(responses.GET, "https://localhost:4979/api/skills/42/users/U1", json={}, status=200)
+        before = API_REQUESTS._values.get(("GET", "/users/{id}", "200"), 0)
+
+        ApiClient(42, None, None, None, None).get("/users/U1")
+
+        self.assertEqual(before + 1, API_REQUESTS._values[("GET", "/users/{id}", "200")])
+
+    def test_counts_compile_cache_lookups(self):
+        cache = CompileCache()
+        hits = COMPILE_CACHE._values.get(("hit",), 0)
+        misses = COMPILE_CACHE._values.get(("miss",), 0)
+
+        cache.get_or_compile("x = 1", "test", lambda code: compile(code, "<test>", "exec"))
+        cache.get_or_compile("x = 1", "test", lambda code: compile(code, "<test>", "exec"))
+
+        self.assertEqual(hits + 1, COMPILE_CACHE._values[("hit",)])
+        self.assertEqual(misses + 1, COMPILE_CACHE._values[("miss",)])
+
+    def test_times_skill_phases(self):
+        before = { phase: phase_count(phase) for phase in ("bot_init", "policy", "compile", "exec") }
+
+        run_skill(create_request("bot.reply('Hello')"), "token", None)
+
+        for phase, count in before.items():
+            self.assertEqual(count + 1, phase_count(phase), phase)
+
+    def test_worker_pool_reports_worker_metrics(self):
+        pool = WorkerPool(1, timeout=10, preload=[])
+        self.addCleanup(pool.close)
+        before = phase_count("exec")
+
+        pool.run(create_request("bot.reply('Hello')"), "token", None)
+
+        self.assertEqual(before + 1, phase_count("exec"))
+        self.assertIn("abbot_runner_phase_seconds_bucket", REGISTRY.render())
+
+class SharedMetricsTest(unittest.TestCase):
+    def test_renders_the_metrics_of_every_process(self):
+        registry = MetricsRegistry()
+        registry.set_constant_labels(entrypoint="flask")
+        counter = registry.counter("test_total", "A counter.", ("kind",))
+        histogram = registry.histogram("test_seconds", "A histogram.", buckets=(1.0,))
+        with tempfile.TemporaryDirectory() as directory:
+            shared = SharedMetrics(registry, directory, interval=60)
+            counter.inc(kind="a")
+            shared.publish()
+
+            def serve_in_child():
+                # The child discards the values it inherited, which the parent has already published.
+                shared.start()
+                counter.inc(2, kind="a")
+                histogram.observe(0.5)
+                shared.publish()
+            child = multiprocessing.get_context("fork").Process(target=serve_in_child)
+            child.start()
+            child.join()
+
+            counter.inc(kind="b")
+            self.assertIn('test_total{entrypoint="flask",kind="a"} 3', shared.render())
+
+            # Once the child has exited, its metrics are folded into the total, and its files are removed.
+            shared.retire(child.pid)
+            shared.retire(child.pid)
+            output = shared.render()
+
+            self.assertEqual([], [name for name in os.listdir(directory) if name.startswith(f"{child.pid}-")])
+            self.assertIn("retired.metrics", os.listdir(directory))
+            self.assertIn('test_total{entrypoint="flask",kind="a"} 3', output)
+            self.assertIn('test_total{entrypoint="flask",kind="b"} 1', output)
+            self.assertIn('test_seconds_count{entrypoint="flask"} 1', output)
+            # The aggregate is rendered from a copy, so the process's own metrics are unchanged.
+            self.assertEqual({ ("a",): 1, ("b",): 1 }, counter._values)
+
+if __name__ == '__main__':
+    unittest.main()
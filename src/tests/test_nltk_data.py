@@ -0,0 +1,42 @@
+import tempfile
+import unittest
+
+from unittest.mock import patch
+
+from SkillRunner.bot import nltk_data
+from SkillRunner.bot.policy import RestrictivePolicy
+
+#pylint: disable=missing-docstring,
+
+class NltkDataTest(unittest.TestCase):
+    def setUp(self):
+        nltk_data._checked = False # pylint: disable=protected-access
+
+    def tearDown(self):
+        nltk_data._checked = False # pylint: disable=protected-access
+
+    def test_reports_missing_corpora_without_downloading(self):
+        with tempfile.TemporaryDirectory() as data_dir, \
+                patch.dict("os.environ", { "NLTK_DATA": data_dir }), \
+                patch("nltk.data.path", [data_dir]), \
+                patch("nltk.download", side_effect=AssertionError("Should not download")):
+            with self.assertLogs("NLTK", "WARNING"):
+                missing = nltk_data.ensure_nltk_data()
+
+            self.assertEqual(sorted(nltk_data.MIN_CORPORA), sorted(missing))
+            # The check only happens once per process
+            self.assertEqual([], nltk_data.ensure_nltk_data())
+
+    def test_skill_import_checks_corpora(self):
+        calls = []
+        with patch.dict("SkillRunner.bot.policy.restricted_environment._FIRST_IMPORT_HOOKS", { "json": calls.append }):
+            policy = RestrictivePolicy()
+            policy.allow_module("json")
+            policy.freeze()
+            policy.exec("import json\nimport json", {})
+            policy.exec("import json", {})
+
+        self.assertEqual(1, len(calls))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,7 +3,7 @@ import unittest
 import logging
 from parameterized import parameterized
 
-from SkillRunner.bot.policy import Policy, UnrestrictedPolicy, RestrictivePolicy
+from SkillRunner.bot.policy import Policy, UnrestrictedPolicy, RestrictivePolicy, get_policy
 
 #pylint: disable=missing-docstring,
 
@@ -310,4 +310,23 @@ method()
 """
         output = []
         policy.exec(code, { "output" : output })
-        self.assertEqual(output, [1, 2])
\ No newline at end of file
+        self.assertEqual(output, [1, 2])
+
+    def test_get_policy_shares_frozen_instances(self):
+        policy = get_policy("restrictive")
+        self.assertIs(policy, get_policy("restrictive"))
+        self.assertTrue(policy.frozen)
+        with self.assertRaises(RuntimeError):
+            policy.allow_module("os")
+
+        with self.assertRaises(PermissionError):
+            policy.exec("import os", {})
+
+    def test_frozen_policy_does_not_share_script_locals(self):
+        policy = RestrictivePolicy().freeze()
+        first = []
+        second = []
+        policy.exec("output.append(value)", { "output": first, "value": 1 })
+        policy.exec("output.append(value)", { "output": second, "value": 2 })
+        self.assertEqual([1], first)
+        self.assertEqual([2], second)
@@ -0,0 +1,91 @@
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import time
+import unittest
+
+#pylint: disable=missing-docstring,
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SERVER = """
+import os, sys
+from SkillRunner.hosting.prefork import PreforkServer
+
+def app(environ, start_response):
+    body = environ["wsgi.input"].read(int(environ.get("CONTENT_LENGTH") or 0))
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    # No Content-Length, so this is sent chunked
+    return [str(os.getpid()).encode(), b":", body]
+
+server = PreforkServer(app, "127.0.0.1", 0, 2, keepalive_timeout=5, graceful_timeout=5, on_worker_exit=lambda pid: print(f"exited {pid}", flush=True))
+print(server.port, flush=True)
+server.serve_forever()
+"""
+
+class PreforkServerTest(unittest.TestCase):
+    def setUp(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-c", SERVER],
+            cwd=SRC_DIR,
+            env={ **os.environ, "ABBOT_ENV": "test" },
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True)
+        self.port = int(self.process.stdout.readline())
+
+        # The port is bound before the workers are forked, so wait until one is serving.
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        self.request(conn)
+        conn.close()
+
+    def tearDown(self):
+        if self.process.poll() is None:
+            self.process.kill()
+        self.process.wait()
+        self.process.stdout.close()
+
+    def request(self, conn, body=""):
+        conn.request("POST", "/", body=body)
+        response = conn.getresponse()
+        self.assertEqual(200, response.status)
+        pid, _, echoed = response.read().decode().partition(":")
+        self.assertEqual(body, echoed)
+        return int(pid)
+
+    def test_keeps_connections_alive(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        first = self.request(conn, "hello")
+        sock = conn.sock
+        second = self.request(conn, "world")
+
+        self.assertIs(sock, conn.sock)
+        self.assertEqual(first, second)
+        self.assertNotEqual(self.process.pid, first)
+        conn.close()
+
+    def test_replaces_workers_that_exit(self):
+        conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        pid = self.request(conn)
+        conn.close()
+        os.kill(pid, signal.SIGKILL)
+
+        # Keep asking until we've seen a worker other than the killed one, and not more than 2 workers.
+        seen = set()
+        deadline = time.monotonic() + 10
+        while len(seen) < 2 and time.monotonic() < deadline:
+            conn = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            seen.add(self.request(conn))
+            conn.close()
+        self.assertNotIn(pid, seen)
+        self.assertEqual(2, len(seen))
+        self.assertEqual(f"exited {pid}", self.process.stdout.readline().strip())
+
+    def test_stops_on_sigterm(self):
+        self.process.send_signal(signal.SIGTERM)
+        self.assertEqual(0, self.process.wait(timeout=10))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import time
+import unittest
+
+from unittest import mock
+
+import requests
+import responses
+
+from SkillRunner.bot import resilience
+from SkillRunner.bot.apiclient import ApiClient
+from SkillRunner.bot.exceptions import ApiError
+from SkillRunner.bot.resilience import CircuitBreaker, RetryPolicy, parse_retry_after
+
+#pylint: disable=missing-docstring,
+
+BRAIN_URL = "https://localhost:4979/api/skills/42/brain?key=a"
+FAST_RETRIES = { "ABBOT_API_RETRY_BASE_DELAY": "0.001", "ABBOT_API_MEMOIZE": "false" }
+
+class RetryPolicyTest(unittest.TestCase):
+    def response(self, status_code, headers=None):
+        response = requests.Response()
+        response.status_code = status_code
+        response.headers.update(headers or {})
+        return response
+
+    def test_retries_idempotent_methods_after_transient_failures(self):
+        policy = RetryPolicy(retries=2, base_delay=0.1, max_delay=1)
+
+        self.assertIsNotNone(policy.delay(0, "GET", None, requests.ConnectionError()))
+        self.assertIsNotNone(policy.delay(1, "DELETE", self.response(502), None))
+        self.assertIsNone(policy.delay(2, "GET", self.response(502), None))
+        self.assertIsNone(policy.delay(0, "POST", None, requests.ConnectionError()))
+        self.assertIsNone(policy.delay(0, "POST", self.response(502), None))
+        self.assertIsNone(policy.delay(0, "GET", self.response(404), None))
+
+    def test_retries_any_method_after_unprocessed_responses(self):
+        policy = RetryPolicy(retries=2, base_delay=0.1, max_delay=1)
+
+        self.assertIsNotNone(policy.delay(0, "POST", self.response(429), None))
+        self.assertIsNotNone(policy.delay(0, "POST", self.response(503), None))
+
+    def test_backoff_is_jittered_and_capped(self):
+        policy = RetryPolicy(retries=10, base_delay=0.1, max_delay=0.5)
+
+        delays = [policy.delay(attempt, "GET", self.response(503), None) for attempt in range(10)]
+
+        self.assertTrue(all(0 <= delay <= 0.5 for delay in delays))
+        self.assertGreater(len(set(delays)), 1)
+
+    def test_honors_retry_after(self):
+        policy = RetryPolicy(retries=2, base_delay=0.1, max_delay=2)
+
+        self.assertEqual(1.5, policy.delay(0, "POST", self.response(429, { "Retry-After": "1.5" }), None))
+        self.assertIsNone(policy.delay(0, "POST", self.response(429, { "Retry-After": "120" }), None))
+
+    def test_parse_retry_after(self):
+        self.assertEqual(3.0, parse_retry_after("3"))
+        self.assertEqual(0.0, parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertIsNone(parse_retry_after(None))
+
+class CircuitBreakerTest(unittest.TestCase):
+    def test_opens_after_consecutive_failures(self):
+        breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60)
+
+        for success in [False, False, True, False, False]:
+            self.assertTrue(breaker.allow())
+            breaker.record(success)
+        self.assertEqual("closed", breaker.status()["state"])
+
+        breaker.allow()
+        breaker.record(False)
+
+        self.assertEqual("open", breaker.status()["state"])
+        self.assertFalse(breaker.allow())
+
+    def test_half_opens_to_probe_recovery(self):
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+        breaker.allow()
+        breaker.record(False)
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow())
+        self.assertFalse(breaker.allow())
+        self.assertEqual("half_open", breaker.status()["state"])
+
+        breaker.record(False)
+        self.assertEqual("open", breaker.status()["state"])
+        time.sleep(0.06)
+
+        self.assertTrue(breaker.allow())
+        breaker.record(True)
+        self.assertEqual({ "state": "closed", "consecutiveFailures": 0 }, breaker.status())
+        self.assertTrue(breaker.allow())
+
+@mock.patch.dict(os.environ, FAST_RETRIES)
+class ApiClientResilienceTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(resilience, "_breaker", None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    @responses.activate
+    def test_retries_transient_failures(self):
+        responses.get(BRAIN_URL, status=503)
+        responses.get(BRAIN_URL, body=requests.ConnectionError("reset"))
+        responses.get(BRAIN_URL, json={ "value": "1" })
+
+        self.assertEqual({ "value": "1" }, ApiClient(42, None, None, None, None).get("/brain?key=a"))
+        self.assertEqual(3, len(responses.calls))
+
+    @responses.activate
+    def test_raises_api_error_with_status_code(self):
+        responses.post(BRAIN_URL, status=500)
+
+        with self.assertRaises(ApiError) as context:
+            ApiClient(42, None, None, None, None).post("/brain?key=a", { "value": "1" })
+
+        self.assertEqual(500, context.exception.status_code)
+        self.assertEqual(1, len(responses.calls))
+
+    @responses.activate
+    @mock.patch.dict(os.environ, { "ABBOT_API_BREAKER_THRESHOLD": "3", "ABBOT_API_RETRIES": "0" })
+    def test_fails_fast_when_circuit_is_open(self):
+        responses.get(BRAIN_URL, status=502)
+        client = ApiClient(42, None, None, None, None)
+
+        for _ in range(3):
+            with self.assertRaises(ApiError):
+                client.get("/brain?key=a")
+        with self.assertRaises(ApiError) as context:
+            client.get("/brain?key=a")
+
+        self.assertIsNone(context.exception.status_code)
+        self.assertEqual(3, len(responses.calls))
+        self.assertEqual("open", resilience.circuit_breaker().status()["state"])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import os
+import time
+import unittest
+
+from unittest import mock
+
+from SkillRunner.hosting.execution import SkillRunResponse
+
+from tests.helpers import create_request
+
+with mock.patch.dict(os.environ, { "ABBOT_SKILL_RUNNER_TOKEN": "secret", "ABBOT_ENV": "dev" }):
+    import runner_asgi
+
+#pylint: disable=missing-docstring,
+
+async def call(method, path, body=b"", headers=None, query_string=b""):
+    scope = {
+        "type": "http",
+        "method": method,
+        "path": path,
+        "query_string": query_string,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    messages = [{ "type": "http.request", "body": body, "more_body": False }]
+    async def receive():
+        return messages.pop(0) if messages else { "type": "http.disconnect" }
+
+    sent = []
+    async def send(message):
+        sent.append(message)
+
+    await runner_asgi.app(scope, receive, send)
+    return sent[0]["status"], dict(sent[0]["headers"]), sent[1]["body"]
+
+class RunnerAsgiTest(unittest.IsolatedAsyncioTestCase):
+    def tearDown(self):
+        runner_asgi.shutdown()
+
+    async def test_status(self):
+        status, _, body = await call("GET", "/api/v1/status")
+        self.assertEqual(200, status)
+        self.assertEqual("ok", json.loads(body)["status"])
+        self.assertIn(json.loads(body)["circuitBreaker"]["state"], ["closed", "open", "half_open"])
+
+    async def test_metrics(self):
+        await call("POST", "/api/v1/execute", json.dumps(create_request("pass")).encode(), { "Authorization": "Bearer secret" })
+
+        status, headers, body = await call("GET", "/api/v1/metrics")
+
+        self.assertEqual(200, status)
+        self.assertTrue(headers[b"content-type"].startswith(b"text/plain"))
+        self.assertIn(b'abbot_runner_phase_seconds_count{entrypoint="asgi",policy="restrictive",phase="parse"}', body)
+
+    async def test_execute_requires_token(self):
+        status, _, _ = await call("POST", "/api/v1/execute", json.dumps(create_request("bot.reply('Hello')")).encode())
+        self.assertEqual(401, status)
+
+    async def test_authenticates_before_admission(self):
+        admission = runner_asgi.AsyncAdmissionController(1)
+        self.assertTrue(await admission.acquire())
+        with mock.patch.object(runner_asgi, "admission", admission):
+            # The only slot is taken, but unauthenticated requests are turned away before they'd wait for it.
+            status, _, _ = await call("POST", "/api/v1/execute", json.dumps(create_request("pass")).encode())
+            self.assertEqual(401, status)
+            status, _, _ = await call("POST", "/api/v1/execute", json.dumps(create_request("pass")).encode(), { "Authorization": "Bearer secret" })
+            self.assertEqual(503, status)
+        self.assertEqual(1, admission.in_flight)
+
+    async def test_execute_runs_skill(self):
+        status, headers, body = await call(
+            "POST",
+            "/api/v1/execute",
+            json.dumps(create_request("bot.reply('Hello')")).encode(),
+            { "Authorization": "Bearer secret" })
+
+        self.assertEqual(200, status)
+        self.assertEqual(b"application/vnd.abbot.v1+json", headers[b"content-type"])
+        response = json.loads(body)
+        self.assertTrue(response["success"], response["errors"])
+        self.assertEqual(["Hello"], response["replies"])
+
+    async def test_accepts_code_query_parameter(self):
+        status, _, _ = await call("POST", "/api/v1/execute", json.dumps(create_request("pass")).encode(), query_string=b"code=secret")
+        self.assertEqual(200, status)
+
+    async def test_execute_streams_when_asked(self):
+        scope = {
+            "type": "http",
+            "method": "POST",
+            "path": "/api/v1/execute",
+            "query_string": b"",
+            "headers": [(b"authorization", b"Bearer secret"), (b"accept", b"application/x-ndjson")],
+        }
+        messages = [{ "type": "http.request", "body": json.dumps(create_request("bot.reply('one')\nbot.reply('two')")).encode(), "more_body": False }]
+        async def receive():
+            return messages.pop(0)
+        sent = []
+        async def send(message):
+            sent.append(message)
+
+        await runner_asgi.app(scope, receive, send)
+
+        self.assertEqual((b"content-type", b"application/x-ndjson"), sent[0]["headers"][0])
+        self.assertTrue(all(m["more_body"] for m in sent[1:-1]))
+        lines = b"".join(m["body"] for m in sent[1:]).splitlines()
+        events = [json.loads(line) for line in lines]
+        self.assertEqual([{ "type": "reply", "message": "one" }, { "type": "reply", "message": "two" }], events[:2])
+        self.assertEqual("summary", events[-1]["type"])
+
+    async def test_execute_batch(self):
+        status, _, body = await call(
+            "POST",
+            "/api/v1/execute-batch",
+            json.dumps([create_request("bot.reply('one')"), create_request("raise ValueError('two')"), 3]).encode(),
+            { "Authorization": "Bearer secret" })
+
+        self.assertEqual(200, status)
+        responses = json.loads(body)
+        self.assertEqual(["one"], responses[0]["replies"])
+        self.assertEqual([{ "errorId": "ValueError", "description": "two" }], responses[1]["errors"])
+        self.assertEqual("InvalidInvocation", responses[2]["errors"][0]["errorId"])
+
+    async def test_execute_batch_requires_array(self):
+        status, _, _ = await call("POST", "/api/v1/execute-batch", json.dumps(create_request("pass")).encode(), { "Authorization": "Bearer secret" })
+        self.assertEqual(400, status)
+
+    async def test_runs_skills_concurrently(self):
+        def slow_skill(*_):
+            time.sleep(0.5)
+            return SkillRunResponse()
+
+        with mock.patch("runner_asgi.run_skill", slow_skill):
+            started = time.monotonic()
+            results = await asyncio.gather(*[
+                call("POST", "/api/v1/execute", json.dumps(create_request("pass")).encode(), { "Authorization": "Bearer secret" })
+                for _ in range(10)
+            ])
+            elapsed = time.monotonic() - started
+
+        self.assertEqual([200] * 10, [status for status, _, _ in results])
+        self.assertLess(elapsed, 2.5)
+
+if __name__ == '__main__':
+    unittest.main()
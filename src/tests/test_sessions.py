@@ -0,0 +1,69 @@
+import os
+import threading
+import unittest
+
+from unittest import mock
+
+import responses
+
+from SkillRunner.bot import sessions
+from SkillRunner.bot.apiclient import ApiClient
+
+#pylint: disable=missing-docstring,
+
+class SessionsTest(unittest.TestCase):
+    def setUp(self):
+        sessions.close_sessions()
+
+    def tearDown(self):
+        sessions.close_sessions()
+
+    def test_shares_a_session_per_base_url(self):
+        session = sessions.get_session("https://ab.bot/api")
+
+        self.assertIs(session, sessions.get_session("https://ab.bot/api"))
+        self.assertIsNot(session, sessions.get_session("https://localhost:4979/api"))
+
+    def test_shares_a_session_across_threads(self):
+        found = []
+        threads = [threading.Thread(target=lambda: found.append(sessions.get_session("https://ab.bot/api"))) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(1, len(set(map(id, found))))
+
+    def test_creates_new_sessions_after_fork(self):
+        session = sessions.get_session("https://ab.bot/api")
+
+        with mock.patch.object(sessions.os, "getpid", return_value=os.getpid() + 1):
+            self.assertIsNot(session, sessions.get_session("https://ab.bot/api"))
+
+    @mock.patch.dict(os.environ, { "ABBOT_API_POOL_SIZE": "4" })
+    def test_pool_size_from_environment(self):
+        adapter = sessions.get_session("https://ab.bot/api").get_adapter("https://ab.bot/api")
+
+        self.assertEqual(4, adapter._pool_maxsize) # pylint: disable=protected-access
+
+    @mock.patch.dict(os.environ, { "ABBOT_API_CONNECT_TIMEOUT": "2", "ABBOT_API_READ_TIMEOUT": "10" })
+    def test_timeouts_from_environment(self):
+        self.assertEqual((2.0, 10.0), sessions.request_timeout())
+
+    @responses.activate
+    def test_api_clients_share_connections_and_not_cookies(self):
+        base_url = "https://localhost:4979/api/skills"
+        responses.get(f"{base_url}/1/brain/a", json={ "value": 1 }, headers={ "Set-Cookie": "session=secret; Path=/" })
+        responses.get(f"{base_url}/2/brain/b", json={ "value": 2 })
+        first = ApiClient(1, "U1", "token", None, None)
+        second = ApiClient(2, "U2", "token", None, None)
+
+        self.assertEqual({ "value": 1 }, first.get("/brain/a"))
+        self.assertEqual({ "value": 2 }, second.get("/brain/b"))
+
+        self.assertIsNone(responses.calls[1].request.headers.get("Cookie"))
+        self.assertEqual(1, len(sessions._sessions)) # pylint: disable=protected-access
+        self.assertEqual(sessions.request_timeout(), responses.calls[0].request.req_kwargs["timeout"])
+
+if __name__ == '__main__':
+    unittest.main()
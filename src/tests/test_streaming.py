@@ -0,0 +1,109 @@
+import json
+import threading
+import unittest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from SkillRunner.hosting.execution import SkillRunResponse, run_skill
+from SkillRunner.hosting.streaming import stream_skill, wants_stream
+from SkillRunner.hosting.worker_pool import WorkerPool
+
+from tests.helpers import create_request
+
+#pylint: disable=missing-docstring,
+
+def read_events(lines):
+    return [json.loads(line) for line in lines]
+
+class StreamingTest(unittest.TestCase):
+    def test_wants_stream(self):
+        self.assertTrue(wants_stream("application/x-ndjson"))
+        self.assertTrue(wants_stream("application/json, application/x-ndjson; q=0.9"))
+        self.assertFalse(wants_stream("application/json"))
+        self.assertFalse(wants_stream(None))
+
+    def test_streams_replies_before_the_skill_finishes(self):
+        first_reply_received = threading.Event()
+        def run(_body, _api_token, _trace_parent, on_reply):
+            on_reply("first")
+            # Only finish once the consumer has seen the first reply.
+            self.assertTrue(first_reply_received.wait(5))
+            on_reply("second")
+            response = SkillRunResponse()
+            response.replies = ["first", "second"]
+            return response
+
+        stream = stream_skill(run, create_request("pass"), "token", None)
+        self.assertEqual({ "type": "reply", "message": "first" }, json.loads(next(stream)))
+        first_reply_received.set()
+
+        events = read_events(stream)
+        self.assertEqual({ "type": "reply", "message": "second" }, events[0])
+        self.assertEqual("summary", events[-1]["type"])
+        self.assertEqual(2, events[-1]["replyCount"])
+
+    def test_streams_outputs_errors_and_summary(self):
+        events = read_events(stream_skill(
+            run_skill,
+            create_request("bot.reply('Hello')\nbot.outputs['answer'] = 42\nraise ValueError('nope')"),
+            "token",
+            None))
+
+        self.assertEqual([
+            { "type": "reply", "message": "Hello" },
+            { "type": "output", "key": "answer", "value": 42 },
+            { "type": "error", "error": { "errorId": "ValueError", "description": "nope" } },
+            {
+                "type": "summary",
+                "success": False,
+                "replyCount": 1,
+                "errorCount": 1,
+                "contentType": None,
+                "content": None,
+                "headers": None,
+            },
+        ], events)
+
+    def test_reports_failure_to_run(self):
+        def run(*_args, **_kwargs):
+            raise RuntimeError("worker is gone")
+
+        events = read_events(stream_skill(run, create_request("pass"), "token", None))
+
+        self.assertEqual({ "type": "error", "error": { "errorId": "RuntimeError", "description": "worker is gone" } }, events[0])
+        self.assertFalse(events[-1]["success"])
+
+    def test_runs_on_the_executor(self):
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bounded")
+        self.addCleanup(executor.shutdown)
+        release = threading.Event()
+        threads = []
+        def run(_body, _api_token, _trace_parent, on_reply):
+            threads.append(threading.current_thread().name)
+            on_reply("started")
+            self.assertTrue(release.wait(5))
+            return SkillRunResponse()
+
+        first = stream_skill(run, create_request("pass"), "token", None, executor=executor)
+        second = stream_skill(run, create_request("pass"), "token", None, executor=executor)
+        self.assertEqual({ "type": "reply", "message": "started" }, json.loads(next(first)))
+        # The executor has one thread, so the second invocation waits for the first to finish.
+        self.assertEqual(1, len(threads))
+        release.set()
+
+        read_events(first)
+        read_events(second)
+        self.assertEqual(2, len(threads))
+        self.assertTrue(all(name.startswith("bounded") for name in threads))
+
+    def test_streams_replies_from_worker_pool(self):
+        pool = WorkerPool(1, timeout=10, preload=[])
+        self.addCleanup(pool.close)
+
+        events = read_events(stream_skill(pool.run, create_request("bot.reply('one')\nbot.reply('two')"), "token", None))
+
+        self.assertEqual([{ "type": "reply", "message": "one" }, { "type": "reply", "message": "two" }], events[:2])
+        self.assertTrue(events[-1]["success"])
+
+if __name__ == '__main__':
+    unittest.main()
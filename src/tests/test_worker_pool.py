@@ -0,0 +1,72 @@
+import os
+import signal
+import unittest
+
+from SkillRunner.hosting.worker_pool import WorkerPool
+
+from tests.helpers import create_request
+
+#pylint: disable=missing-docstring,
+
+class WorkerPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.pool = WorkerPool(1, max_runs=2, timeout=10, preload=[])
+
+    def tearDown(self):
+        self.pool.close()
+
+    def test_runs_skill_in_worker(self):
+        response = self.pool.run(create_request("bot.reply('Hello'); bot.outputs['answer'] = 42"), "token", None)
+        self.assertTrue(response.success, response.errors)
+        self.assertEqual(["Hello"], response.replies)
+        self.assertEqual({ "answer": 42 }, response.outputs)
+
+    def test_reports_skill_errors(self):
+        response = self.pool.run(create_request("raise ValueError('nope')"), "token", None)
+        self.assertFalse(response.success)
+        self.assertEqual([{ "errorId": "ValueError", "description": "nope" }], response.errors)
+
+    def test_recycles_workers_after_max_runs(self):
+        self.pool.start()
+        pids = [self.idle_worker_pid()]
+        for _ in range(3):
+            self.pool.run(create_request("bot.reply('Hello')"), "token", None)
+            pids.append(self.idle_worker_pid())
+
+        # max_runs is 2, so the worker is replaced after every second run
+        self.assertEqual(pids[0], pids[1])
+        self.assertNotEqual(pids[1], pids[2])
+        self.assertEqual(pids[2], pids[3])
+
+    def test_replaces_worker_that_times_out(self):
+        self.pool.timeout = 0.5
+        response = self.pool.run(create_request("while True: pass"), "token", None)
+        self.assertEqual("TimeoutError", response.errors[0]["errorId"])
+
+        self.pool.timeout = 10
+        response = self.pool.run(create_request("bot.reply('Still here')"), "token", None)
+        self.assertEqual(["Still here"], response.replies)
+
+    def test_replaces_worker_that_dies(self):
+        self.pool.start()
+        os.kill(self.idle_worker_pid(), signal.SIGKILL)
+        self.pool._idle.queue[0].process.join() # pylint: disable=protected-access
+
+        response = self.pool.run(create_request("bot.reply('Still here')"), "token", None)
+        self.assertEqual(["Still here"], response.replies)
+
+    def test_replaces_worker_when_on_reply_fails(self):
+        def on_reply(reply):
+            raise RuntimeError("The client went away")
+
+        with self.assertRaises(RuntimeError):
+            self.pool.run(create_request("bot.reply('Hello'); bot.reply('Again')"), "token", None, on_reply)
+
+        response = self.pool.run(create_request("bot.reply('Still here')"), "token", None)
+        self.assertEqual(["Still here"], response.replies)
+
+    def idle_worker_pid(self):
+        return self.pool._idle.queue[0].process.pid # pylint: disable=protected-access
+
+if __name__ == '__main__':
+    unittest.main()